@@ -10,6 +10,7 @@ _   _ _____ _____    _____ _____ __  __ _    _ _            _______ ____  _____
 """
 import abc
 import argparse
+import asyncio
 import contextlib
 import fcntl
 import grpc
@@ -35,6 +36,7 @@ import nic_simulator_grpc_mgmt_service_pb2_grpc
 
 THREAD_CONCURRENCY_PER_SERVER = 2
 USE_HASH_SELECTION_METHOD_EXPLICITLY = False
+USE_OVS_BUNDLE = False
 
 # name templates
 ACTIVE_ACTIVE_BRIDGE_TEMPLATE = r"baa-%s-%d"
@@ -75,11 +77,12 @@ def get_ip_address(ifname):
     return addr
 
 
-def run_command(cmd, check=True):
+def run_command(cmd, check=True, input=None):
     """Run a command."""
     logging.debug("COMMAND: %s", cmd)
     result = subprocess.run(
         cmd,
+        input=input.encode() if input is not None else None,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         shell=True,
@@ -92,6 +95,24 @@ def run_command(cmd, check=True):
     return result
 
 
+async def run_command_async(cmd, check=True, input=None):
+    """Run a command without blocking the event loop."""
+    logging.debug("COMMAND: %s", cmd)
+    process = await asyncio.create_subprocess_shell(
+        cmd,
+        stdin=subprocess.PIPE if input is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate(input.encode() if input is not None else None)
+    result = subprocess.CompletedProcess(cmd, process.returncode, stdout.decode(), stderr.decode())
+    logging.debug("COMMAND STDOUT:\n%s\n", result.stdout)
+    logging.debug("COMMAND STDERR:\n%s\n", result.stderr)
+    if check:
+        result.check_returncode()
+    return result
+
+
 class OVSCommand(object):
     """OVS related commands."""
 
@@ -104,6 +125,7 @@ class OVSCommand(object):
     OVS_OFCTL_DEL_GROUPS_CMD = "ovs-ofctl -O OpenFlow13 del-groups {bridge_name}"
     OVS_OFCTL_ADD_GROUP_CMD = "ovs-ofctl -O OpenFlow13 add-group {bridge_name} {group}"
     OVS_OFCTL_MOD_GROUP_CMD = "ovs-ofctl -O OpenFlow13 mod-group {bridge_name} {group}"
+    OVS_OFCTL_BUNDLE_CMD = "ovs-ofctl -O OpenFlow15 bundle {bridge_name} -"
 
     @staticmethod
     def setup_openflow_version():
@@ -118,7 +140,10 @@ class OVSCommand(object):
             # NOTE: use openflow15 for OVS 2.10 and above
             if ovs_version >= _versiontuple("2.10"):
                 global USE_HASH_SELECTION_METHOD_EXPLICITLY
+                global USE_OVS_BUNDLE
                 USE_HASH_SELECTION_METHOD_EXPLICITLY = True
+                # NOTE: bundles of both flow and group modifications need openflow14 and above
+                USE_OVS_BUNDLE = True
                 OVSCommand.OVS_OFCTL_DEL_GROUPS_CMD = "ovs-ofctl -O OpenFlow15 del-groups {bridge_name}"
                 OVSCommand.OVS_OFCTL_ADD_GROUP_CMD = "ovs-ofctl -O OpenFlow15 add-group {bridge_name} {group}"
                 OVSCommand.OVS_OFCTL_MOD_GROUP_CMD = "ovs-ofctl -O OpenFlow15 mod-group {bridge_name} {group}"
@@ -157,6 +182,37 @@ class OVSCommand(object):
     def ovs_ofctl_mod_groups(bridge_name, group):
         return run_command(OVSCommand.OVS_OFCTL_MOD_GROUP_CMD.format(bridge_name=bridge_name, group=group))
 
+    @staticmethod
+    def ovs_ofctl_mod_commands(bridge_name, mods):
+        """
+        Get the commands and their inputs to apply modified flows and groups to a bridge.
+
+        More than one modification is applied atomically by a single bundle if supported, otherwise each
+        modification is applied by its own command.
+        """
+        if USE_OVS_BUNDLE and len(mods) > 1:
+            bundle = "".join(
+                ("group modify %s\n" if isinstance(mod, OVSGroup) else "flow modify_strict %s\n") % mod
+                for mod in mods
+            )
+            return [(OVSCommand.OVS_OFCTL_BUNDLE_CMD.format(bridge_name=bridge_name), bundle)]
+        return [
+            (OVSCommand.OVS_OFCTL_MOD_GROUP_CMD.format(bridge_name=bridge_name, group=mod), None)
+            if isinstance(mod, OVSGroup) else
+            (OVSCommand.OVS_OFCTL_MOD_FLOWS_CMD.format(bridge_name=bridge_name, flow=mod), None)
+            for mod in mods
+        ]
+
+    @staticmethod
+    def ovs_ofctl_mod(bridge_name, mods):
+        for cmd, input in OVSCommand.ovs_ofctl_mod_commands(bridge_name, mods):
+            run_command(cmd, input=input)
+
+    @staticmethod
+    async def ovs_ofctl_mod_async(bridge_name, mods):
+        for cmd, input in OVSCommand.ovs_ofctl_mod_commands(bridge_name, mods):
+            await run_command_async(cmd, input=input)
+
 
 class StrObj(abc.ABC):
     """Abstract class defines objects that could be represented as a string."""
@@ -414,6 +470,7 @@ class OVSBridge(object):
         "server_nic",
         "ptf_port",
         "lock",
+        "async_lock",
         "flows",
         "groups",
         "upstream_ecmp_flow",
@@ -440,6 +497,8 @@ class OVSBridge(object):
         self.upper_tor_loopback3_ip = loopback_ips[1]
         self.lower_tor_loopback3_ip = loopback_ips[2]
         self.lock = threading.RLock()
+        # NOTE: created on first use, so it is bound to the running event loop
+        self.async_lock = None
         self.ports = None
         self.lower_tor_port = None
         self.upper_tor_port = None
@@ -629,15 +688,29 @@ class OVSBridge(object):
         self.flows.append(flow)
         return flow
 
+    def _set_forwarding_state(self, portids, states):
+        """Set forwarding state in memory, return the modified groups to be applied to the bridge."""
+        changed = False
+        for portid, state in zip(portids, states):
+            logging.info("Set bridge %s port %s forwarding state: %s",
+                         self.bridge_name, portid, ForwardingState.STATE_LABELS[state])
+            flapped = self.states_setter[portid](state)
+            self.flap_counter[portid] += flapped
+            changed = changed or flapped
+        return [self.upstream_ecmp_group] if changed else []
+
     def set_forwarding_state(self, portids, states):
         """Set forwarding state."""
         with self.lock:
-            for portid, state in zip(portids, states):
-                logging.info("Set bridge %s port %s forwarding state: %s",
-                             self.bridge_name, portid, ForwardingState.STATE_LABELS[state])
-                self.flap_counter[portid] += self.states_setter[portid](state)
-            OVSCommand.ovs_ofctl_mod_groups(
-                self.bridge_name, self.upstream_ecmp_group)
+            OVSCommand.ovs_ofctl_mod(self.bridge_name, self._set_forwarding_state(portids, states))
+            return self.query_forwarding_state(portids)
+
+    async def set_forwarding_state_async(self, portids, states):
+        """Set forwarding state without blocking the event loop."""
+        async with self._get_async_lock():
+            with self.lock:
+                mods = self._set_forwarding_state(portids, states)
+            await OVSCommand.ovs_ofctl_mod_async(self.bridge_name, mods)
             return self.query_forwarding_state(portids)
 
     def query_forwarding_state(self, portids):
@@ -648,10 +721,18 @@ class OVSBridge(object):
                          self.bridge_name, portids, tuple(ForwardingState.STATE_LABELS[_] for _ in states))
             return states
 
-    def set_drop(self, portids, directions, recover):
-        """Set drop on a link."""
-        logging.info("Set drop on bridge %s: portids=%s, directions=%s, recover=%s"
-                     % (self.bridge_name, portids, directions, recover))
+    def _get_async_lock(self):
+        if self.async_lock is None:
+            self.async_lock = asyncio.Lock()
+        return self.async_lock
+
+    @staticmethod
+    def _dedup(mods):
+        """Remove duplicated modifications, each flow or group is applied once with its latest state."""
+        return list({id(mod): mod for mod in mods}.values())
+
+    def _set_drop(self, portids, directions, recover, mods):
+        """Set drop in memory, append the modified flows and groups to be applied to the bridge to mods."""
         with self.lock:
             result = []
             for portid, direction in zip(portids, directions):
@@ -663,8 +744,7 @@ class OVSBridge(object):
                     # recover downstream
                     if downstream_flow.drop:
                         downstream_flow.set_drop(recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, downstream_flow)
+                        mods.append(downstream_flow)
 
                     # recover upstream
                     # recover upstream traffic from server NiC
@@ -672,117 +752,120 @@ class OVSBridge(object):
                         if self.upstream_upper_tor_nic_flow.get_drop(portid):
                             self.upstream_upper_tor_nic_flow.set_drop(
                                 portid=portid, recover=recover)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_upper_tor_nic_flow)
+                            mods.append(self.upstream_upper_tor_nic_flow)
                     if self.upstream_lower_tor_nic_flow.get_port_enable(portid):
                         if self.upstream_lower_tor_nic_flow.get_drop(portid):
                             self.upstream_lower_tor_nic_flow.set_drop(
                                 portid=portid, recover=recover)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_lower_tor_nic_flow)
+                            mods.append(self.upstream_lower_tor_nic_flow)
                     if self.upstream_nic_flow.get_drop(portid):
                         self.upstream_nic_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_nic_flow)
+                        mods.append(self.upstream_nic_flow)
                     # recover upstream loopback2 traffic from ptf
                     if self.upstream_loopback2_flow.get_drop(portid):
                         self.upstream_loopback2_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_loopback2_flow)
+                        mods.append(self.upstream_loopback2_flow)
                     # recover upstream upper ToR loopback3 traffic from ptf
                     if self.upstream_upper_tor_loopback3_flow.get_drop(portid):
                         self.upstream_upper_tor_loopback3_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_upper_tor_loopback3_flow)
+                        mods.append(self.upstream_upper_tor_loopback3_flow)
                     # recover upstream lower ToR loopback3 traffic from ptf
                     if self.upstream_lower_tor_loopback3_flow.get_drop(portid):
                         self.upstream_lower_tor_loopback3_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_lower_tor_loopback3_flow)
+                        mods.append(self.upstream_lower_tor_loopback3_flow)
                     # recover upstream arp traffic from ptf
                     if self.upstream_arp_flow.get_drop(portid):
                         self.upstream_arp_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_arp_flow)
+                        mods.append(self.upstream_arp_flow)
                     # recover upstream icmpv6 traffic from ptf
                     if self.upstream_icmpv6_flow.get_drop(portid):
                         self.upstream_icmpv6_flow.set_drop(
                             portid=portid, recover=recover)
-                        OVSCommand.ovs_ofctl_mod_flow(
-                            self.bridge_name, self.upstream_icmpv6_flow)
+                        mods.append(self.upstream_icmpv6_flow)
 
                     forwarding_state = forwarding_state_getter()
                     if forwarding_state == ForwardingState.STANDBY:
                         forwarding_state_setter(ForwardingState.ACTIVE)
-                        OVSCommand.ovs_ofctl_mod_groups(
-                            self.bridge_name, self.upstream_ecmp_group)
+                        mods.append(self.upstream_ecmp_group)
                 else:
                     if direction == 0:
                         # downstream
                         if not downstream_flow.drop:
                             downstream_flow.set_drop()
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, downstream_flow)
+                            mods.append(downstream_flow)
                     elif direction == 1:
                         # upstream
                         # drop upstream traffic from server NiC
                         if self.upstream_upper_tor_nic_flow.get_port_enable(portid):
                             if not self.upstream_upper_tor_nic_flow.get_drop(portid):
                                 self.upstream_upper_tor_nic_flow.set_drop(portid)
-                                OVSCommand.ovs_ofctl_mod_flow(
-                                    self.bridge_name, self.upstream_upper_tor_nic_flow)
+                                mods.append(self.upstream_upper_tor_nic_flow)
                         if self.upstream_lower_tor_nic_flow.get_port_enable(portid):
                             if not self.upstream_lower_tor_nic_flow.get_drop(portid):
                                 self.upstream_lower_tor_nic_flow.set_drop(portid)
-                                OVSCommand.ovs_ofctl_mod_flow(
-                                    self.bridge_name, self.upstream_lower_tor_nic_flow)
+                                mods.append(self.upstream_lower_tor_nic_flow)
                         if not self.upstream_nic_flow.get_drop(portid):
                             self.upstream_nic_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_nic_flow)
+                            mods.append(self.upstream_nic_flow)
                         # drop upstream loopback2 traffic from ptf
                         if not self.upstream_loopback2_flow.get_drop(portid):
                             self.upstream_loopback2_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_loopback2_flow)
+                            mods.append(self.upstream_loopback2_flow)
                         # drop upstream upper ToR loopback3 traffic from ptf
                         if not self.upstream_upper_tor_loopback3_flow.get_drop(portid):
                             self.upstream_upper_tor_loopback3_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_upper_tor_loopback3_flow)
+                            mods.append(self.upstream_upper_tor_loopback3_flow)
                         # drop upstream lower ToR loopback3 traffic from ptf
                         if not self.upstream_lower_tor_loopback3_flow.get_drop(portid):
                             self.upstream_lower_tor_loopback3_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_lower_tor_loopback3_flow)
+                            mods.append(self.upstream_lower_tor_loopback3_flow)
                         # drop upstream arp traffic from ptf
                         if not self.upstream_arp_flow.get_drop(portid):
                             self.upstream_arp_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_arp_flow)
+                            mods.append(self.upstream_arp_flow)
                         # drop upstream icmpv6 traffic from ptf
                         if not self.upstream_icmpv6_flow.get_drop(portid):
                             self.upstream_icmpv6_flow.set_drop(portid)
-                            OVSCommand.ovs_ofctl_mod_flow(
-                                self.bridge_name, self.upstream_icmpv6_flow)
+                            mods.append(self.upstream_icmpv6_flow)
 
                         forwarding_state = forwarding_state_getter()
                         # use set forwarding state to standby to simulator link drop
                         if forwarding_state == ForwardingState.ACTIVE:
                             forwarding_state_setter(ForwardingState.STANDBY)
-                            OVSCommand.ovs_ofctl_mod_groups(
-                                self.bridge_name, self.upstream_ecmp_group)
+                            mods.append(self.upstream_ecmp_group)
                     else:
                         raise ValueError("Invalid direction %s, please use 0 for downstream and 1 for upstream"
                                          % (direction))
                 result.append(True)
             return result
 
+    def set_drop(self, portids, directions, recover):
+        """Set drop on a link."""
+        logging.info("Set drop on bridge %s: portids=%s, directions=%s, recover=%s"
+                     % (self.bridge_name, portids, directions, recover))
+        with self.lock:
+            mods = []
+            try:
+                return self._set_drop(portids, directions, recover, mods)
+            finally:
+                OVSCommand.ovs_ofctl_mod(self.bridge_name, self._dedup(mods))
+
+    async def set_drop_async(self, portids, directions, recover):
+        """Set drop on a link without blocking the event loop."""
+        logging.info("Set drop on bridge %s: portids=%s, directions=%s, recover=%s"
+                     % (self.bridge_name, portids, directions, recover))
+        async with self._get_async_lock():
+            mods = []
+            try:
+                return self._set_drop(portids, directions, recover, mods)
+            finally:
+                await OVSCommand.ovs_ofctl_mod_async(self.bridge_name, self._dedup(mods))
+
     def query_flap_counter(self, portids):
         """Query flap counter."""
         with self.lock:
@@ -1176,10 +1259,175 @@ class MgmtServer(nic_simulator_grpc_mgmt_service_pb2_grpc.DualTorMgmtServiceServ
         self.server.wait_for_termination()
 
 
+class AsyncNiCServer(NiCServer):
+    """
+    gRPC for a NiC, served by an asyncio gRPC server.
+
+    Forwarding state and drop changes apply OVS commands without blocking the event loop, all the NiC servers and
+    the management server share one event loop. The other calls only read states kept in memory, they are run in the
+    default thread pool of the event loop.
+    """
+
+    async def SetAdminForwardingPortState(self, request, context):
+        logging.debug("SetAdminForwardingPortState: request to server %s from client %s\n",
+                      self.nic_addr, context.peer())
+        portids, states = request.portid, request.state
+        response = nic_simulator_grpc_service_pb2.AdminReply(
+            portid=portids,
+            state=await self.ovs_bridge.set_forwarding_state_async(portids, states)
+        )
+        logging.debug("SetAdminForwardingPortState: response to client %s from server %s:\n%s",
+                      context.peer(), self.nic_addr, response)
+        return response
+
+    async def SetDrop(self, request, context):
+        logging.debug("SetDrop: request to server %s from client %s\n",
+                      self.nic_addr, context.peer())
+        portids, directions, recover = request.portid, request.direction, request.recover
+        response = nic_simulator_grpc_service_pb2.DropReply(
+            portid=portids,
+            success=await self.ovs_bridge.set_drop_async(portids, directions, recover)
+        )
+        logging.debug("SetDrop: response to client %s from server %s\n%s",
+                      context.peer(), self.nic_addr, response)
+        return response
+
+    async def start(self):
+        """Start the gRPC server in the running event loop."""
+        self.server = grpc.aio.server(options=GRPC_SERVER_OPTIONS)
+        nic_simulator_grpc_service_pb2_grpc.add_DualToRActiveServicer_to_server(
+            self,
+            self.server
+        )
+        self.server.add_insecure_port("%s:%s" % (self.nic_addr, self.binding_port))
+        await self.server.start()
+        self.started = True
+
+    async def stop(self):
+        """Stop the gRPC server."""
+        await self.server.stop(grace=None)
+        self.started = False
+
+
+class AsyncMgmtServer(MgmtServer):
+    """
+    Management gRPC server served by an asyncio gRPC server.
+
+    Requests of a call to the NiCs are sent to the NiC servers concurrently instead of one by one.
+    """
+
+    def _get_client_stub(self, nic_address):
+        if nic_address not in self.client_stubs:
+            self.client_stubs[nic_address] = nic_simulator_grpc_service_pb2_grpc.DualToRActiveStub(
+                grpc.aio.insecure_channel(
+                    "%s:%s" % (nic_address, self.binding_port),
+                    options=GRPC_CLIENT_OPTIONS
+                )
+            )
+        return self.client_stubs[nic_address]
+
+    async def _call_nic_servers(self, method, nic_addresses, requests, context, reply_class, replies_field,
+                                timeout=GRPC_TIMEOUT):
+        """Call a method of the NiC servers concurrently, reply with an empty reply if any of the calls fails."""
+        replies = await asyncio.gather(
+            *[getattr(self._get_client_stub(nic_address), method)(request, timeout=timeout)
+              for nic_address, request in zip(nic_addresses, requests)],
+            return_exceptions=True
+        )
+        for nic_address, reply in zip(nic_addresses, replies):
+            if isinstance(reply, BaseException):
+                context.set_code(grpc.StatusCode.ABORTED)
+                context.set_details("Error in %s to %s: %s" % (method, nic_address, repr(reply)))
+                return reply_class()
+        response = reply_class(nic_addresses=nic_addresses, **{replies_field: replies})
+        logging.debug("%s[mgmt]: response: %s", method, response)
+        return response
+
+    async def QueryAdminForwardingPortState(self, request, context):
+        logging.debug(
+            "QueryAdminForwardingPortState[mgmt]: request query admin port state for %s\n", request.nic_addresses)
+        return await self._call_nic_servers(
+            "QueryAdminForwardingPortState", request.nic_addresses, request.admin_requests, context,
+            nic_simulator_grpc_mgmt_service_pb2.ListOfAdminReply, "admin_replies"
+        )
+
+    async def SetAdminForwardingPortState(self, request, context):
+        logging.debug(
+            "SetAdminForwardingPortState[mgmt]: request set admin port state: %s\n", request)
+        return await self._call_nic_servers(
+            "SetAdminForwardingPortState", request.nic_addresses, request.admin_requests, context,
+            nic_simulator_grpc_mgmt_service_pb2.ListOfAdminReply, "admin_replies"
+        )
+
+    async def SetDrop(self, request, context):
+        logging.debug("SetDrop[mgmt]: request set drop: %s\n", request)
+        return await self._call_nic_servers(
+            "SetDrop", request.nic_addresses, request.drop_requests, context,
+            nic_simulator_grpc_mgmt_service_pb2.ListOfDropReply, "drop_replies", timeout=10
+        )
+
+    async def SetNicServerAdminState(self, request, context):
+        nic_addresses = request.nic_addresses
+        admin_states = request.admin_states
+        logging.debug(
+            "SetNicServerAdminState[mgmt]: request set nic server admin state:%s\n", request)
+
+        successes = []
+        for nic_address, admin_state in zip(nic_addresses, admin_states):
+            nic_server = self.nic_servers[nic_address]
+            success = True
+            try:
+                if admin_state and not nic_server.started:
+                    await nic_server.start()
+                elif not admin_state and nic_server.started:
+                    await nic_server.stop()
+            except Exception:
+                logging.error("Failed to set nic server %s admin state to %s",
+                              nic_address, admin_state, exc_info=True)
+                success = False
+            logging.debug("Set nic server %s admin state to %s", nic_address, admin_state)
+            successes.append(success)
+
+        response = nic_simulator_grpc_mgmt_service_pb2.ListOfNiCServerAdminStateReply(
+            nic_addresses=nic_addresses,
+            admin_states=admin_states,
+            successes=successes
+        )
+        logging.debug(
+            "SetNicServerAdminState[mgmt]: response of set nic server admin state:%s\n", response)
+        return response
+
+    async def QueryFlapCounter(self, request, context):
+        logging.debug(
+            "QueryFlapCounter[mgmt]: request query port flap counter for %s\n", request.nic_addresses)
+        return await self._call_nic_servers(
+            "QueryFlapCounter", request.nic_addresses, request.flap_counter_requests, context,
+            nic_simulator_grpc_mgmt_service_pb2.ListOfFlapCounterReply, "flap_counter_replies"
+        )
+
+    async def ResetFlapCounter(self, request, context):
+        logging.debug(
+            "ResetFlapCounter[mgmt]: request reset port flap counter for %s\n", request.nic_addresses)
+        return await self._call_nic_servers(
+            "ResetFlapCounter", request.nic_addresses, request.flap_counter_requests, context,
+            nic_simulator_grpc_mgmt_service_pb2.ListOfFlapCounterReply, "flap_counter_replies"
+        )
+
+    async def start(self):
+        self.server = grpc.aio.server(options=GRPC_SERVER_OPTIONS)
+        nic_simulator_grpc_mgmt_service_pb2_grpc.add_DualTorMgmtServiceServicer_to_server(
+            self, self.server)
+        self.server.add_insecure_port("%s:%s" % (
+            self.binding_address, self.binding_port))
+        await self.server.start()
+        await self.server.wait_for_termination()
+
+
 class NiCSimulator(nic_simulator_grpc_service_pb2_grpc.DualToRActiveServicer):
     """NiC simulator class, define all the gRPC calls."""
 
-    def __init__(self, vm_set, mgmt_port, binding_port, loopback_ips, duplicate_nic_upstream=False):
+    def __init__(self, vm_set, mgmt_port, binding_port, loopback_ips, duplicate_nic_upstream=False,
+                 use_asyncio=False):
         self.vm_set = vm_set
         self.server_nics = self._find_all_server_nics()
         self.server_nic_addresses = {
@@ -1200,10 +1448,12 @@ class NiCSimulator(nic_simulator_grpc_service_pb2_grpc.DualToRActiveServicer):
         logging.info("Starting NiC simulator to manipulate OVS bridges: %s",
                      json.dumps(list(self.ovs_bridges.keys()), indent=4))
 
+        nic_server_class, mgmt_server_class = (AsyncNiCServer, AsyncMgmtServer) if use_asyncio \
+            else (NiCServer, MgmtServer)
         self.servers = {}
-        self.servers = {nic_addr: NiCServer(nic_addr, ovs_bridge, binding_port)
+        self.servers = {nic_addr: nic_server_class(nic_addr, ovs_bridge, binding_port)
                         for nic_addr, ovs_bridge in self.ovs_bridges.items()}
-        self.mgmt_server = MgmtServer(
+        self.mgmt_server = mgmt_server_class(
             self.mgmt_port_address, binding_port, self.servers)
 
     def _find_all_server_nics(self):
@@ -1231,6 +1481,21 @@ class NiCSimulator(nic_simulator_grpc_service_pb2_grpc.DualToRActiveServicer):
                       self.mgmt_port_address)
         self.mgmt_server.start()
 
+    async def serve_async(self):
+        """Serve the NiC servers and the management server in the running event loop."""
+        for nic_addr, server in self.servers.items():
+            logging.debug("Starting gRPC server on NiC %s", nic_addr)
+            await server.start()
+        logging.debug("Starting gRPC server on mgmt port %s",
+                      self.mgmt_port_address)
+        try:
+            await self.mgmt_server.start()
+        finally:
+            for nic_addr, server in self.servers.items():
+                if server.started:
+                    logging.debug("Stopping gRPC server on NiC %s", nic_addr)
+                    await server.stop()
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -1277,6 +1542,13 @@ def parse_args():
         action="store_true",
         help="Duplicate NIC upstream traffic to both ToRs (default: False)",
     )
+    parser.add_argument(
+        "-a",
+        "--asyncio",
+        default=False,
+        action="store_true",
+        help="Serve all the gRPC servers by asyncio gRPC servers in one event loop (default: False)",
+    )
     args = parser.parse_args()
     return args
 
@@ -1329,7 +1601,12 @@ def main():
     loopback_ips = args.loopback_ips.split(",")
     if len(loopback_ips) != 3:
         raise ValueError("Invalid loopback ips: {loopback_ips}".format(loopback_ips=loopback_ips))
-    nic_simulator = NiCSimulator(args.vm_set, "mgmt", args.port, loopback_ips, args.duplicate_nic_upstream)
+    nic_simulator = NiCSimulator(args.vm_set, "mgmt", args.port, loopback_ips, args.duplicate_nic_upstream,
+                                 args.asyncio)
+    if args.asyncio:
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(nic_simulator.serve_async())
+        return
     nic_simulator.start_nic_servers()
     try:
         nic_simulator.start_mgmt_server()
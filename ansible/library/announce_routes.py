@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 
+import bisect
+import functools
+import hashlib
 import math
 import os
+import struct
+import tempfile
 import yaml
 import re
 import requests
@@ -44,6 +49,11 @@ Options:
     - option-name: path
       description: to figure out the path of topo_{}.yml
       required: False
+
+    - option-name: cache_dir
+      description: directory to cache generated routes in. Generated routes are loaded from the cache when routes
+                   of the same topology parameters are announced again. No cache if empty.
+      required: False
 '''
 
 EXAMPLES = '''
@@ -70,6 +80,8 @@ LEAF_ASN_START = 64600
 TOR_ASN_START = 65500
 IPV4_BASE_PORT = 5000
 IPV6_BASE_PORT = 6000
+# Number of routes in a chunk of the request body streamed to exabgp http api
+STREAM_CHUNK_SIZE = 5000
 AGGREGATE_ROUTES_DEFAULT_VALUE = []
 IPV6_ADDRESS_PATTERN_DEFAULT_VALUE = '20%02X:%02X%02X:0:%02X::/64'
 ENABLE_IPV4_ROUTES_GENERATION_DEFAULT_VALUE = True
@@ -99,6 +111,69 @@ MX_SUBNET_PREFIX_LEN_V6 = 64
 M0_SUBNET_PREFIX_LEN_V6 = 64
 # Describe default start asn of M1s
 M1_ASN_START = 65200
+# Version of generated routes cached in files, should be increased when generated routes are changed
+ROUTES_CACHE_VERSION = 1
+
+# Directory of the route cache files, set by the 'cache_dir' option
+routes_cache_dir = None
+# Routes generated in this run, routes announced by different VMs are often the same
+routes_cache = {}
+
+
+def save_routes(cache_file, routes):
+    """
+    Saves routes to a cache file. Next hop and AS path are repeated by many routes, the file has a table of distinct
+    (next hop, AS path), and the index in the table of every route, so that the routes are loaded quickly.
+    """
+    attributes = {}
+    indexes = [attributes.setdefault(route[1:], len(attributes)) for route in routes]
+    cache_dir = os.path.dirname(cache_file)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    # Write to a temporary file then rename, concurrent runs never read a partial file
+    fd, tmp_file = tempfile.mkstemp(dir=cache_dir)
+    with os.fdopen(fd, "w") as f:
+        json.dump({"prefixes": "\n".join(route[0] for route in routes),
+                   "attributes": list(attributes),
+                   "indexes": indexes}, f)
+    os.rename(tmp_file, cache_file)
+
+
+def load_routes(cache_file):
+    with open(cache_file) as f:
+        data = json.load(f)
+    attributes = [tuple(attribute) for attribute in data["attributes"]]
+    prefixes = data["prefixes"].split("\n") if data["indexes"] else []
+    return tuple((prefix,) + attributes[index] for prefix, index in zip(prefixes, data["indexes"]))
+
+
+def cache_routes(func):
+    """
+    Caches routes generated by func, by its arguments.
+    Routes are cached in memory, and in files in routes_cache_dir if it is set.
+    Every call returns a new list, callers may change the list of routes.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = hashlib.sha1(repr((ROUTES_CACHE_VERSION, func.__name__, args, sorted(kwargs.items())))
+                           .encode("utf-8")).hexdigest()
+        routes = routes_cache.get(key)
+        cache_file = os.path.join(routes_cache_dir, key + ".json") if routes_cache_dir else None
+        if routes is None and cache_file and os.path.exists(cache_file):
+            try:
+                routes = load_routes(cache_file)
+            except (IOError, ValueError, KeyError) as e:
+                logging.debug("Failed to load routes from {}: {}".format(cache_file, repr(e)))
+        if routes is None:
+            routes = tuple(func(*args, **kwargs))
+            if cache_file:
+                try:
+                    save_routes(cache_file, routes)
+                except (IOError, OSError) as e:
+                    logging.debug("Failed to save routes to {}: {}".format(cache_file, repr(e)))
+        routes_cache[key] = routes
+        return list(routes)
+    return wrapper
 
 
 def wait_for_http(host_ip, http_port, timeout=10):
@@ -145,34 +220,85 @@ def read_topo(topo_name, path):
         return {}
 
 
-def change_routes(action, ptf_ip, port, routes):
-    messages = []
+def route_commands(action, routes):
     for prefix, nexthop, aspath in routes:
         if aspath:
-            messages.append(
-                "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath))
+            yield "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath)
         else:
-            messages.append(
-                "{} route {} next-hop {}".format(action, prefix, nexthop))
-    wait_for_http(ptf_ip, port, timeout=60)
-    url = "http://%s:%d" % (ptf_ip, port)
-    data = {"commands": ";".join(messages)}
+            yield "{} route {} next-hop {}".format(action, prefix, nexthop)
 
+
+def post_with_retry(url, data, **kwargs):
     # nosemgrep-next-line
     # Flaky error `ConnectionResetError(104, 'Connection reset by peer')` may happen while using `requests.post`
     # To avoid this error, we add sleep time before sending request.
     # We use a "backoff" algorithm here, the maximum retry times is five.
     # If one retry fails, we increase the waiting time.
+    # data may be a function returning a new generator of the request body for every try.
     for i in range(0, 5):
         try:
-            r = requests.post(url, data=data, timeout=360, proxies={"http": None, "https": None})
-            break
+            return requests.post(url, data=data() if callable(data) else data, timeout=360,
+                                 proxies={"http": None, "https": None}, **kwargs)
         except Exception as e:
             logging.debug("Got exception {}, will try to connect again".format(e))
             time.sleep(0.01 * (i+1))
             if i == 4:
                 raise e
 
+
+def stream_routes(action, ptf_ip, port, routes):
+    """
+    Streams routes to the exabgp http api in one request with chunked body, a chunk per STREAM_CHUNK_SIZE routes.
+    Commands are not joined into one big form, and the http api writes them to exabgp while they are being received.
+
+    Returns:
+        bool: False if the http api doesn't support streaming, then routes are not sent.
+    """
+    url = "http://%s:%d/stream" % (ptf_ip, port)
+    total = len(routes)
+
+    def body():
+        start_time = time.time()
+        for start in range(0, total, STREAM_CHUNK_SIZE):
+            chunk = routes[start:start + STREAM_CHUNK_SIZE]
+            yield "".join(cmd + "\n" for cmd in route_commands(action, chunk)).encode("utf-8")
+            # The chunk is sent when the next one is requested, sending blocks while exabgp is busy
+            sent = start + len(chunk)
+            logging.debug("Streamed {}/{} routes to {}, {:.0f} routes per second".format(
+                sent, total, url, sent / max(time.time() - start_time, 0.001)))
+
+    # Probe with an empty stream first. A server which doesn't take the stream responds without reading the body,
+    # and sending a large body to it could fail with broken pipe
+    r = post_with_retry(url, lambda: iter([]), headers={"Content-Type": "text/plain"})
+    if r.status_code in (404, 405, 411):
+        # http api of exabgp started before streaming was supported, or its server doesn't support chunked body
+        logging.debug("Streaming routes is not supported by {}, status_code={}".format(url, r.status_code))
+        return False
+
+    r = post_with_retry(url, body, headers={"Content-Type": "text/plain"})
+    if r.status_code != 200 or r.json().get("commands") != total:
+        raise Exception(
+            "Change routes failed: url={}, routes={}, r.status_code={}, r.reason={}, r.headers={}, r.text={}".format(
+                url,
+                total,
+                r.status_code,
+                r.reason,
+                r.headers,
+                r.text
+            )
+        )
+    return True
+
+
+def change_routes(action, ptf_ip, port, routes):
+    wait_for_http(ptf_ip, port, timeout=60)
+    if stream_routes(action, ptf_ip, port, routes):
+        return
+
+    url = "http://%s:%d" % (ptf_ip, port)
+    data = {"commands": ";".join(route_commands(action, routes))}
+    r = post_with_retry(url, data)
+
     if r.status_code != 200:
         raise Exception(
             "Change routes failed: url={}, data={}, r.status_code={}, r.reason={}, r.headers={}, r.text={}".format(
@@ -248,11 +374,22 @@ def get_uplink_router_as_path(uplink_router_type, spine_asn):
     return default_route_as_path
 
 
+def format_ip(version, ip):
+    """
+    Formats an integer ip the same way as str() of ipaddress objects, but much faster
+    """
+    if version == 4:
+        return socket.inet_ntoa(struct.pack("!I", ip))
+    if ip >> 32 == 0 or ip >> 32 == 0xffff:
+        # IPv4-compatible and IPv4-mapped addresses are formatted with dotted quad by inet_ntop
+        return str(ipaddress.IPv6Address(ip))
+    return socket.inet_ntop(socket.AF_INET6, struct.pack("!QQ", ip >> 64, ip & 0xffffffffffffffff))
+
+
 # Generate prefixs of route
 def generate_prefix(subnet_size, ip_base, offset):
-    ip = get_new_ip(ip_base, offset)
     prefixlen = (ip_base.max_prefixlen - int(math.log(subnet_size, 2)))
-    prefix = "{}/{}".format(ip, prefixlen)
+    prefix = "{}/{}".format(format_ip(ip_base.version, int(ip_base) + offset), prefixlen)
 
     return prefix
 
@@ -320,6 +457,7 @@ def generate_m0_downstream_routes(nexthop, mx_subnet_number, mx_subnet_size, m0_
     return routes
 
 
+@cache_routes
 def generate_m0_routes(nexthop, colo_number, m0_number, m0_subnet_number, m0_asn_start, router_type, m0_subnet_size,
                        mx_number, mx_subnet_number, ip_base, mx_subnet_size, mx_asn_start, mx_index):
     if router_type == "m1":
@@ -333,6 +471,7 @@ def generate_m0_routes(nexthop, colo_number, m0_number, m0_subnet_number, m0_asn
     return []
 
 
+@cache_routes
 def generate_routes(family, podset_number, tor_number, tor_subnet_number,
                     spine_asn, leaf_asn_start, tor_asn_start, nexthop,
                     nexthop_v6, tor_subnet_size, max_tor_subnet_number, topo,
@@ -350,109 +489,110 @@ def generate_routes(family, podset_number, tor_number, tor_subnet_number,
             if family in ["v6", "both"]:
                 routes.append(("::/0", nexthop_v6, default_route_as_path))
 
+    def is_advertised(podset, tor):
+        if router_type == "core":
+            # Advertise podset 3+ to T2 DUT
+            if podset < 3:
+                return False
+
+            # First 3 pods are advertised from T1 - so remove 3 from the total pods being advertised by T3
+            first_third_podset_number = int(
+                math.ceil((podset_number - 3) / 3.0))
+            second_third_podset_number = int(
+                math.ceil(((podset_number - 3) * 2) / 3.0))
+
+            if set_num is not None:
+                # For T2, we have 3 sets - 1 set advertises first 1/3 podsets,
+                # second set advertises second 1/3 podsets, and all VM's advertises the last 1/3 podsets
+                if podset <= first_third_podset_number and set_num != 0:
+                    return False
+                elif podset > first_third_podset_number and \
+                        podset < second_third_podset_number and set_num != 1:
+                    return False
+        if router_type == "spine" or router_type == "mgmtleaf":
+            # Skip podset 0 for T2
+            if podset == 0:
+                return False
+        elif router_type == "leaf":
+            if topo == 't2':
+                # Send routes for podset 0-2 (first 3 pods) to the T2 DUT
+                if podset > 2:
+                    return False
+
+                if set_num is not None:
+                    # For T2, we have 3 sets - 1 set advertises podset 1,
+                    # second set advertises podset 2, and all VM's advertises podset3
+                    if podset == 0 and set_num != 0:
+                        return False
+                    elif podset == 1 and set_num != 1:
+                        return False
+            elif topo == 't0-mclag':
+                if podset > 1:
+                    return False
+                if set_num is not None:
+                    if podset == 0 and set_num != 0:
+                        return False
+                    elif podset == 1 and set_num != 1:
+                        return False
+            else:
+                # Skip tor 0 podset 0 for T1
+                if podset == 0 and tor == 0:
+                    return False
+        elif router_type == "tor":
+            # Skip non podset 0 for T0
+            if podset != 0 or tor != tor_index:
+                return False
+        return True
+
+    prefixlen_v4 = (32 - int(math.log(tor_subnet_size, 2)))
+    # Skip subnet 0 (vlan ip) for M0
+    first_subnet = 1 if router_type == "tor" and topo == "m0" else 0
+
     # NOTE: Using large enough values (e.g., podset_number = 200,
     # us to overflow the 192.168.0.0/16 private address space here.
     # This should be fine for internal use, but may pose an issue if used otherwise
+    # Whether a route is advertised and its AS path only depend on podset and tor, so they are decided once for
+    # all subnets of a tor
     for podset in range(0, podset_number):
         for tor in range(0, tor_number):
-            for subnet in range(0, tor_subnet_number):
-                if router_type == "core":
-                    # Advertise podset 3+ to T2 DUT
-                    if podset < 3:
-                        continue
-
-                    # First 3 pods are advertised from T1 - so remove 3 from the total pods being advertised by T3
-                    first_third_podset_number = int(
-                        math.ceil((podset_number - 3) / 3.0))
-                    second_third_podset_number = int(
-                        math.ceil(((podset_number - 3) * 2) / 3.0))
-
-                    if set_num is not None:
-                        # For T2, we have 3 sets - 1 set advertises first 1/3 podsets,
-                        # second set advertises second 1/3 podsets, and all VM's advertises the last 1/3 podsets
-                        if podset <= first_third_podset_number and set_num != 0:
-                            continue
-                        elif podset > first_third_podset_number and \
-                                podset < second_third_podset_number and set_num != 1:
-                            continue
-                if router_type == "spine" or router_type == "mgmtleaf":
-                    # Skip podset 0 for T2
+            if not is_advertised(podset, tor):
+                continue
+
+            leaf_asn = leaf_asn_start + podset
+            tor_asn = tor_asn_start + tor
+
+            aspath = None
+            if router_type == "core":
+                aspath = "{} {}".format(leaf_asn, core_ra_asn)
+            elif router_type == "spine" or router_type == "mgmtleaf":
+                aspath = "{} {}".format(leaf_asn, tor_asn)
+            elif router_type == "leaf":
+                if topo == "t2":
+                    aspath = "{}".format(tor_asn)
+                elif topo == "t0-mclag":
+                    aspath = "{}".format(tor_asn)
+                else:
                     if podset == 0:
-                        continue
-                elif router_type == "leaf":
-                    if topo == 't2':
-                        # Send routes for podset 0-2 (first 3 pods) to the T2 DUT
-                        if podset > 2:
-                            continue
-
-                        if set_num is not None:
-                            # For T2, we have 3 sets - 1 set advertises podset 1,
-                            # second set advertises podset 2, and all VM's advertises podset3
-                            if podset == 0 and set_num != 0:
-                                continue
-                            elif podset == 1 and set_num != 1:
-                                continue
-                    elif topo == 't0-mclag':
-                        if podset > 1:
-                            continue
-                        if set_num is not None:
-                            if podset == 0 and set_num != 0:
-                                continue
-                            elif podset == 1 and set_num != 1:
-                                continue
+                        aspath = "{}".format(tor_asn)
                     else:
-                        # Skip tor 0 podset 0 for T1
-                        if podset == 0 and tor == 0:
-                            continue
-                elif router_type == "tor":
-                    # Skip non podset 0 for T0
-                    if podset != 0:
-                        continue
-                    # Skip subnet 0 (vlan ip) for M0
-                    elif topo == "m0" and subnet == 0:
-                        continue
-                    elif tor != tor_index:
-                        continue
-
-                suffix = ((podset * tor_number * max_tor_subnet_number * tor_subnet_size) +
-                          (tor * max_tor_subnet_number * tor_subnet_size) +
-                          (subnet * tor_subnet_size))
-                octet2 = (168 + int(suffix / (256 ** 2)))
-                octet1 = (192 + int(octet2 / 256))
+                        aspath = "{} {} {}".format(
+                            spine_asn, leaf_asn, tor_asn)
+
+            tor_suffix = ((podset * tor_number * max_tor_subnet_number * tor_subnet_size) +
+                          (tor * max_tor_subnet_number * tor_subnet_size))
+            for subnet in range(first_subnet, tor_subnet_number):
+                suffix = tor_suffix + subnet * tor_subnet_size
+                octet2 = (168 + suffix // (256 ** 2))
+                octet1 = (192 + octet2 // 256)
                 octet2 = (octet2 % 256)
-                octet3 = (int(suffix / 256) % 256)
+                octet3 = ((suffix // 256) % 256)
                 octet4 = (suffix % 256)
-                prefixlen_v4 = (32 - int(math.log(tor_subnet_size, 2)))
-
-                prefix = "{}.{}.{}.{}/{}".format(octet1,
-                                                 octet2, octet3, octet4, prefixlen_v4)
-                prefix_v6 = ipv6_address_pattern % (
-                    octet1, octet2, octet3, octet4)
-
-                leaf_asn = leaf_asn_start + podset
-                tor_asn = tor_asn_start + tor
-
-                aspath = None
-                if router_type == "core":
-                    aspath = "{} {}".format(leaf_asn, core_ra_asn)
-                elif router_type == "spine" or router_type == "mgmtleaf":
-                    aspath = "{} {}".format(leaf_asn, tor_asn)
-                elif router_type == "leaf":
-                    if topo == "t2":
-                        aspath = "{}".format(tor_asn)
-                    elif topo == "t0-mclag":
-                        aspath = "{}".format(tor_asn)
-                    else:
-                        if podset == 0:
-                            aspath = "{}".format(tor_asn)
-                        else:
-                            aspath = "{} {} {}".format(
-                                spine_asn, leaf_asn, tor_asn)
 
                 if family in ["v4", "both"]:
-                    routes.append((prefix, nexthop, aspath))
+                    routes.append(("{}.{}.{}.{}/{}".format(octet1, octet2, octet3, octet4, prefixlen_v4),
+                                   nexthop, aspath))
                 if family in ["v6", "both"]:
-                    routes.append((prefix_v6, nexthop_v6, aspath))
+                    routes.append((ipv6_address_pattern % (octet1, octet2, octet3, octet4), nexthop_v6, aspath))
 
     return routes
 
@@ -778,6 +918,7 @@ def generate_m0_mx_routes(mx_subnet_number, mx_subnet_size, mx_number, mx_asn_st
     return routes, prefix
 
 
+@cache_routes
 def generate_mx_routes(nexthop, colo_number, m0_number, m0_subnet_number, m0_asn_start, m0_subnet_size, mx_number,
                        mx_subnet_number, ip_base, mx_subnet_size, mx_asn_start, m1_asn):
     routes = []
@@ -1133,14 +1274,48 @@ def filterout_subnet_ipv6(aggregate_routes, candidate_routes):
     return filterout_subnet(ars_ipv6, candidate_routes)
 
 
+def prefix_to_interval(prefix):
+    """
+    Converts a prefix to (version, first ip, last ip) with integer ips.
+    """
+    ip, prefixlen = prefix.split("/")
+    if ":" in ip:
+        high, low = struct.unpack("!QQ", socket.inet_pton(socket.AF_INET6, ip))
+        version, first, bits = 6, (high << 64) | low, 128
+    else:
+        version, first, bits = 4, struct.unpack("!I", socket.inet_pton(socket.AF_INET, ip))[0], 32
+    return version, first, first | ((1 << (bits - int(prefixlen))) - 1)
+
+
 def filterout_subnet(aggregate_routes, candidate_routes):
-    subnets = []
-    for ar in aggregate_routes:
-        ar_net = ipaddress.ip_network(UNICODE_TYPE(ar[0]))
-        for cr in candidate_routes:
-            if ipaddress.ip_network(UNICODE_TYPE(cr[0])).subnet_of(ar_net):
-                subnets.append(cr)
-    return list(set(candidate_routes) - set(subnets))
+    """
+    Filters out candidate routes which are subnets of any aggregate route.
+    Aggregate prefixes are turned into sorted disjoint intervals of integer ips, then every candidate is checked
+    with a binary search, instead of comparing every candidate with every aggregate.
+    """
+    # Prefixes either contain one another or don't overlap, keep only the outermost ones.
+    # Sorted by first ip then by size, an outer prefix comes before the prefixes it contains
+    intervals = sorted((prefix_to_interval(ar[0]) for ar in aggregate_routes),
+                       key=lambda interval: (interval[0], interval[1], -interval[2]))
+    disjoint = []
+    for interval in intervals:
+        if disjoint and interval[0] == disjoint[-1][0] and interval[2] <= disjoint[-1][2]:
+            continue
+        disjoint.append(interval)
+
+    routes = []
+    seen = set()
+    for cr in candidate_routes:
+        if cr in seen:
+            continue
+        seen.add(cr)
+        version, first, last = prefix_to_interval(cr[0])
+        # The last aggregate starting at or before the candidate is the only one which could contain it
+        index = bisect.bisect_right(disjoint, (version, first, float("inf"))) - 1
+        if index >= 0 and disjoint[index][0] == version and disjoint[index][2] >= last:
+            continue
+        routes.append(cr)
+    return routes
 
 
 def main():
@@ -1152,13 +1327,17 @@ def main():
                         default='announce', choices=["announce", "withdraw"]),
             path=dict(required=False, type='str', default=''),
             dut_interfaces=dict(required=False, type='str', default=''),
-            log_path=dict(required=False, type='str', default='')
+            log_path=dict(required=False, type='str', default=''),
+            cache_dir=dict(required=False, type='str', default='')
         ),
         supports_check_mode=False)
 
     if module.params['log_path']:
         config_module_logging("announce_routes", log_path=module.params['log_path'])
 
+    global routes_cache_dir
+    routes_cache_dir = module.params['cache_dir'] or None
+
     topo_name = module.params['topo_name']
     ptf_ip = module.params['ptf_ip']
     action = module.params['action']
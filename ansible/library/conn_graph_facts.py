@@ -6,8 +6,13 @@ import yaml
 import os
 import logging
 import traceback
+import hashlib
+import inspect
 import ipaddress
+import sys
+import tempfile
 import six
+from six.moves import cPickle as pickle
 from operator import itemgetter
 from itertools import groupby
 from natsort import natsorted
@@ -17,7 +22,6 @@ try:
     from ansible.module_utils.debug_utils import config_module_logging
 except ImportError:
     # Add parent dir for using outside Ansible
-    import sys
     sys.path.append('..')
     from module_utils.port_utils import get_port_alias_to_name_map
     from module_utils.debug_utils import config_module_logging
@@ -56,6 +60,13 @@ options:
         host/hosts/anchor information.
         required: False
 
+    cache_dir:
+        Folder to cache the graphs built from the csv files in. A graph is loaded from the cache until its csv files
+        are changed, and an index of hostnames of the groups is kept to find the group of the hosts without building
+        graphs of the other groups. No cache if empty.
+        required: False
+        default: ~/.ansible/cache/conn_graph
+
     Mutually exclusive options: host, hosts, anchor
 
 Ansible_facts:
@@ -112,6 +123,14 @@ EXAMPLES = '''
 
 LAB_GRAPHFILE_PATH = "files/"
 LAB_GRAPH_GROUPS_FILE = "graph_groups.yml"
+LAB_GRAPH_CACHE_DIR = "~/.ansible/cache/conn_graph"
+# Version of graphs cached in files, should be increased when the graph built from csv files is changed
+LAB_GRAPH_CACHE_VERSION = 1
+
+# Directory of the graph cache files, set by the 'cache_dir' option
+lab_graph_cache_dir = None
+# Graphs loaded in this process, by path and group
+lab_graphs = {}
 
 
 class LabGraph(object):
@@ -124,7 +143,7 @@ class LabGraph(object):
         "bmc_links": "sonic_{}_bmc_links.csv",
     }
 
-    def __init__(self, path, group):
+    def __init__(self, path, group, graph_facts=None):
         self.path = path
         self.group = group
         self.csv_files = {k: os.path.join(self.path, v.format(group)) for k, v in self.SUPPORTED_CSV_FILES.items()}
@@ -133,6 +152,10 @@ class LabGraph(object):
         self._cache_port_name_to_alias = {}
 
         self.csv_facts = {}
+        if graph_facts is not None:
+            # Graph facts loaded from the cache, built from the same csv files
+            self.graph_facts = graph_facts
+            return
         self.read_csv_files()
 
         self.graph_facts = {}
@@ -503,6 +526,121 @@ class LabGraph(object):
         return (True, results)
 
 
+def _port_utils_digest():
+    """Digest of the port_utils source, graphs built with a different port alias map are not loaded from the cache"""
+    try:
+        source = inspect.getsource(sys.modules[get_port_alias_to_name_map.__module__])
+    except Exception:
+        source = ""
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+PORT_UTILS_DIGEST = _port_utils_digest()
+
+
+def graph_signature(path, group):
+    """Signature of the csv files of a group, it is changed when any of the csv files is changed"""
+    signature = [LAB_GRAPH_CACHE_VERSION, PORT_UTILS_DIGEST]
+    for k in sorted(LabGraph.SUPPORTED_CSV_FILES):
+        csv_file = os.path.abspath(os.path.join(path, LabGraph.SUPPORTED_CSV_FILES[k].format(group)))
+        try:
+            st = os.stat(csv_file)
+            signature.append((csv_file, st.st_size, st.st_mtime))
+        except OSError:
+            signature.append((csv_file, None, None))
+    return signature
+
+
+def _cache_file(path, name):
+    # Graph files of different folders are cached in different files
+    prefix = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(lab_graph_cache_dir, "{}_{}.pickle".format(prefix, name))
+
+
+def load_cache(path, name, signature):
+    if not lab_graph_cache_dir:
+        return None
+    cache_file = _cache_file(path, name)
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, "rb") as f:
+            cached = pickle.load(f)
+        if cached["signature"] == signature:
+            return cached["data"]
+    except Exception as e:
+        logging.debug("Failed to load cache {}: {}".format(cache_file, repr(e)))
+    return None
+
+
+def save_cache(path, name, signature, data):
+    if not lab_graph_cache_dir:
+        return
+    cache_file = _cache_file(path, name)
+    try:
+        if not os.path.isdir(lab_graph_cache_dir):
+            os.makedirs(lab_graph_cache_dir)
+        # Write to a temp file, then rename it, so that a module running in parallel never reads a partial file
+        fd, tmp_file = tempfile.mkstemp(dir=lab_graph_cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"signature": signature, "data": data}, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, cache_file)
+    except Exception as e:
+        logging.debug("Failed to save cache {}: {}".format(cache_file, repr(e)))
+
+
+def load_graph(path, group, signature=None):
+    """Load the graph of a group, from the cache if its csv files are not changed
+
+    Args:
+        path (str): Folder of the csv graph files
+        group (str): Group of the csv files
+        signature (list, optional): Signature of the csv files of the group, got by graph_signature.
+
+    Returns:
+        obj: Instance of LabGraph
+    """
+    if signature is None:
+        signature = graph_signature(path, group)
+    key = (os.path.abspath(path), group)
+    lab_graph, cached_signature = lab_graphs.get(key, (None, None))
+    if lab_graph is not None and cached_signature == signature:
+        return lab_graph
+
+    graph_facts = load_cache(path, group, signature)
+    if graph_facts is not None:
+        logging.debug("Loaded lab graph of group {} from cache".format(group))
+        lab_graph = LabGraph(path, group, graph_facts=graph_facts)
+    else:
+        lab_graph = LabGraph(path, group)
+        save_cache(path, group, signature, lab_graph.graph_facts)
+    lab_graphs[key] = (lab_graph, signature)
+    return lab_graph
+
+
+def load_graph_index(path, graph_groups):
+    """Get hostnames of every group, built graphs of groups are cached, so that only changed groups are built
+
+    Returns:
+        dict: The groups of every hostname, in the order of graph_groups
+    """
+    index = load_cache(path, "index", LAB_GRAPH_CACHE_VERSION) or {}
+    changed = False
+    host_groups = {}
+    for group in graph_groups:
+        signature = graph_signature(path, group)
+        if group not in index or index[group][0] != signature:
+            logging.debug("Building graph index of group {}".format(group))
+            lab_graph = load_graph(path, group, signature)
+            index[group] = (signature, list(lab_graph.graph_facts["devices"].keys()))
+            changed = True
+        for hostname in index[group][1]:
+            host_groups.setdefault(hostname, []).append(group)
+    if changed:
+        save_cache(path, "index", LAB_GRAPH_CACHE_VERSION, index)
+    return host_groups
+
+
 def find_graph(hostnames, part=False):
     """Find the graph file for the target device
 
@@ -518,31 +656,31 @@ def find_graph(hostnames, part=False):
     with open(graph_group_file) as fd:
         graph_groups = yaml.safe_load(fd)
 
-    target_graph = None
+    host_groups = load_graph_index(LAB_GRAPHFILE_PATH, graph_groups)
+    # Number of the hosts in every group
+    in_graph_counts = {}
+    for hostname in set(hostnames):
+        for group in host_groups.get(hostname, []):
+            in_graph_counts[group] = in_graph_counts.get(group, 0) + 1
+
     target_group = None
     for group in graph_groups:
         logging.debug("Looking at graph files of group {} for hosts {}".format(group, hostnames))
-        lab_graph = LabGraph(LAB_GRAPHFILE_PATH, group)
-        graph_hostnames = set(lab_graph.graph_facts["devices"].keys())
-        logging.debug("For graph group {}, got hostnames {}".format(group, graph_hostnames))
-
         if not part:
-            if set(hostnames) <= graph_hostnames:
-                target_graph = lab_graph
+            if in_graph_counts.get(group, 0) == len(set(hostnames)):
                 target_group = group
                 break
         else:
             THRESHOLD = 0.8
-            in_graph_hostnames = set(hostnames).intersection(graph_hostnames)
-            if len(in_graph_hostnames) * 1.0 / len(hostnames) >= THRESHOLD:
-                target_graph = lab_graph
+            if in_graph_counts.get(group, 0) * 1.0 / len(hostnames) >= THRESHOLD:
                 target_group = group
                 break
 
-    if target_graph is not None:
-        logging.debug("Returning lab graph of group {} for hosts {}".format(target_group, hostnames))
+    if target_group is None:
+        return None
 
-    return target_graph
+    logging.debug("Returning lab graph of group {} for hosts {}".format(target_group, hostnames))
+    return load_graph(LAB_GRAPHFILE_PATH, target_group)
 
 
 def main():
@@ -554,6 +692,7 @@ def main():
             group=dict(required=False),
             anchor=dict(required=False, type='list'),
             ignore_errors=dict(required=False, type='bool', default=False),
+            cache_dir=dict(required=False, type='str', default=LAB_GRAPH_CACHE_DIR),
         ),
         mutually_exclusive=[['host', 'hosts', 'anchor']],
         supports_check_mode=True
@@ -576,8 +715,11 @@ def main():
             global LAB_GRAPHFILE_PATH
             LAB_GRAPHFILE_PATH = m_args['filepath']
 
+        global lab_graph_cache_dir
+        lab_graph_cache_dir = os.path.expanduser(m_args["cache_dir"]) if m_args["cache_dir"] else None
+
         if m_args["group"]:
-            lab_graph = LabGraph(LAB_GRAPHFILE_PATH, m_args["group"])
+            lab_graph = load_graph(LAB_GRAPHFILE_PATH, m_args["group"])
         else:
             # When calling passed in anchor instead of hostnames,
             # the caller is asking to return the whole graph. This
@@ -47,8 +47,9 @@ EXAMPLES = '''
 DEFAULT_BGP_LISTEN_PORT = 179
 
 http_api_py = '''\
-from flask import Flask, request
+from flask import Flask, request, jsonify
 import sys
+import threading
 import six
 
 #Disable banner msg from app.run, or the output might be caught by exabgp and run as command
@@ -72,11 +73,47 @@ def run_command():
         cmds = request.form['commands'].split(';')
     else:
         cmds = [ request.form['command'] ]
-    for cmd in cmds:
-        sys.stdout.write("%s\\n" % cmd)
-    sys.stdout.flush()
+    write_commands(cmds)
     return "OK\\n"
 
+# Size of the pieces the request body of /stream is read by, commands are written to exabgp per piece
+STREAM_READ_SIZE = 256 * 1024
+
+stdout_lock = threading.Lock()
+
+def write_commands(cmds):
+    # Commands of concurrent requests must not be interleaved in the middle of a line
+    with stdout_lock:
+        sys.stdout.write("".join("%s\\n" % cmd for cmd in cmds))
+        sys.stdout.flush()
+
+# Setup a route to stream commands, one command per line in a chunked request body.
+# The request body is read piece by piece, and the complete lines of every piece are written to exabgp in one
+# write. Writing blocks while exabgp is busy reading its API pipe, then the request is not read further either,
+# so the client is held back by TCP flow control instead of piling up commands in memory.
+@app.route('/stream', methods=['POST'])
+def stream_commands():
+    if not request.environ.get('wsgi.input_terminated'):
+        # The server doesn't decode chunked request body, client should post a form to '/' instead
+        return "Chunked request body is not supported\\n", 411
+    stream = request.environ['wsgi.input']
+    count = 0
+    pending = b''
+    while True:
+        data = stream.read(STREAM_READ_SIZE)
+        if not data:
+            break
+        lines = (pending + data).split(b'\\n')
+        pending = lines.pop()
+        cmds = [line.decode('utf-8') for line in lines if line.strip()]
+        if cmds:
+            write_commands(cmds)
+            count += len(cmds)
+    if pending.strip():
+        write_commands([pending.decode('utf-8')])
+        count += 1
+    return jsonify(commands=count)
+
 if __name__ == '__main__':
     # with werkzeug 3.x the default size of max_form_memory_size
     # is 500K. Routes reach a bit beyond that and the client
@@ -1,7 +1,5 @@
 import re
-import six
 
-from ipaddress import ip_address, ip_network
 from lpm import LpmDict
 
 # These subnets are excluded from FIB test
@@ -57,31 +55,31 @@ class Fib():
         # filter out empty lines and lines starting with '#'
         pattern = re.compile("^#.*$|^[ \t]*$")
 
+        # Routes usually share a few next hops, parse each distinct next hop once and share the NextHop object
+        next_hops = {}
+        ipv4_routes = []
+        ipv6_routes = []
         with open(file_path, 'r') as f:
-            for line in f.readlines():
+            for line in f:
                 if pattern.match(line):
                     continue
-                entry = line.split(' ', 1)
-                prefix = ip_network(six.text_type(entry[0]))
-                next_hop = self.NextHop(entry[1])
-                if prefix.version == 4:
-                    self._ipv4_lpm_dict[str(prefix)] = next_hop
-                elif prefix.version == 6:
-                    self._ipv6_lpm_dict[str(prefix)] = next_hop
+                prefix, next_hop = line.split(' ', 1)
+                if next_hop not in next_hops:
+                    next_hops[next_hop] = self.NextHop(next_hop)
+                routes = ipv6_routes if ':' in prefix else ipv4_routes
+                routes.append((prefix, next_hops[next_hop]))
+        self._ipv4_lpm_dict.update(ipv4_routes)
+        self._ipv6_lpm_dict.update(ipv6_routes)
+
+    def _lpm_dict(self, ip):
+        ip = str(ip)
+        return self._ipv6_lpm_dict if ':' in ip else self._ipv4_lpm_dict
 
     def __getitem__(self, ip):
-        ip = ip_address(six.text_type(ip))
-        if ip.version == 4:
-            return self._ipv4_lpm_dict[str(ip)]
-        elif ip.version == 6:
-            return self._ipv6_lpm_dict[str(ip)]
+        return self._lpm_dict(ip)[str(ip)]
 
     def __contains__(self, ip):
-        ip_obj = ip_address(six.text_type(ip))
-        if ip_obj.version == 4:
-            return self._ipv4_lpm_dict.contains(ip)
-        elif ip_obj.version == 6:
-            return self._ipv6_lpm_dict.contains(ip)
+        return self._lpm_dict(ip).contains(str(ip))
 
     def ipv4_ranges(self):
         return self._ipv4_lpm_dict.ranges()
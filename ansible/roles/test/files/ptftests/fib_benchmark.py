@@ -0,0 +1,79 @@
+'''
+Description:    Benchmark of loading a FIB file and segmenting the IP space into ranges with Fib.
+
+                A FIB file of random IPv4 and IPv6 prefixes is generated, then loaded by Fib. Ranges are sampled and
+                iterated the way fib_test does, and random IPs of the ranges are looked up.
+
+Usage:          python fib_benchmark.py --count 1000000
+                python fib_benchmark.py --count 100000 --ipv6-ratio 0.5
+'''
+import argparse
+import os
+import random
+import resource
+import socket
+import struct
+import sys
+import tempfile
+import time
+
+from fib import Fib
+
+
+def random_prefix(ipv6):
+    if ipv6:
+        prefixlen = random.randint(16, 64)
+        first = random.getrandbits(prefixlen) << (128 - prefixlen)
+        return '{}/{}'.format(socket.inet_ntop(socket.AF_INET6, struct.pack('!QQ', first >> 64, first & (2**64 - 1))),
+                              prefixlen)
+    prefixlen = random.randint(8, 32)
+    first = random.getrandbits(prefixlen) << (32 - prefixlen)
+    return '{}/{}'.format(socket.inet_ntop(socket.AF_INET, struct.pack('!I', first)), prefixlen)
+
+
+def write_fib_file(path, args):
+    with open(path, 'w') as f:
+        for _ in range(args.count):
+            next_hops = ' '.join('[{}]'.format(port) for port in random.sample(range(32), 4))
+            f.write('{} {}\n'.format(random_prefix(random.random() < args.ipv6_ratio), next_hops))
+
+
+def timed(name, func):
+    start = time.time()
+    result = func()
+    print('{:<24} {:.3f}s'.format(name, time.time() - start))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark loading FIB and segmenting IP space with Fib')
+    parser.add_argument('--count', type=int, default=1000000, help='Number of prefixes')
+    parser.add_argument('--ipv6-ratio', type=float, default=0.3, help='Ratio of IPv6 prefixes')
+    parser.add_argument('--lookups', type=int, default=100000, help='Number of lookups')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.txt')
+    os.close(fd)
+    try:
+        write_fib_file(path, args)
+        fib = timed('load', lambda: Fib(path))
+    finally:
+        os.remove(path)
+
+    for name, get_ranges in (('ipv4', fib.ipv4_ranges), ('ipv6', fib.ipv6_ranges)):
+        ip_ranges = timed(name + ' ranges', get_ranges)
+        print('{:<24} {}'.format(name + ' range count', len(ip_ranges)))
+        if len(ip_ranges) > 150:
+            timed(name + ' sample', lambda: ip_ranges[:100] + random.sample(ip_ranges[100:], 50))
+        timed(name + ' iterate', lambda: sum(1 for _ in ip_ranges))
+        ips = timed(name + ' random ips', lambda: [random.choice(ip_ranges).get_random_ip()
+                                                   for _ in range(args.lookups)])
+        timed(name + ' lookups', lambda: [fib[ip] for ip in ips if ip in fib])
+
+    # ru_maxrss is in kilobytes on Linux
+    print('{:<24} {:.0f}MB'.format('max rss', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
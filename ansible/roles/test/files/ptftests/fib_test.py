@@ -26,6 +26,8 @@ import json
 import itertools
 import fib
 import macsec
+import packet_burst
+import packet_template
 
 import ptf
 import ptf.packet as scapy
@@ -115,6 +117,8 @@ class FibTest(BaseTest):
          - dst_vid                vlan tag id of dst pkts. Default: None(untag)
          - ignore_ttl:            mask the ttl field in the expected packet
          - single_fib_for_duts:   have a single fib file for all DUTs in multi-dut case. Default: False
+         - pipelined:             send the packets for checking balancing in bursts. Default: False
+         - burst_size:            max number of packets in a burst. Default: 64
         '''
         self.dataplane = ptf.dataplane_instance
         self.asic_type = self.test_params.get('asic_type')
@@ -149,6 +153,11 @@ class FibTest(BaseTest):
         self.balancing_test_number = self.test_params.get(
             'balancing_test_number', self.DEFAULT_BALANCING_TEST_NUMBER)
         self.balancing_test_count = 0
+        # Send the packets for checking balancing in bursts instead of one by one
+        self.pipelined = self.test_params.get('pipelined', False)
+        self.burst_size = self.test_params.get(
+            'burst_size', packet_burst.PacketBurst.DEFAULT_BURST_SIZE)
+        self.packet_templates = {}
         self.switch_type = self.test_params.get(
             'switch_type', self.DEFAULT_SWITCH_TYPE)
 
@@ -190,7 +199,7 @@ class FibTest(BaseTest):
                 covered_ip_ranges = ip_ranges[:100] + \
                     random.sample(ip_ranges[100:], 50)
             else:
-                covered_ip_ranges = ip_ranges[:]
+                covered_ip_ranges = list(ip_ranges)
 
             for ip_range in covered_ip_ranges:
                 if ip_range.get_first_ip() in dut_fib:
@@ -294,11 +303,16 @@ class FibTest(BaseTest):
                 # Change balancing_test_times according to number of next hop groups
                 logging.info('Checking ip range balancing {}, src_port={}, exp_ports={}, dst_ip={}, dut_index={}'
                              .format(ip_range, src_port, exp_port_lists, dst_ip, dut_index))
-                for i in range(0, self.balancing_test_times*len(list(itertools.chain(*exp_port_lists)))):
-                    (matched_port, _) = self.check_ip_route(
-                        src_port, dst_ip, exp_port_lists, ipv4)
-                    hit_count_map[matched_port] = hit_count_map.get(
-                        matched_port, 0) + 1
+                count = self.balancing_test_times*len(list(itertools.chain(*exp_port_lists)))
+                if self.pipelined:
+                    hit_count_map = self.check_ip_route_burst(
+                        src_port, dst_ip, exp_port_lists, count, ipv4)
+                else:
+                    for i in range(0, count):
+                        (matched_port, _) = self.check_ip_route(
+                            src_port, dst_ip, exp_port_lists, ipv4)
+                        hit_count_map[matched_port] = hit_count_map.get(
+                            matched_port, 0) + 1
                 for next_hop in next_hops:
                     # only check balance on a DUT
                     self.check_hit_count_map(
@@ -325,6 +339,101 @@ class FibTest(BaseTest):
 
         return (matched_port, received)
 
+    def check_ip_route_burst(self, src_port, dst_ip_addr, dst_port_lists, count, ipv4=True):
+        '''
+        @summary: Send packets to a destination IP in bursts and count the packets received on each port.
+        @param src_port: index of port to use for sending packets to switch
+        @param dst_ip_addr: destination IP to build packets with.
+        @param dst_port_lists: list of ports on which to expect packets to come back from the switch
+        @param count: number of packets
+        @return: dict of the number of packets received on each port
+        '''
+        dst_ports = list(itertools.chain(*dst_port_lists))
+        burst = packet_burst.PacketBurst(self, burst_size=self.burst_size)
+        for _ in range(count):
+            pkt, masked_exp_pkt, fields = self.build_packets(src_port, dst_ip_addr, ipv4=ipv4, tail=burst.next_tag())
+            burst.add(src_port, pkt, masked_exp_pkt, dst_ports)
+        ip_src = fields['ip_src']
+
+        hit_count_map = {}
+        for rcvd_port, rcvd_pkt in burst.run():
+            self.check_src_mac(src_port, dst_port_lists, rcvd_port, rcvd_pkt, ip_src, dst_ip_addr)
+            hit_count_map[rcvd_port] = hit_count_map.get(rcvd_port, 0) + 1
+        return hit_count_map
+
+    def get_packet_templates(self, ipv4=True):
+        '''
+        @summary: Get templates of the packet to send and the expected packet.
+        @param ipv4: templates of IPv4 packets, or IPv6 packets
+        @return (template of packet to send, template of expected packet with the mask)
+        '''
+        if ipv4 not in self.packet_templates:
+            if ipv4:
+                pkt = simple_tcp_packet(
+                    pktlen=self.pktlen,
+                    ip_ttl=self.ttl,
+                    ip_options=self.ip_options,
+                    dl_vlan_enable=self.src_vid is not None,
+                    vlan_vid=self.src_vid or 0)
+                exp_pkt = simple_tcp_packet(
+                    self.pktlen,
+                    ip_ttl=max(self.ttl-1, 0),
+                    ip_options=self.ip_options,
+                    dl_vlan_enable=self.dst_vid is not None,
+                    vlan_vid=self.dst_vid or 0)
+            else:
+                pkt = simple_tcpv6_packet(
+                    pktlen=self.pktlen,
+                    ipv6_hlim=self.ttl,
+                    dl_vlan_enable=self.src_vid is not None,
+                    vlan_vid=self.src_vid or 0)
+                exp_pkt = simple_tcpv6_packet(
+                    pktlen=self.pktlen,
+                    ipv6_hlim=max(self.ttl-1, 0),
+                    dl_vlan_enable=self.dst_vid is not None,
+                    vlan_vid=self.dst_vid or 0)
+            masked_exp_pkt = Mask(exp_pkt)
+            masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "dst")
+            masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "src")
+
+            # mask the chksum also if masking the ttl
+            if self.ignore_ttl:
+                if ipv4:
+                    masked_exp_pkt.set_do_not_care_scapy(scapy.IP, "ttl")
+                    masked_exp_pkt.set_do_not_care_scapy(scapy.IP, "chksum")
+                else:
+                    masked_exp_pkt.set_do_not_care_scapy(scapy.IPv6, "hlim")
+                masked_exp_pkt.set_do_not_care_scapy(scapy.TCP, "chksum")
+            self.packet_templates[ipv4] = (packet_template.PacketTemplate(pkt),
+                                           packet_template.PacketTemplate(exp_pkt, mask=masked_exp_pkt))
+        return self.packet_templates[ipv4]
+
+    def build_packets(self, src_port, dst_ip_addr, ipv4=True, tail=None):
+        '''
+        @summary: Build a packet to send and the masked expected packet.
+        @param src_port: index of port to use for sending packet to switch
+        @param dest_ip_addr: destination IP to build packet with.
+        @param ipv4: build IPv4 packets, or IPv6 packets
+        @param tail: bytes to put at the end of the payload of the packets
+        @return (pkt, masked_exp_pkt, fields), fields is a dict of the header fields of the packet sent
+        '''
+        pkt_template, exp_template = self.get_packet_templates(ipv4)
+        exp_fields = dict(
+            ip_src="30.0.0.1" if ipv4 else '2000:0030::1',
+            ip_dst=dst_ip_addr,
+            tcp_sport=random.randint(0, 65535),
+            tcp_dport=random.randint(0, 65535))
+        if tail:
+            exp_fields['tail'] = tail
+        fields = dict(
+            exp_fields,
+            eth_dst=self.ptf_test_port_map[str(src_port)]['target_dest_mac'],
+            eth_src=self.dataplane.get_mac(0, src_port))
+        pkt = pkt_template.build(**fields)
+        masked_exp_pkt = exp_template.build_masked(**exp_fields)
+
+        return pkt, masked_exp_pkt, fields
+
     def check_ipv4_route(self, src_port, dst_ip_addr, dst_port_lists):
         '''
         @summary: Check IPv4 route works.
@@ -332,52 +441,18 @@ class FibTest(BaseTest):
         @param dest_ip_addr: destination IP to build packet with.
         @param dst_port_lists: list of ports on which to expect packet to come back from the switch
         '''
-        sport = random.randint(0, 65535)
-        dport = random.randint(0, 65535)
-        ip_src = "30.0.0.1"
-        ip_dst = dst_ip_addr
-        src_mac = self.dataplane.get_mac(0, src_port)
-
-        router_mac = self.ptf_test_port_map[str(src_port)]['target_dest_mac']
-
-        pkt = simple_tcp_packet(
-            pktlen=self.pktlen,
-            eth_dst=router_mac,
-            eth_src=src_mac,
-            ip_src=ip_src,
-            ip_dst=ip_dst,
-            tcp_sport=sport,
-            tcp_dport=dport,
-            ip_ttl=self.ttl,
-            ip_options=self.ip_options,
-            dl_vlan_enable=self.src_vid is not None,
-            vlan_vid=self.src_vid or 0)
-        exp_pkt = simple_tcp_packet(
-            self.pktlen,
-            ip_src=ip_src,
-            ip_dst=ip_dst,
-            tcp_sport=sport,
-            tcp_dport=dport,
-            ip_ttl=max(self.ttl-1, 0),
-            ip_options=self.ip_options,
-            dl_vlan_enable=self.dst_vid is not None,
-            vlan_vid=self.dst_vid or 0)
-        masked_exp_pkt = Mask(exp_pkt)
-        masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "dst")
-        masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "src")
-
-        # mask the chksum also if masking the ttl
-        if self.ignore_ttl:
-            masked_exp_pkt.set_do_not_care_scapy(scapy.IP, "ttl")
-            masked_exp_pkt.set_do_not_care_scapy(scapy.IP, "chksum")
-            masked_exp_pkt.set_do_not_care_scapy(scapy.TCP, "chksum")
+        pkt, masked_exp_pkt, fields = self.build_packets(src_port, dst_ip_addr, ipv4=True)
+        ip_src = fields['ip_src']
+        ip_dst = fields['ip_dst']
+        sport = fields['tcp_sport']
+        dport = fields['tcp_dport']
 
         send_packet(self, src_port, pkt)
         logging.info('Sent Ether(src={}, dst={})/IP(src={}, dst={})/TCP(sport={}, dport={}) on port {}'
-                     .format(pkt.src,
-                             pkt.dst,
-                             pkt['IP'].src,
-                             pkt['IP'].dst,
+                     .format(fields['eth_src'],
+                             fields['eth_dst'],
+                             ip_src,
+                             ip_dst,
                              sport,
                              dport,
                              src_port))
@@ -399,23 +474,7 @@ class FibTest(BaseTest):
                 rcvd_port, len_rcvd_pkt))
             logging.info(
                 'Recieved packet with length of {}'.format(len_rcvd_pkt))
-            exp_src_mac = None
-            if len(self.ptf_test_port_map[str(rcvd_port)]["target_src_mac"]) > 1:
-                # active-active dualtor, the packet could be received from either ToR, so use the received
-                # port to find the corresponding ToR
-                for dut_index, port_list in enumerate(dst_port_lists):
-                    if rcvd_port in port_list:
-                        exp_src_mac = self.ptf_test_port_map[str(
-                            rcvd_port)]["target_src_mac"][dut_index]
-            else:
-                exp_src_mac = self.ptf_test_port_map[str(
-                    rcvd_port)]["target_src_mac"][0]
-            actual_src_mac = scapy.Ether(rcvd_pkt).src
-            if exp_src_mac != actual_src_mac:
-                raise Exception(
-                    "Pkt sent from {} to {} on port {} was rcvd pkt on {} which is one of the expected ports, "
-                    "but the src mac doesn't match, expected {}, got {}".
-                    format(ip_src, ip_dst, src_port, rcvd_port, exp_src_mac, actual_src_mac))
+            self.check_src_mac(src_port, dst_port_lists, rcvd_port, rcvd_pkt, ip_src, ip_dst)
             return (rcvd_port, rcvd_pkt)
         elif self.pkt_action == self.ACTION_DROP:
             verify_no_packet_any(self, masked_exp_pkt, dst_ports)
@@ -430,49 +489,18 @@ class FibTest(BaseTest):
         @param dst_port_lists: list of ports on which to expect packet to come back from the switch
         @return Boolean
         '''
-        sport = random.randint(0, 65535)
-        dport = random.randint(0, 65535)
-        ip_src = '2000:0030::1'
-        ip_dst = dst_ip_addr
-        src_mac = self.dataplane.get_mac(0, src_port)
-
-        router_mac = self.ptf_test_port_map[str(src_port)]['target_dest_mac']
-
-        pkt = simple_tcpv6_packet(
-            pktlen=self.pktlen,
-            eth_dst=router_mac,
-            eth_src=src_mac,
-            ipv6_dst=ip_dst,
-            ipv6_src=ip_src,
-            tcp_sport=sport,
-            tcp_dport=dport,
-            ipv6_hlim=self.ttl,
-            dl_vlan_enable=self.src_vid is not None,
-            vlan_vid=self.src_vid or 0)
-        exp_pkt = simple_tcpv6_packet(
-            pktlen=self.pktlen,
-            ipv6_dst=ip_dst,
-            ipv6_src=ip_src,
-            tcp_sport=sport,
-            tcp_dport=dport,
-            ipv6_hlim=max(self.ttl-1, 0),
-            dl_vlan_enable=self.dst_vid is not None,
-            vlan_vid=self.dst_vid or 0)
-        masked_exp_pkt = Mask(exp_pkt)
-        masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "dst")
-        masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "src")
-
-        # mask the chksum also if masking the ttl
-        if self.ignore_ttl:
-            masked_exp_pkt.set_do_not_care_scapy(scapy.IPv6, "hlim")
-            masked_exp_pkt.set_do_not_care_scapy(scapy.TCP, "chksum")
+        pkt, masked_exp_pkt, fields = self.build_packets(src_port, dst_ip_addr, ipv4=False)
+        ip_src = fields['ip_src']
+        ip_dst = fields['ip_dst']
+        sport = fields['tcp_sport']
+        dport = fields['tcp_dport']
 
         send_packet(self, src_port, pkt)
         logging.info('Sent Ether(src={}, dst={})/IPv6(src={}, dst={})/TCP(sport={}, dport={}) on port {}'
-                     .format(pkt.src,
-                             pkt.dst,
-                             pkt['IPv6'].src,
-                             pkt['IPv6'].dst,
+                     .format(fields['eth_src'],
+                             fields['eth_dst'],
+                             ip_src,
+                             ip_dst,
                              sport,
                              dport,
                              src_port))
@@ -494,28 +522,34 @@ class FibTest(BaseTest):
                 rcvd_port, len_rcvd_pkt))
             logging.info(
                 'Recieved packet with length of {}'.format(len_rcvd_pkt))
-            exp_src_mac = None
-            if len(self.ptf_test_port_map[str(rcvd_port)]["target_src_mac"]) > 1:
-                # active-active dualtor, the packet could be received from either ToR, so use the received
-                # port to find the corresponding ToR
-                for dut_index, port_list in enumerate(dst_port_lists):
-                    if rcvd_port in port_list:
-                        exp_src_mac = self.ptf_test_port_map[str(
-                            rcvd_port)]["target_src_mac"][dut_index]
-            else:
-                exp_src_mac = self.ptf_test_port_map[str(
-                    rcvd_port)]["target_src_mac"][0]
-            actual_src_mac = scapy.Ether(rcvd_pkt).src
-            if exp_src_mac != actual_src_mac:
-                raise Exception(
-                    "Pkt sent from {} to {} on port {} was rcvd pkt on {} which is one of the expected ports, "
-                    "but the src mac doesn't match, expected {}, got {}".
-                    format(ip_src, ip_dst, src_port, rcvd_port, exp_src_mac, actual_src_mac))
+            self.check_src_mac(src_port, dst_port_lists, rcvd_port, rcvd_pkt, ip_src, ip_dst)
             return (rcvd_port, rcvd_pkt)
         elif self.pkt_action == self.ACTION_DROP:
             verify_no_packet_any(self, masked_exp_pkt, dst_ports)
             return (None, None)
 
+    def check_src_mac(self, src_port, dst_port_lists, rcvd_port, rcvd_pkt, ip_src, ip_dst):
+        '''
+        @summary: Check that the src mac of a received packet is the mac of the DUT which forwarded it.
+        '''
+        exp_src_mac = None
+        if len(self.ptf_test_port_map[str(rcvd_port)]["target_src_mac"]) > 1:
+            # active-active dualtor, the packet could be received from either ToR, so use the received
+            # port to find the corresponding ToR
+            for dut_index, port_list in enumerate(dst_port_lists):
+                if rcvd_port in port_list:
+                    exp_src_mac = self.ptf_test_port_map[str(
+                        rcvd_port)]["target_src_mac"][dut_index]
+        else:
+            exp_src_mac = self.ptf_test_port_map[str(
+                rcvd_port)]["target_src_mac"][0]
+        actual_src_mac = scapy.Ether(rcvd_pkt).src
+        if exp_src_mac != actual_src_mac:
+            raise Exception(
+                "Pkt sent from {} to {} on port {} was rcvd pkt on {} which is one of the expected ports, "
+                "but the src mac doesn't match, expected {}, got {}".
+                format(ip_src, ip_dst, src_port, rcvd_port, exp_src_mac, actual_src_mac))
+
     def check_within_expected_range(self, actual, expected):
         '''
         @summary: Check if the actual number is within the accepted range of the expected number
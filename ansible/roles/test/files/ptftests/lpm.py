@@ -1,9 +1,15 @@
 import random
-import six
+import socket
+import struct
 
-from ipaddress import ip_address, ip_network
+from ipaddress import IPv4Address, IPv6Address
 from SubnetTree import SubnetTree
 
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
 '''
 LpmDict is a class used in FIB test for LPM and IP segmentation.
 
@@ -14,11 +20,16 @@ segments from start to end according to the prefixes (networks) it reads.
 
 Initially, the whole IP space contains only one range. After inserting
 prefixes, the IP space is segmented into multiple ranges. The ranges()
-function returns all ranges in the LpmDict with a list of IpIntervals. The
+function returns all ranges in the LpmDict with a sequence of IpIntervals. The
 sub-class IpInterval then could be used to get the first/last/random IP within
 this range. It could also check the length of the range and if an IP is within
 this range.
 
+To scale to a large number of prefixes, prefixes and range boundaries are kept
+as integers packed into sorted byte strings instead of ipaddress objects. The
+boundaries are computed when ranges() is called after prefixes are changed,
+and IpInterval objects are only created when ranges are accessed.
+
 To achieve the LPM functionality, use the LpmDict as a dictionary and use
 [] operator to get the corresponding value using the key (IP).
 
@@ -26,6 +37,23 @@ Please check the test_lpm.py file to see the details of how this class works.
 '''
 
 
+def _pack_ipv4(ip):
+    return struct.pack('!I', ip)
+
+
+def _unpack_ipv4(data, offset=0):
+    return struct.unpack_from('!I', data, offset)[0]
+
+
+def _pack_ipv6(ip):
+    return struct.pack('!QQ', ip >> 64, ip & 0xffffffffffffffff)
+
+
+def _unpack_ipv6(data, offset=0):
+    high, low = struct.unpack_from('!QQ', data, offset)
+    return (high << 64) | low
+
+
 class LpmDict():
     class IpInterval:
         def __init__(self, s, e):
@@ -53,62 +81,156 @@ class LpmDict():
         def __str__(self):
             return str(self._start) + ' - ' + str(self._end)
 
+    class IpRanges(Sequence):
+        '''
+        Read-only sequence of the IpIntervals between sorted packed boundaries.
+        IpIntervals are created on access, and slicing returns a view without
+        copying the boundaries.
+        '''
+
+        def __init__(self, lpm_dict, boundaries, start=0, step=1, count=None):
+            self._lpm_dict = lpm_dict
+            self._boundaries = boundaries
+            self._total = len(boundaries) // lpm_dict._width
+            self._start = start
+            self._step = step
+            self._count = self._total if count is None else count
+
+        def __len__(self):
+            return self._count
+
+        def _interval(self, index):
+            lpm_dict = self._lpm_dict
+            start = lpm_dict._unpack(self._boundaries, index * lpm_dict._width)
+            if index + 1 < self._total:
+                end = lpm_dict._unpack(self._boundaries, (index + 1) * lpm_dict._width) - 1
+            else:
+                end = lpm_dict._max_ip
+            return LpmDict.IpInterval(lpm_dict._ip_class(start), lpm_dict._ip_class(end))
+
+        def __getitem__(self, index):
+            if isinstance(index, slice):
+                start, stop, step = index.indices(self._count)
+                count = max(0, (stop - start + step + (-1 if step > 0 else 1)) // step)
+                return LpmDict.IpRanges(self._lpm_dict, self._boundaries,
+                                        self._start + start * self._step, self._step * step, count)
+            if index < 0:
+                index += self._count
+            if not 0 <= index < self._count:
+                raise IndexError('range index out of range')
+            return self._interval(self._start + index * self._step)
+
+        def __iter__(self):
+            for index in range(self._count):
+                yield self._interval(self._start + index * self._step)
+
+        # Concatenation with lists, e.g. ip_ranges[:100] + random.sample(ip_ranges[100:], 50)
+        def __add__(self, other):
+            return list(self) + list(other)
+
+        def __radd__(self, other):
+            return list(other) + list(self)
+
     def __init__(self, ipv4=True):
         self._ipv4 = ipv4
-        self._prefix_set = set()
+        if ipv4:
+            self._family = socket.AF_INET
+            self._ip_class = IPv4Address
+            self._pack, self._unpack = _pack_ipv4, _unpack_ipv4
+        else:
+            self._family = socket.AF_INET6
+            self._ip_class = IPv6Address
+            self._pack, self._unpack = _pack_ipv6, _unpack_ipv6
+        self._bits = 32 if ipv4 else 128
+        self._width = self._bits // 8
+        self._max_ip = (1 << self._bits) - 1
         self._subnet_tree = SubnetTree()
-        # 0.0.0.0 is a non-routable meta-address that needs to be skipped
-        self._boundaries = {ip_address(u'0.0.0.0'): 1} if ipv4 else {
-            ip_address(u'::'): 1}
+        # Prefixes except the default route, each one is its packed first IP followed by a byte of its prefix
+        # length. _prefixes is sorted without duplicates, prefixes inserted later are appended to _new_prefixes
+        self._prefixes = b''
+        self._new_prefixes = bytearray()
+        # Sorted packed boundaries of the ranges, None if prefixes were changed since they were computed
+        self._boundaries = None
+
+    def _parse(self, key):
+        ip, _, prefixlen = key.partition('/')
+        try:
+            first = self._unpack(socket.inet_pton(self._family, ip))
+            prefixlen = int(prefixlen) if prefixlen else self._bits
+        except (socket.error, ValueError):
+            raise ValueError('{} does not appear to be an IPv{} network'.format(key, 4 if self._ipv4 else 6))
+        if not 0 <= prefixlen <= self._bits:
+            raise ValueError('{} has invalid prefix length'.format(key))
+        if first & ((1 << (self._bits - prefixlen)) - 1):
+            raise ValueError('{} has host bits set'.format(key))
+        return first, prefixlen
+
+    def _insert(self, key, value):
+        first, prefixlen = self._parse(key)
+        if prefixlen:
+            self._new_prefixes += self._pack(first) + struct.pack('!B', prefixlen)
+        self._subnet_tree[key] = value
+
+    def _merge(self):
+        if not self._new_prefixes:
+            return
+        size = self._width + 1
+        prefixes = set(self._prefixes[i:i + size] for i in range(0, len(self._prefixes), size))
+        new_prefixes = bytes(self._new_prefixes)
+        prefixes.update(new_prefixes[i:i + size] for i in range(0, len(new_prefixes), size))
+        # Packed prefixes are sorted by first IP, then by prefix length
+        self._prefixes = b''.join(sorted(prefixes))
+        self._new_prefixes = bytearray()
 
     def __setitem__(self, key, value):
-        prefix = ip_network(six.text_type(key))
-        # add the current key to self._prefix_set only when it is not the default route and it is not a duplicate key
-        if prefix.prefixlen and key not in self._prefix_set:
-            boundary = prefix[0]
-            self._boundaries[boundary] = self._boundaries.get(boundary, 0) + 1
-            if prefix[-1] != ip_address(u'255.255.255.255') \
-                    and prefix[-1] != ip_address(u'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'):
-                next_boundary = prefix[-1] + 1
-                self._boundaries[next_boundary] = self._boundaries.get(
-                    next_boundary, 0) + 1
-            self._prefix_set.add(key)
-        self._subnet_tree.__setitem__(key, value)
+        self._insert(key, value)
+        self._boundaries = None
+
+    def update(self, items):
+        '''
+        Bulk load an iterable of (prefix, value) pairs.
+        '''
+        for key, value in items:
+            self._insert(key, value)
+        self._boundaries = None
 
     def __getitem__(self, key):
         return self._subnet_tree[key]
 
     def __delitem__(self, key):
-        if '/0' not in key:
-            prefix = ip_network(six.text_type(key))
-            boundary = prefix[0]
-            next_boundary = prefix[-1] + 1
-            self._boundaries[boundary] = self._boundaries.get(boundary) - 1
-            if not self._boundaries[boundary]:
-                del self._boundaries[boundary]
-            self._boundaries[next_boundary] = self._boundaries.get(
-                next_boundary) - 1
-            if not self._boundaries[next_boundary]:
-                del self._boundaries[next_boundary]
-            self._prefix_set.remove(key)
+        first, prefixlen = self._parse(key)
+        if prefixlen:
+            self._merge()
+            size = self._width + 1
+            prefix = self._pack(first) + struct.pack('!B', prefixlen)
+            low, high = 0, len(self._prefixes) // size
+            while low < high:
+                middle = (low + high) // 2
+                if self._prefixes[middle * size:(middle + 1) * size] < prefix:
+                    low = middle + 1
+                else:
+                    high = middle
+            if self._prefixes[low * size:(low + 1) * size] != prefix:
+                raise KeyError(key)
+            self._prefixes = self._prefixes[:low * size] + self._prefixes[(low + 1) * size:]
+            self._boundaries = None
         self._subnet_tree.__delitem__(key)
 
     def ranges(self):
-        sorted_boundaries = sorted(self._boundaries.keys())
-        ranges = []
-        for index, boundary in enumerate(sorted_boundaries):
-            if index != len(sorted_boundaries) - 1:
-                interval = self.IpInterval(
-                    sorted_boundaries[index], sorted_boundaries[index + 1] - 1)
-            else:
-                if self._ipv4:
-                    interval = self.IpInterval(
-                        sorted_boundaries[index], ip_address(u'255.255.255.255'))
-                else:
-                    interval = self.IpInterval(sorted_boundaries[index], ip_address(
-                        u'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'))
-            ranges.append(interval)
-        return ranges
+        if self._boundaries is None:
+            self._merge()
+            size = self._width + 1
+            # 0.0.0.0 is a non-routable meta-address that needs to be skipped
+            boundaries = set([0])
+            for offset in range(0, len(self._prefixes), size):
+                first = self._unpack(self._prefixes, offset)
+                prefixlen = struct.unpack_from('!B', self._prefixes, offset + self._width)[0]
+                boundaries.add(first)
+                last = first | ((1 << (self._bits - prefixlen)) - 1)
+                if last != self._max_ip:
+                    boundaries.add(last + 1)
+            self._boundaries = b''.join(self._pack(boundary) for boundary in sorted(boundaries))
+        return self.IpRanges(self, self._boundaries)
 
     def contains(self, key):
         return key in self._subnet_tree
@@ -0,0 +1,173 @@
+'''
+Description:    Pipelined send and classify of test packets.
+
+                Checking forwarding of packets one by one with verify_packet_any_port costs at least one round trip
+                and the negative timeout for every packet. The PacketBurst sends a burst of packets back to back,
+                then drains the dataplane queues once. Every packet carries a tag with a flow id at the end of its
+                payload, so a received packet is classified to the flow it belongs to by the tag, no matter in
+                which order the packets arrive.
+
+Usage:          burst = PacketBurst(self)
+                for ...:
+                    burst.add(src_port, pkt, masked_exp_pkt, dst_ports)
+                for rcvd_port, rcvd_pkt in burst.run():
+                    ...
+'''
+import logging
+import os
+import struct
+import time
+
+import ptf.packet as scapy
+import ptf.testutils as testutils
+from ptf.mask import Mask
+
+
+class PacketBurst(object):
+    '''
+    @summary: A burst of test packets, each one is expected to be received on any port of a list of ports.
+    '''
+    MAGIC_LEN = 8
+    TAG_LEN = MAGIC_LEN + 4
+    DEFAULT_BURST_SIZE = 64
+
+    def __init__(self, test, burst_size=DEFAULT_BURST_SIZE, timeout=1, retries=1, device_number=0):
+        '''
+        @param test: the ptf test, used for sending packets, polling the dataplane and failing the test
+        @param burst_size: max number of packets sent back to back before the dataplane is drained. Should be
+                           smaller than qlen of ptf, or packets could be dropped from full dataplane queues
+        @param timeout: time in seconds to wait for packets of a burst after the last packet is sent
+        @param retries: number of times to send again the packets which were not received
+        @param device_number: ptf device number of the ports
+        '''
+        self.test = test
+        self.burst_size = burst_size
+        self.timeout = timeout
+        self.retries = retries
+        self.device_number = device_number
+        # Random magic of the burst, packets left in dataplane queues by earlier bursts are not mistaken
+        self.magic = os.urandom(self.MAGIC_LEN)
+        self.flows = []
+        # Masks built from a PacketTemplate share the list of care bytes
+        self._partials = {}
+
+    def next_tag(self):
+        '''
+        @summary: Get the tag of the next packet to be added, for tagging packets which are built as bytes.
+        '''
+        return self.magic + struct.pack('!I', len(self.flows))
+
+    def _tag(self, pkt, tag):
+        if isinstance(pkt, (bytes, bytearray)):
+            # Packet built as bytes should be tagged by the builder already
+            if not bytearray(pkt).endswith(tag):
+                raise Exception("Packet built as bytes doesn't end with the tag")
+            return
+        payload = pkt.lastlayer()
+        if len(getattr(payload, 'load', b'')) < self.TAG_LEN:
+            raise Exception("Payload of packet {} is too short to carry a tag".format(pkt.summary()))
+        payload.load = payload.load[:-self.TAG_LEN] + tag
+
+    def add(self, src_port, pkt, exp_pkt, dst_ports):
+        '''
+        @summary: Add a packet to the burst.
+        @param src_port: port to send the packet to
+        @param pkt: packet to send. A scapy packet must have a payload of at least TAG_LEN bytes, the tag is
+                    written to the end of it. A packet built as bytes must end with next_tag() already
+        @param exp_pkt: expected packet, a scapy packet or a Mask, its payload must end the same way as pkt
+        @param dst_ports: list of ports on which the packet is expected
+        @return: flow id of the packet, which is its index in the result of run()
+        '''
+        flow_id = len(self.flows)
+        tag = self.next_tag()
+        mask = exp_pkt if isinstance(exp_pkt, Mask) else Mask(exp_pkt)
+        self._tag(pkt, tag)
+        self._tag(mask.exp_pkt, tag)
+        self.flows.append({
+            'src_port': src_port,
+            'pkt': bytes(pkt),
+            'exp_pkt': bytearray(bytes(mask.exp_pkt)),
+            'mask': mask,
+            'partial': self._partial(mask),
+            'dst_ports': dst_ports
+        })
+        return flow_id
+
+    def _partial(self, mask):
+        key = id(mask.mask)
+        if key not in self._partials:
+            # The list is kept along with the result, so that its id is not reused
+            self._partials[key] = (mask.mask, [(i, care) for i, care in enumerate(mask.mask) if care != 0xff])
+        return self._partials[key][1]
+
+    def _match(self, flow, pkt):
+        exp_pkt = flow['exp_pkt']
+        if len(pkt) < len(exp_pkt) or (len(pkt) > len(exp_pkt) and not flow['mask'].ignore_extra_bytes):
+            return False
+        # Copy the don't care bits from the expected packet, then compare the whole packet at once
+        pkt = pkt[:len(exp_pkt)]
+        for i, care in flow['partial']:
+            pkt[i] = (pkt[i] & care) | (exp_pkt[i] & ~care & 0xff)
+        return pkt == exp_pkt
+
+    def _classify(self, port, pkt, pending, results):
+        pkt = bytearray(pkt)
+        pos = pkt.rfind(self.magic)
+        if pos < 0 or pos + self.TAG_LEN > len(pkt):
+            logging.debug('Ignore packet without tag of the burst received on port {}'.format(port))
+            return
+        flow_id = struct.unpack('!I', bytes(pkt[pos + self.MAGIC_LEN:pos + self.TAG_LEN]))[0]
+        if flow_id not in pending:
+            # A packet which was sent again is received twice
+            logging.debug('Ignore duplicated packet of flow {} received on port {}'.format(flow_id, port))
+            return
+        flow = self.flows[flow_id]
+        if port not in flow['dst_ports']:
+            self.test.fail('Packet of flow {} sent on port {} was received on port {}, but it should have arrived '
+                           'on one of these ports: {}'.format(flow_id, flow['src_port'], port, flow['dst_ports']))
+        if not self._match(flow, pkt):
+            self.test.fail('Packet of flow {} sent on port {} was received on port {}, but it is different from the '
+                           'expected packet.\nExpected:\n{}\nReceived:\n{}'.format(
+                               flow_id, flow['src_port'], port, flow['mask'], scapy.Ether(bytes(pkt)).summary()))
+        pending.discard(flow_id)
+        results[flow_id] = (port, bytes(pkt))
+
+    def _drain(self, waiting, pending, results):
+        deadline = time.time() + self.timeout
+        while not waiting.isdisjoint(pending):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            # dp_poll is looked up on every call, it is replaced by macsec module on MACsec testbeds
+            result = testutils.dp_poll(self.test, device_number=self.device_number, timeout=remaining)
+            if not isinstance(result, self.test.dataplane.PollSuccess):
+                break
+            self._classify(result.port, result.packet, pending, results)
+
+    def run(self):
+        '''
+        @summary: Send all the packets of the burst and check that they are received on the expected ports.
+        @return: list of (rcvd_port, rcvd_pkt) of every packet, in the order they were added
+        '''
+        results = [None] * len(self.flows)
+        # Flows sent but not received yet, a packet of an earlier burst could arrive late
+        pending = set()
+        to_send = list(range(len(self.flows)))
+        for attempt in range(self.retries + 1):
+            if attempt:
+                logging.error("{} packets weren't received, sending them again".format(len(to_send)))
+            for start in range(0, len(to_send), self.burst_size):
+                waiting = set(to_send[start:start + self.burst_size])
+                for flow_id in to_send[start:start + self.burst_size]:
+                    flow = self.flows[flow_id]
+                    testutils.send_packet(self.test, (self.device_number, flow['src_port']), flow['pkt'])
+                pending |= waiting
+                self._drain(waiting, pending, results)
+            to_send = [flow_id for flow_id in to_send if results[flow_id] is None]
+            if not to_send:
+                break
+
+        if to_send:
+            self.test.fail('{} of {} packets were not received, flow ids: {}'.format(
+                len(to_send), len(self.flows), to_send))
+        return results
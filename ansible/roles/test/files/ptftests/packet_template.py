@@ -0,0 +1,153 @@
+'''
+Description:    Packet templates for building many similar test packets.
+
+                Building a packet with scapy and serializing it costs much more CPU than sending it. A PacketTemplate
+                serializes a base packet once. Packets are then built by patching fields directly into a copy of the
+                bytes of the base packet, and the IP and TCP/UDP checksums are fixed up incrementally (RFC 1624).
+                A Mask of the base packet is computed once and shared by the masks of all the packets built.
+
+Usage:          template = PacketTemplate(simple_tcp_packet(), mask=masked_exp_pkt)
+                pkt = template.build(ip_dst='10.0.0.1', tcp_sport=1234)
+                masked_exp_pkt = template.build_masked(ip_dst='10.0.0.1', tcp_sport=1234)
+'''
+import binascii
+import copy
+import socket
+import struct
+
+import ptf.packet as scapy
+
+
+def _encode_mac(mac):
+    return bytearray(binascii.unhexlify(mac.replace(':', '')))
+
+
+def _encode_ipv4(ip):
+    return bytearray(socket.inet_pton(socket.AF_INET, str(ip)))
+
+
+def _encode_ipv6(ip):
+    return bytearray(socket.inet_pton(socket.AF_INET6, str(ip)))
+
+
+def _encode_u8(value):
+    return bytearray(struct.pack('!B', value))
+
+
+def _encode_u16(value):
+    return bytearray(struct.pack('!H', value))
+
+
+def _sum16(data):
+    if len(data) % 2:
+        # The last odd byte of a checksummed packet is padded with zero
+        data = data + b'\x00'
+    return sum(struct.unpack('!{}H'.format(len(data) // 2), bytes(data)))
+
+
+class PacketTemplate(object):
+    '''
+    @summary: Template of an Ethernet packet, with optional VLAN tag, IPv4 or IPv6 header, and TCP or UDP header.
+
+    Fields which can be patched are named after the arguments of the ptf simple_*_packet functions:
+    eth_dst, eth_src, vlan_vid, ip_src, ip_dst, ip_ttl, ip_proto, tcp_sport, tcp_dport, udp_sport, udp_dport.
+    For an IPv6 template, ip_ttl and ip_proto are the hop limit and next header. The 'tail' field replaces the
+    last bytes of the packet, which should be in the payload.
+    '''
+
+    def __init__(self, pkt, mask=None):
+        '''
+        @param pkt: scapy packet
+        @param mask: optional Mask of the packet, shared by the masks built by build_masked
+        '''
+        self.data = bytearray(bytes(pkt))
+        self.mask = mask
+        # name -> (offset, encoder, checksums affected by the field)
+        self.fields = {}
+        # checksum -> (offset of the checksum, offset the checksummed 16-bit words are aligned to)
+        checksums = {}
+        size = len(self.data)
+
+        self.fields['eth_dst'] = (0, _encode_mac, ())
+        self.fields['eth_src'] = (6, _encode_mac, ())
+        if scapy.Dot1Q in pkt:
+            self.fields['vlan_vid'] = (size - len(pkt[scapy.Dot1Q]), self._encode_vid, ())
+
+        ip = None
+        if scapy.IP in pkt:
+            ip = pkt[scapy.IP]
+            offset = size - len(ip)
+            checksums['ip'] = (offset + 10, offset)
+            self.fields['ip_ttl'] = (offset + 8, _encode_u8, ('ip',))
+            self.fields['ip_proto'] = (offset + 9, _encode_u8, ('ip',))
+            self.fields['ip_src'] = (offset + 12, _encode_ipv4, ('ip', 'l4'))
+            self.fields['ip_dst'] = (offset + 16, _encode_ipv4, ('ip', 'l4'))
+        elif scapy.IPv6 in pkt:
+            ip = pkt[scapy.IPv6]
+            offset = size - len(ip)
+            self.fields['ip_proto'] = (offset + 6, _encode_u8, ())
+            self.fields['ip_ttl'] = (offset + 7, _encode_u8, ())
+            self.fields['ip_src'] = (offset + 8, _encode_ipv6, ('l4',))
+            self.fields['ip_dst'] = (offset + 24, _encode_ipv6, ('l4',))
+
+        for l4, prefix, checksum_offset in ((scapy.TCP, 'tcp', 16), (scapy.UDP, 'udp', 6)):
+            if l4 in pkt:
+                offset = size - len(pkt[l4])
+                # Checksum of the packet is left as it is if the L4 header isn't right on top of the IP header,
+                # and a zero UDP checksum means that there is no checksum
+                if pkt[l4].underlayer is ip and (l4 is scapy.TCP or pkt[l4].chksum != 0):
+                    checksums['l4'] = (offset + checksum_offset, offset)
+                self.fields[prefix + '_sport'] = (offset, _encode_u16, ('l4',))
+                self.fields[prefix + '_dport'] = (offset + 2, _encode_u16, ('l4',))
+                break
+
+        for name, (offset, encoder, affected) in list(self.fields.items()):
+            self.fields[name] = (offset, encoder, tuple(checksums[c] for c in affected if c in checksums))
+        self.tail_checksums = (checksums['l4'],) if 'l4' in checksums else ()
+
+    def _encode_vid(self, vid):
+        offset = self.fields['vlan_vid'][0]
+        tci = struct.unpack('!H', bytes(self.data[offset:offset + 2]))[0]
+        return _encode_u16((tci & 0xf000) | (vid & 0x0fff))
+
+    @staticmethod
+    def _patch(data, offset, value, checksums):
+        end = offset + len(value)
+        for checksum_offset, base in checksums:
+            # Sum of the 16-bit words covering the changed bytes, before and after the change
+            start = offset - (offset - base) % 2
+            stop = end + (end - base) % 2
+            old = _sum16(data[start:stop])
+            new = _sum16(data[start:offset] + value + data[end:stop])
+            # HC' = ~(~HC + ~m + m'), RFC 1624. Sum of ~m over the words is (number of words * 0xffff - m)
+            total = (~((data[checksum_offset] << 8) | data[checksum_offset + 1]) & 0xffff) \
+                + (stop - start) // 2 * 0xffff - old + new
+            while total >> 16:
+                total = (total & 0xffff) + (total >> 16)
+            data[checksum_offset:checksum_offset + 2] = _encode_u16(~total & 0xffff)
+        data[offset:end] = value
+
+    def build(self, **values):
+        '''
+        @summary: Build a packet from the template.
+        @param values: values of the fields to patch
+        @return: bytearray of the packet
+        '''
+        data = bytearray(self.data)
+        for name, value in values.items():
+            if name == 'tail':
+                self._patch(data, len(data) - len(value), bytearray(value), self.tail_checksums)
+                continue
+            offset, encoder, checksums = self.fields[name]
+            self._patch(data, offset, encoder(value), checksums)
+        return data
+
+    def build_masked(self, **values):
+        '''
+        @summary: Build a packet from the template, and a Mask of it.
+        @param values: values of the fields to patch
+        @return: Mask of the packet, with the same care bits as the mask of the template
+        '''
+        mask = copy.copy(self.mask)
+        mask.exp_pkt = bytes(self.build(**values))
+        return mask
@@ -0,0 +1,105 @@
+'''
+Description:    Benchmark of building test packets with scapy and with PacketTemplate.
+
+                Packets are built the way fib_test builds them for every probe: the packet to send, and the masked
+                expected packet. Packets built by both ways are compared byte by byte.
+
+Usage:          python packet_template_benchmark.py --count 2000
+                python packet_template_benchmark.py --count 2000 --ipv6 --pktlen 9114
+'''
+import argparse
+import random
+import sys
+import time
+
+import ptf
+ptf.config.setdefault('disable_ipv6', False)
+
+import ptf.packet as scapy    # noqa: E402
+from ptf.mask import Mask    # noqa: E402
+from ptf.testutils import simple_tcp_packet, simple_tcpv6_packet    # noqa: E402
+
+from packet_template import PacketTemplate    # noqa: E402
+
+ROUTER_MAC = '00:11:22:33:44:55'
+SRC_MAC = '00:06:07:08:09:0a'
+
+
+def random_fields(ipv6):
+    if ipv6:
+        ip_dst = '20c0:a8{:02x}::{:x}'.format(random.randint(0, 255), random.randint(1, 65535))
+    else:
+        ip_dst = '10.{}.{}.{}'.format(random.randint(0, 255), random.randint(0, 255), random.randint(1, 254))
+    return dict(ip_dst=ip_dst, tcp_sport=random.randint(0, 65535), tcp_dport=random.randint(0, 65535))
+
+
+def build_scapy(args, fields):
+    if args.ipv6:
+        pkt = simple_tcpv6_packet(pktlen=args.pktlen, eth_dst=ROUTER_MAC, eth_src=SRC_MAC, ipv6_src='2000:0030::1',
+                                  ipv6_dst=fields['ip_dst'], tcp_sport=fields['tcp_sport'],
+                                  tcp_dport=fields['tcp_dport'], ipv6_hlim=64)
+        exp_pkt = simple_tcpv6_packet(pktlen=args.pktlen, ipv6_src='2000:0030::1', ipv6_dst=fields['ip_dst'],
+                                      tcp_sport=fields['tcp_sport'], tcp_dport=fields['tcp_dport'], ipv6_hlim=63)
+    else:
+        pkt = simple_tcp_packet(pktlen=args.pktlen, eth_dst=ROUTER_MAC, eth_src=SRC_MAC, ip_src='30.0.0.1',
+                                ip_dst=fields['ip_dst'], tcp_sport=fields['tcp_sport'],
+                                tcp_dport=fields['tcp_dport'], ip_ttl=64)
+        exp_pkt = simple_tcp_packet(args.pktlen, ip_src='30.0.0.1', ip_dst=fields['ip_dst'],
+                                    tcp_sport=fields['tcp_sport'], tcp_dport=fields['tcp_dport'], ip_ttl=63)
+    masked_exp_pkt = Mask(exp_pkt)
+    masked_exp_pkt.set_do_not_care_packet(scapy.Ether, "dst")
+    masked_exp_pkt.set_do_not_care_packet(scapy.Ether, "src")
+    # The packet is serialized when it is sent, and the expected packet when it is matched
+    return bytes(pkt), masked_exp_pkt
+
+
+def build_templates(args):
+    _, masked_exp_pkt = build_scapy(args, random_fields(args.ipv6))
+    ip_src = '2000:0030::1' if args.ipv6 else '30.0.0.1'
+    if args.ipv6:
+        pkt = simple_tcpv6_packet(pktlen=args.pktlen, eth_dst=ROUTER_MAC, eth_src=SRC_MAC, ipv6_src=ip_src,
+                                  ipv6_hlim=64)
+    else:
+        pkt = simple_tcp_packet(pktlen=args.pktlen, eth_dst=ROUTER_MAC, eth_src=SRC_MAC, ip_src=ip_src, ip_ttl=64)
+    return PacketTemplate(pkt), PacketTemplate(masked_exp_pkt.exp_pkt, mask=masked_exp_pkt)
+
+
+def build_template(templates, fields):
+    pkt_template, exp_template = templates
+    return bytes(pkt_template.build(**fields)), exp_template.build_masked(**fields)
+
+
+def timed(name, count, func):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print('{:<10} {} packets in {:.3f}s, {:.0f} packets per second'.format(name, count, elapsed, count / elapsed))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark building test packets with scapy and PacketTemplate')
+    parser.add_argument('--count', type=int, default=2000, help='Number of packets')
+    parser.add_argument('--pktlen', type=int, default=100, help='Length of packets')
+    parser.add_argument('--ipv6', action='store_true', help='Build IPv6 packets')
+    args = parser.parse_args()
+
+    all_fields = [random_fields(args.ipv6) for _ in range(args.count)]
+    templates = build_templates(args)
+
+    for fields in all_fields[:100]:
+        scapy_pkt, scapy_mask = build_scapy(args, fields)
+        template_pkt, template_mask = build_template(templates, fields)
+        if scapy_pkt != template_pkt or bytes(scapy_mask.exp_pkt) != template_mask.exp_pkt \
+                or scapy_mask.mask != template_mask.mask:
+            print('ERROR: packets built for {} are different'.format(fields))
+            return 1
+
+    scapy_time = timed('scapy', args.count, lambda: [build_scapy(args, fields) for fields in all_fields])
+    template_time = timed('template', args.count, lambda: [build_template(templates, fields) for fields in all_fields])
+    print('speedup: {:.1f}x'.format(scapy_time / template_time))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,6 +8,7 @@ Description:    This file contains the hash test for SONiC
 import logging
 import random
 import json
+import socket
 import time
 import six
 import itertools
@@ -33,6 +34,8 @@ from ptf.testutils import simple_nvgre_packet
 import fib
 import lpm
 import macsec
+import packet_burst
+import packet_template
 
 
 class HashTest(BaseTest):
@@ -100,6 +103,11 @@ class HashTest(BaseTest):
             'balancing_range', self.DEFAULT_BALANCING_RANGE)
         self.balancing_test_times = self.test_params.get(
             'balancing_test_times', self.BALANCING_TEST_TIMES)
+        # Send the packets for checking balancing in bursts instead of one by one
+        self.pipelined = self.test_params.get('pipelined', False)
+        self.burst_size = self.test_params.get(
+            'burst_size', packet_burst.PacketBurst.DEFAULT_BURST_SIZE)
+        self.packet_templates = {}
         self.switch_type = self.test_params.get(
             'switch_type', self.DEFAULT_SWITCH_TYPE)
 
@@ -214,6 +222,17 @@ class HashTest(BaseTest):
             # in the hit count map.
             assert len(hit_count_map.keys()) == len(
                 self.ptf_test_port_map[str(ingress_port)]["target_dut"])
+        elif self.pipelined:
+            logging.info('Checking hash key {} in bursts, src_port={}, exp_ports={}, dst_ip={}'
+                         .format(hash_key, src_port, exp_port_lists, dst_ip))
+            hit_count_map = self.check_ip_route_burst(
+                hash_key, src_port, dst_ip, exp_port_lists,
+                self.balancing_test_times*len(list(itertools.chain(*exp_port_lists))))
+            logging.info("hash_key={}, hit count map: {}".format(
+                hash_key, hit_count_map))
+
+            for next_hop in next_hops:
+                self.check_balancing(next_hop.get_next_hop(), hit_count_map, src_port, hash_key)
         else:
             for _ in range(0, self.balancing_test_times*len(list(itertools.chain(*exp_port_lists)))):
                 logging.info('Checking hash key {}, src_port={}, exp_ports={}, dst_ip={}'
@@ -243,6 +262,31 @@ class HashTest(BaseTest):
 
         return (matched_port, received)
 
+    def check_ip_route_burst(self, hash_key, src_port, dst_ip, dst_port_lists, count):
+        '''
+        @summary: Send packets built for a hash key in bursts and count the packets received on each port.
+        @param hash_key: hash key to build packets with.
+        @param src_port: index of port to use for sending packets to switch
+        @param dst_ip: destination IP of the route
+        @param dst_port_lists: list of ports on which to expect packets to come back from the switch
+        @param count: number of packets
+        @return: dict of the number of packets received on each port
+        '''
+        ipv6 = ip_network(six.text_type(dst_ip)).version == 6
+        dst_ports = list(itertools.chain(*dst_port_lists))
+        burst = packet_burst.PacketBurst(self, burst_size=self.burst_size)
+        sent_ips = []
+        for _ in range(count):
+            pkt, masked_exp_pkt, fields = self.build_packets(hash_key, src_port, ipv6=ipv6, tail=burst.next_tag())
+            sent_ips.append((fields['ip_src'], fields['ip_dst']))
+            burst.add(src_port, pkt, masked_exp_pkt, dst_ports)
+
+        hit_count_map = {}
+        for (ip_src, ip_dst), (rcvd_port, rcvd_pkt) in zip(sent_ips, burst.run()):
+            self.check_src_mac(src_port, dst_port_lists, rcvd_port, rcvd_pkt, ip_src, ip_dst)
+            hit_count_map[rcvd_port] = hit_count_map.get(rcvd_port, 0) + 1
+        return hit_count_map
+
     def _get_ip_proto(self, ipv6=False):
         # ip_proto 2 is IGMP, should not be forwarded by router
         # ip_proto 4 and 41 are encapsulation protocol, ip payload will be malformat
@@ -268,12 +312,50 @@ class HashTest(BaseTest):
             if ip_proto not in skip_protos:
                 return ip_proto
 
-    def check_ipv4_route(self, hash_key, src_port, dst_port_lists):
+    def get_packet_templates(self, ipv6=False, vlan=False):
         '''
-        @summary: Check IPv4 route works.
+        @summary: Get templates of the packet to send and the expected packet.
+        @param ipv6: templates of IPv6 packets
+        @param vlan: the packet to send is VLAN tagged
+        @return (template of packet to send, template of expected packet with the mask)
+        '''
+        key = (ipv6, vlan)
+        if key not in self.packet_templates:
+            if ipv6:
+                pkt = simple_tcpv6_packet(pktlen=104 if vlan else 100,
+                                          dl_vlan_enable=vlan,
+                                          vlan_pcp=0,
+                                          ipv6_hlim=64)
+                exp_pkt = simple_tcpv6_packet(ipv6_hlim=63)
+            else:
+                pkt = simple_tcp_packet(pktlen=104 if vlan else 100,
+                                        dl_vlan_enable=vlan,
+                                        vlan_pcp=0,
+                                        ip_ttl=64)
+                exp_pkt = simple_tcp_packet(ip_ttl=63)
+            masked_exp_pkt = Mask(exp_pkt)
+            masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "dst")
+            # mask the chksum also if masking the ttl
+            if self.ignore_ttl:
+                if ipv6:
+                    masked_exp_pkt.set_do_not_care_scapy(scapy.IPv6, "hlim")
+                else:
+                    masked_exp_pkt.set_do_not_care_scapy(scapy.IP, "ttl")
+                    masked_exp_pkt.set_do_not_care_scapy(scapy.IP, "chksum")
+                masked_exp_pkt.set_do_not_care_scapy(scapy.TCP, "chksum")
+            masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "src")
+            self.packet_templates[key] = (packet_template.PacketTemplate(pkt),
+                                          packet_template.PacketTemplate(exp_pkt, mask=masked_exp_pkt))
+        return self.packet_templates[key]
+
+    def build_packets(self, hash_key, src_port, ipv6=False, tail=None):
+        '''
+        @summary: Build a packet to send and the masked expected packet for a hash key.
         @param hash_key: hash key to build packet with.
         @param src_port: index of port to use for sending packet to switch
-        @param dst_port_lists: list of ports on which to expect packet to come back from the switch
+        @param ipv6: build IPv6 packets
+        @param tail: bytes to put at the end of the payload of the packets
+        @return (pkt, masked_exp_pkt, fields), fields is a dict of the header fields of the packet sent
         '''
         ip_src = self.src_ip_interval.get_random_ip(
         ) if hash_key == 'src-ip' else self.src_ip_interval.get_first_ip()
@@ -288,46 +370,42 @@ class HashTest(BaseTest):
         router_mac = self.ptf_test_port_map[str(src_port)]['target_dest_mac']
 
         vlan_id = random.choice(self.vlan_ids) if hash_key == 'vlan-id' else 0
-        ip_proto = self._get_ip_proto() if hash_key == 'ip-proto' else None
+        ip_proto = self._get_ip_proto(ipv6=ipv6) if hash_key == 'ip-proto' else socket.IPPROTO_TCP
 
-        pkt = simple_tcp_packet(pktlen=100 if vlan_id == 0 else 104,
-                                eth_dst=router_mac,
-                                eth_src=src_mac,
-                                dl_vlan_enable=False if vlan_id == 0 else True,
-                                vlan_vid=vlan_id,
-                                vlan_pcp=0,
-                                ip_src=ip_src,
-                                ip_dst=ip_dst,
-                                tcp_sport=sport,
-                                tcp_dport=dport,
-                                ip_ttl=64)
-        exp_pkt = simple_tcp_packet(
-            ip_src=ip_src,
-            ip_dst=ip_dst,
-            tcp_sport=sport,
-            tcp_dport=dport,
-            ip_ttl=63)
+        pkt_template, exp_template = self.get_packet_templates(ipv6=ipv6, vlan=vlan_id != 0)
+        exp_fields = dict(ip_src=ip_src, ip_dst=ip_dst, ip_proto=ip_proto, tcp_sport=sport, tcp_dport=dport)
+        if tail:
+            exp_fields['tail'] = tail
+        fields = dict(exp_fields, eth_dst=router_mac, eth_src=src_mac)
+        if vlan_id != 0:
+            fields['vlan_vid'] = vlan_id
+        pkt = pkt_template.build(**fields)
+        masked_exp_pkt = exp_template.build_masked(**exp_fields)
 
-        if hash_key == 'ip-proto':
-            pkt['IP'].proto = ip_proto
-            exp_pkt['IP'].proto = ip_proto
-        masked_exp_pkt = Mask(exp_pkt)
-        masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "dst")
-        # mask the chksum also if masking the ttl
-        if self.ignore_ttl:
-            masked_exp_pkt.set_do_not_care_scapy(scapy.IP, "ttl")
-            masked_exp_pkt.set_do_not_care_scapy(scapy.IP, "chksum")
-            masked_exp_pkt.set_do_not_care_scapy(scapy.TCP, "chksum")
-        masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "src")
+        return pkt, masked_exp_pkt, fields
+
+    def check_ipv4_route(self, hash_key, src_port, dst_port_lists):
+        '''
+        @summary: Check IPv4 route works.
+        @param hash_key: hash key to build packet with.
+        @param src_port: index of port to use for sending packet to switch
+        @param dst_port_lists: list of ports on which to expect packet to come back from the switch
+        '''
+        pkt, masked_exp_pkt, fields = self.build_packets(hash_key, src_port)
+        ip_src = fields['ip_src']
+        ip_dst = fields['ip_dst']
+        sport = fields['tcp_sport']
+        dport = fields['tcp_dport']
+        ip_proto = fields['ip_proto'] if hash_key == 'ip-proto' else None
 
         try:
             send_packet(self, src_port, pkt)
             logging.info('Sent Ether(src={}, dst={})/IP(src={}, dst={}, proto={})/TCP(sport={}, dport={} on port {})'
-                         .format(pkt.src,
-                                 pkt.dst,
-                                 pkt['IP'].src,
-                                 pkt['IP'].dst,
-                                 pkt['IP'].proto,
+                         .format(fields['eth_src'],
+                                 fields['eth_dst'],
+                                 ip_src,
+                                 ip_dst,
+                                 fields['ip_proto'],
                                  sport,
                                  dport,
                                  src_port))
@@ -349,11 +427,11 @@ class HashTest(BaseTest):
             logging.error("Traffic wasn't sent successfully, trying again")
             send_packet(self, src_port, pkt, count=5)
             logging.info('Sent Ether(src={}, dst={})/IP(src={}, dst={}, proto={})/TCP(sport={}, dport={} on port {})'
-                         .format(pkt.src,
-                                 pkt.dst,
-                                 pkt['IP'].src,
-                                 pkt['IP'].dst,
-                                 pkt['IP'].proto,
+                         .format(fields['eth_src'],
+                                 fields['eth_dst'],
+                                 ip_src,
+                                 ip_dst,
+                                 fields['ip_proto'],
                                  sport,
                                  dport,
                                  src_port))
@@ -361,23 +439,7 @@ class HashTest(BaseTest):
                 self, masked_exp_pkt, dst_ports, timeout=1)
             rcvd_port = dst_ports[rcvd_port_index]
 
-        exp_src_mac = None
-        if len(self.ptf_test_port_map[str(rcvd_port)]["target_src_mac"]) > 1:
-            # active-active dualtor, the packet could be received from either ToR, so use the received
-            # port to find the corresponding ToR
-            for dut_index, port_list in enumerate(dst_port_lists):
-                if rcvd_port in port_list:
-                    exp_src_mac = self.ptf_test_port_map[str(
-                        rcvd_port)]["target_src_mac"][dut_index]
-        else:
-            exp_src_mac = self.ptf_test_port_map[str(
-                rcvd_port)]["target_src_mac"][0]
-
-        actual_src_mac = scapy.Ether(rcvd_pkt).src
-        if exp_src_mac != actual_src_mac:
-            raise Exception("Pkt sent from {} to {} on port {} was rcvd pkt on {} which is one of the expected ports, "
-                            "but the src mac doesn't match, expected {}, got {}".
-                            format(ip_src, ip_dst, src_port, rcvd_port, exp_src_mac, actual_src_mac))
+        self.check_src_mac(src_port, dst_port_lists, rcvd_port, rcvd_pkt, ip_src, ip_dst)
         return (rcvd_port, rcvd_pkt)
 
     def check_ipv6_route(self, hash_key, src_port, dst_port_lists):
@@ -388,60 +450,21 @@ class HashTest(BaseTest):
         @param dst_port_lists: list of ports on which to expect packet to come back from the switch
         @return Boolean
         '''
-        ip_src = self.src_ip_interval.get_random_ip(
-        ) if hash_key == 'src-ip' else self.src_ip_interval.get_first_ip()
-        ip_dst = self.dst_ip_interval.get_random_ip(
-        ) if hash_key == 'dst-ip' else self.dst_ip_interval.get_first_ip()
-
-        sport = random.randint(0, 65535) if hash_key == 'src-port' else 1234
-        dport = random.randint(0, 65535) if hash_key == 'dst-port' else 80
-
-        src_mac = (self.base_mac[:-5] + "%02x" % random.randint(0, 255) + ":" + "%02x" % random.randint(0, 255)) \
-            if hash_key == 'src-mac' else self.base_mac
-        router_mac = self.ptf_test_port_map[str(src_port)]['target_dest_mac']
-
-        vlan_id = random.choice(self.vlan_ids) if hash_key == 'vlan-id' else 0
-        ip_proto = self._get_ip_proto(
-            ipv6=True) if hash_key == "ip-proto" else None
-
-        pkt = simple_tcpv6_packet(pktlen=100 if vlan_id == 0 else 104,
-                                  eth_dst=router_mac,
-                                  eth_src=src_mac,
-                                  dl_vlan_enable=False if vlan_id == 0 else True,
-                                  vlan_vid=vlan_id,
-                                  vlan_pcp=0,
-                                  ipv6_dst=ip_dst,
-                                  ipv6_src=ip_src,
-                                  tcp_sport=sport,
-                                  tcp_dport=dport,
-                                  ipv6_hlim=64)
-        exp_pkt = simple_tcpv6_packet(
-            ipv6_dst=ip_dst,
-            ipv6_src=ip_src,
-            tcp_sport=sport,
-            tcp_dport=dport,
-            ipv6_hlim=63)
-
-        if hash_key == 'ip-proto':
-            pkt['IPv6'].nh = ip_proto
-            exp_pkt['IPv6'].nh = ip_proto
-
-        masked_exp_pkt = Mask(exp_pkt)
-        masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "dst")
-        # mask the chksum also if masking the ttl
-        if self.ignore_ttl:
-            masked_exp_pkt.set_do_not_care_scapy(scapy.IPv6, "hlim")
-            masked_exp_pkt.set_do_not_care_scapy(scapy.TCP, "chksum")
-        masked_exp_pkt.set_do_not_care_scapy(scapy.Ether, "src")
+        pkt, masked_exp_pkt, fields = self.build_packets(hash_key, src_port, ipv6=True)
+        ip_src = fields['ip_src']
+        ip_dst = fields['ip_dst']
+        sport = fields['tcp_sport']
+        dport = fields['tcp_dport']
+        ip_proto = fields['ip_proto'] if hash_key == 'ip-proto' else None
 
         try:
             send_packet(self, src_port, pkt)
             logging.info('Sent Ether(src={}, dst={})/IPv6(src={}, dst={}, proto={})/TCP(sport={}, dport={} on port {})'
-                         .format(pkt.src,
-                                 pkt.dst,
-                                 pkt['IPv6'].src,
-                                 pkt['IPv6'].dst,
-                                 pkt['IPv6'].nh,
+                         .format(fields['eth_src'],
+                                 fields['eth_dst'],
+                                 ip_src,
+                                 ip_dst,
+                                 fields['ip_proto'],
                                  sport,
                                  dport,
                                  src_port))
@@ -463,11 +486,11 @@ class HashTest(BaseTest):
             logging.error("Traffic wasn't sent successfully, trying again")
             send_packet(self, src_port, pkt, count=5)
             logging.info('Sent Ether(src={}, dst={})/IPv6(src={}, dst={}, proto={})/TCP(sport={}, dport={} on port {})'
-                         .format(pkt.src,
-                                 pkt.dst,
-                                 pkt['IPv6'].src,
-                                 pkt['IPv6'].dst,
-                                 pkt['IPv6'].nh,
+                         .format(fields['eth_src'],
+                                 fields['eth_dst'],
+                                 ip_src,
+                                 ip_dst,
+                                 fields['ip_proto'],
                                  sport,
                                  dport,
                                  src_port))
@@ -485,6 +508,13 @@ class HashTest(BaseTest):
                 self, masked_exp_pkt, dst_ports, timeout=1)
             rcvd_port = dst_ports[rcvd_port_index]
 
+        self.check_src_mac(src_port, dst_port_lists, rcvd_port, rcvd_pkt, ip_src, ip_dst)
+        return (rcvd_port, rcvd_pkt)
+
+    def check_src_mac(self, src_port, dst_port_lists, rcvd_port, rcvd_pkt, ip_src, ip_dst):
+        '''
+        @summary: Check that the src mac of a received packet is the mac of the DUT which forwarded it.
+        '''
         exp_src_mac = None
         if len(self.ptf_test_port_map[str(rcvd_port)]["target_src_mac"]) > 1:
             # active-active dualtor, the packet could be received from either ToR, so use the received
@@ -502,7 +532,6 @@ class HashTest(BaseTest):
             raise Exception("Pkt sent from {} to {} on port {} was rcvd pkt on {} which is one of the expected ports, "
                             "but the src mac doesn't match, expected {}, got {}".
                             format(ip_src, ip_dst, src_port, rcvd_port, exp_src_mac, actual_src_mac))
-        return (rcvd_port, rcvd_pkt)
 
     def check_within_expected_range(self, actual, expected, hash_key):
         '''
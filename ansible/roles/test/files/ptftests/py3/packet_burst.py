@@ -0,0 +1 @@
+../packet_burst.py
\ No newline at end of file
@@ -0,0 +1 @@
+../packet_template.py
\ No newline at end of file
@@ -29,12 +29,23 @@ import re
 import os
 import os.path
 import csv
+import gzip
+import hashlib
+import json
+import shutil
 import time
 import logging
 import logging.handlers
+import mmap
 import subprocess
+from collections import deque
 from datetime import datetime
 
+try:
+    from re import _parser as sre_parse     # Python 3.11 and newer
+except ImportError:
+    import sre_parse
+
 # ---------------------------------------------------------------------
 # Global variables
 # ---------------------------------------------------------------------
@@ -52,12 +63,250 @@ err_invalid_string_format = -5
 err_invalid_input = -6
 err_end_ignore_marker = -7
 err_start_ignore_marker = -8
+err_log_offset_lost = -9
 
 # -- Max log message length
 # The default maximum length of a single log message. Any line longer than MAX_LOG_MESSAGE_LENGTH
 # will not be picked up by the analyzer.
 MAX_LOG_MESSAGE_LENGTH = 1000
 
+# -- Size of the blocks read from the end of a log file when it can't be memory mapped
+READ_CHUNK_SIZE = 1024 * 1024
+
+# -- Size of the head of a log file recorded with its offset, to find the file again after it is rotated
+LOG_HEAD_SIZE = 4096
+
+
+def _decode_line(line):
+    return line.decode('utf-8', errors='replace')
+
+
+def reverse_readlines(log_file_path, chunk_size=READ_CHUNK_SIZE):
+    '''
+    @summary: Read lines of a file from the last one to the first one.
+
+    Lines are produced lazily, so the caller can stop reading as soon as it finds what it needs,
+    for example the start marker. The file is memory mapped if possible, otherwise it is read
+    backwards in blocks of chunk_size bytes. Either way the whole file is never loaded into memory.
+
+    @param log_file_path: Path to the file.
+
+    @param chunk_size: Size of the blocks read from the end of the file if it can't be memory mapped.
+
+    @return: Generator of lines, the line separator is kept.
+    '''
+    with open(log_file_path, 'rb') as log_file:
+        try:
+            mapped_file = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and some special files can't be memory mapped
+            mapped_file = None
+
+        if mapped_file is not None:
+            with mapped_file:
+                end = len(mapped_file)
+                while end > 0:
+                    start = mapped_file.rfind(b'\n', 0, end - 1) + 1
+                    yield _decode_line(mapped_file[start:end])
+                    end = start
+            return
+
+        pos = log_file.seek(0, os.SEEK_END)
+        buf = b''
+        while pos > 0:
+            read_size = min(chunk_size, pos)
+            pos -= read_size
+            log_file.seek(pos)
+            buf = log_file.read(read_size) + buf
+            # -- The first line in buffer may be incomplete, keep it until the previous block is read
+            end = len(buf)
+            while True:
+                start = buf.rfind(b'\n', 0, end - 1) + 1
+                if start == 0:
+                    break
+                yield _decode_line(buf[start:end])
+                end = start
+            buf = buf[:end]
+        if buf:
+            yield _decode_line(buf)
+
+
+# -- Literals shorter than this are not used for screening lines, such expressions are always checked
+MIN_SCREEN_LITERAL_LENGTH = 3
+REPEAT_OPCODES = [getattr(sre_parse, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                  if hasattr(sre_parse, name)]
+
+
+def _required_literals(parsed):
+    '''
+    @summary: Find literal strings which must appear in any string matched by a parsed regular expression.
+    '''
+    literals = []
+    current = []
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(av))
+            continue
+
+        # -- Anything other than a literal character ends the current literal string
+        if current:
+            literals.append(''.join(current))
+            current = []
+        if op is sre_parse.SUBPATTERN:
+            add_flags, sub_pattern = av[1], av[-1]
+            if not add_flags & sre_parse.SRE_FLAG_IGNORECASE:
+                literals.extend(_required_literals(sub_pattern))
+        elif op in REPEAT_OPCODES and av[0] >= 1:
+            literals.extend(_required_literals(av[2]))
+        # -- Branches, character sets, wildcards, etc. don't require any literal
+    if current:
+        literals.append(''.join(current))
+    return literals
+
+
+def required_literal(expression):
+    '''
+    @summary: Find the longest literal string which must appear in any string matched by a regular expression.
+
+    @param expression: Regular expression string.
+
+    @return: The literal string, or None if no literal string is long enough to screen lines.
+    '''
+    try:
+        parsed = sre_parse.parse(expression)
+    except Exception:
+        return None
+    if parsed.state.flags & sre_parse.SRE_FLAG_IGNORECASE:
+        return None
+    literals = _required_literals(parsed)
+    longest = max(literals, key=len) if literals else ''
+    return longest if len(longest) >= MIN_SCREEN_LITERAL_LENGTH else None
+
+
+class LiteralAutomaton:
+    '''
+    @summary: Aho-Corasick automaton for finding which of many literal strings appear in a line in one pass.
+    '''
+
+    def __init__(self, literals):
+        '''
+        @param literals: Map <literal string, list of values reported when the literal is found>
+        '''
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for literal, values in list(literals.items()):
+            state = 0
+            for char in literal:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = next_state
+                state = next_state
+            self.output[state].extend(values)
+
+        # -- Breadth first walk to set failure links and merge outputs of the suffix states
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in list(self.goto[state].items()):
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                self.fail[next_state] = self.goto[fail_state].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find(self, line):
+        '''
+        @summary: Find values of all the literals which appear in the line.
+
+        @return: Set of values.
+        '''
+        found = set()
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for char in line:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class MultiPatternMatcher:
+    '''
+    @summary: Match lines against a set of regular expressions (rules) one by one.
+
+    It can be used in place of a regex class instance compiled from all the rules joined with '|'.
+    Each rule is compiled separately. A literal string which must appear in every match of a rule
+    is extracted from it, and all those literals are searched in a line in one pass by an Aho-Corasick
+    automaton. Only the rules whose literal appears in the line, and the rules without such a literal,
+    are checked with the full regular expression.
+
+    The returned match object belongs to the rule which fired, its 're.pattern' attribute is the rule.
+    '''
+
+    def __init__(self, expressions):
+        self.expressions = list(expressions)
+        self.pattern = '|'.join(self.expressions)
+        self.rules = [re.compile(expression) for expression in self.expressions]
+        self.unscreened_rules = []
+        literals = {}
+        for index, expression in enumerate(self.expressions):
+            literal = required_literal(expression)
+            if literal is None:
+                self.unscreened_rules.append(index)
+            else:
+                literals.setdefault(literal, []).append(index)
+        self.automaton = LiteralAutomaton(literals)
+
+    def candidates(self, line):
+        '''
+        @summary: Get indexes of the rules which may match the line, in the order of the rules.
+        '''
+        found = self.automaton.find(line)
+        if self.unscreened_rules:
+            found.update(self.unscreened_rules)
+        return sorted(found)
+
+    def search(self, line):
+        '''
+        @summary: Scan through the line looking for the first rule which matches.
+
+        @return: Match object of the rule, or None if no rule matches.
+        '''
+        for index in self.candidates(line):
+            match = self.rules[index].search(line)
+            if match:
+                return match
+        return None
+
+    def match(self, line):
+        '''
+        @summary: Look for the first rule which matches at the beginning of the line.
+
+        @return: Match object of the rule, or None if no rule matches.
+        '''
+        for index in self.candidates(line):
+            match = self.rules[index].match(line)
+            if match:
+                return match
+        return None
+
+    def matching_rules(self, line):
+        '''
+        @summary: Get all the rules which match the line.
+        '''
+        return [self.expressions[index] for index in self.candidates(line) if self.rules[index].search(line)]
+
 
 class AnsibleLogAnalyzer:
     '''
@@ -104,6 +353,8 @@ class AnsibleLogAnalyzer:
         self.run_id = run_id
         self.verbose = verbose
         self.start_marker = start_marker
+        # -- Log files extracted by byte offsets have no start/end markers to check
+        self.check_markers = True
     # ---------------------------------------------------------------------
 
     def print_diagnostic_message(self, message):
@@ -135,8 +386,18 @@ class AnsibleLogAnalyzer:
         This function is introduced to identify whether a file needs default marker
         check.
         '''
+        if not self.check_markers:
+            return False
+        return not self.is_markerless_file(file_path)
+
+    # ---------------------------------------------------------------------
+
+    def is_markerless_file(self, file_path):
+        '''
+        @summary: Check if log file is one of the files never having the default start/end markers
+        '''
         files_to_skip = ["sairedis.rec", "bgpd.log"]
-        return not any([target in file_path for target in files_to_skip])
+        return any([target in file_path for target in files_to_skip])
 
     # ---------------------------------------------------------------------
 
@@ -265,6 +526,122 @@ class AnsibleLogAnalyzer:
         return
     # ---------------------------------------------------------------------
 
+    def create_offsets_file_name(self, out_dir):
+        return os.path.join(out_dir, 'loganalyzer.offsets.' + self.run_id + '.json')
+    # ---------------------------------------------------------------------
+
+    def record_offsets(self, log_file_list, out_dir):
+        '''
+        @summary: Record current size, inode and digest of the head of each log file, in addition to the start marker.
+
+        @param log_file_list: List of file paths, system log file is always included.
+        @param out_dir: Directory where the offsets file is saved.
+        '''
+        offsets = {}
+        for log_file in [system_log_file] + log_file_list:
+            try:
+                stat = os.stat(log_file)
+                head_size = min(stat.st_size, LOG_HEAD_SIZE)
+                offsets[log_file] = {'inode': stat.st_ino, 'offset': stat.st_size, 'head_size': head_size,
+                                     'head_md5': self.get_head_md5(log_file, head_size)}
+            except (OSError, IOError):
+                # -- The file may be created later, analyze all of it then
+                offsets[log_file] = {'inode': None, 'offset': 0, 'head_size': 0, 'head_md5': None}
+            self.print_diagnostic_message('log file:{}, record offset {}'.format(log_file, offsets[log_file]))
+
+        with open(self.create_offsets_file_name(out_dir), 'w') as offsets_file:
+            json.dump(offsets, offsets_file)
+    # ---------------------------------------------------------------------
+
+    @staticmethod
+    def open_log_file(file_path):
+        return gzip.open(file_path, 'rb') if file_path.endswith('.gz') else open(file_path, 'rb')
+    # ---------------------------------------------------------------------
+
+    def get_head_md5(self, file_path, head_size):
+        with self.open_log_file(file_path) as log_file:
+            head = log_file.read(head_size)
+        return hashlib.md5(head).hexdigest() if len(head) == head_size else None
+    # ---------------------------------------------------------------------
+
+    def get_rotated_files(self, log_file):
+        '''
+        @summary: List a log file and its rotated files, '<log_file>.N' or '<log_file>.N.gz', from the newest one.
+        '''
+        rotated_files = [log_file]
+        index = 1
+        while True:
+            for rotated_file in ('{}.{}'.format(log_file, index), '{}.{}.gz'.format(log_file, index)):
+                if os.path.exists(rotated_file):
+                    rotated_files.append(rotated_file)
+                    break
+            else:
+                return rotated_files
+            index += 1
+    # ---------------------------------------------------------------------
+
+    def get_ranges_since_offset(self, log_file, recorded):
+        '''
+        @summary: Find the byte ranges of a log file, and of its rotated files, written since an offset was recorded.
+
+        The content the offset was recorded in is looked for in the log file and then in the rotated files, from
+        the newest one. A file is renamed by rotation, so it keeps its inode until it is compressed, and a file
+        copied and truncated by rotation (copytruncate) keeps its inode but not its content. So a file is
+        identified by the head of its content, or by its inode if it was empty when the offset was recorded.
+
+        @return: List of (file path, start offset) in the order the content was written,
+                 None if the content the offset was recorded in is not found.
+        '''
+        if recorded['inode'] is None:
+            return [(log_file, 0)] if os.path.exists(log_file) else []
+
+        rotated_files = self.get_rotated_files(log_file) if os.path.exists(log_file) else []
+        for index, file_path in enumerate(rotated_files):
+            try:
+                if recorded['head_size']:
+                    found = self.get_head_md5(file_path, recorded['head_size']) == recorded['head_md5']
+                else:
+                    found = not file_path.endswith('.gz') and os.stat(file_path).st_ino == recorded['inode']
+            except (OSError, IOError):
+                found = False
+            if found:
+                if index:
+                    self.print_diagnostic_message('log file {} was rotated to {}'.format(log_file, file_path))
+                return [(file_path, recorded['offset'])] + [(path, 0) for path in reversed(rotated_files[:index])]
+
+        self.print_diagnostic_message('log file {} at offset {} is not found'.format(log_file, recorded))
+        return None
+    # ---------------------------------------------------------------------
+
+    def extract_since_offsets(self, out_dir):
+        '''
+        @summary: Copy the content appended to each log file since its offset was recorded into out_dir.
+
+        The extracted content of each log file is saved as a file with the same base name in out_dir.
+
+        @return: False if the content at a recorded offset is not found in any rotated file.
+        '''
+        offsets_file_name = self.create_offsets_file_name(out_dir)
+        with open(offsets_file_name) as offsets_file:
+            offsets = json.load(offsets_file)
+        os.remove(offsets_file_name)
+
+        # -- Make sure all the messages received by rsyslogd so far are in the files
+        self.flush_rsyslogd()
+        for log_file, recorded in list(offsets.items()):
+            ranges = self.get_ranges_since_offset(log_file, recorded)
+            if ranges is None:
+                return False
+            target_file = os.path.join(out_dir, os.path.basename(log_file))
+            with open(target_file, 'wb') as target:
+                for file_path, start in ranges:
+                    with self.open_log_file(file_path) as source:
+                        source.seek(start)
+                        shutil.copyfileobj(source, target, READ_CHUNK_SIZE)
+            self.print_diagnostic_message('extracted {} to {}'.format(log_file, target_file))
+        return True
+    # ---------------------------------------------------------------------
+
     def error_to_regx(self, error_string):
         r'''
         This method converts a (list of) strings to one regular expression.
@@ -376,21 +753,21 @@ class AnsibleLogAnalyzer:
             'ignore' set - will not be reported (will be ignored)
 
         @param match_messages_regex:
-            regex class instance containing messages to match against.
+            regex class instance or MultiPatternMatcher containing messages to match against.
 
         @param ignore_messages_regex:
-            regex class instance containing messages to ignore match against.
+            regex class instance or MultiPatternMatcher containing messages to ignore match against.
 
         @return: True is str matches regex criteria, otherwise False.
         '''
 
         ret_code = False
 
-        if ((match_messages_regex is not None) and (match_messages_regex.findall(str))):
+        if ((match_messages_regex is not None) and (match_messages_regex.search(str))):
             if (ignore_messages_regex is None):
                 ret_code = True
 
-            elif (not ignore_messages_regex.findall(str)):
+            elif (not ignore_messages_regex.search(str)):
                 self.print_diagnostic_message('matching line: %s' % str)
                 ret_code = True
 
@@ -405,13 +782,13 @@ class AnsibleLogAnalyzer:
 
         ret_code = False
         if self.run_id.startswith("test_advanced_reboot_test_"):
-            # Use the stricter (and better-performing) match instead of findall, but only when analyzing
+            # Use the stricter (and better-performing) match instead of search, but only when analyzing
             # logs for advanced reboot test cases. This is so that other test cases are not affected in
             # case their regexes don't start with .*
             if (expect_messages_regex is not None) and (expect_messages_regex.match(str)):
                 ret_code = True
         else:
-            if (expect_messages_regex is not None) and (expect_messages_regex.findall(str)):
+            if (expect_messages_regex is not None) and (expect_messages_regex.search(str)):
                 ret_code = True
 
         return ret_code
@@ -446,21 +823,24 @@ class AnsibleLogAnalyzer:
         # -- and end marker. see analyze_file method.
         check_marker = self.require_marker_check(log_file_path)
         in_analysis_range = not check_marker
+        # -- Long lines are dropped only from the files without markers, even if markers of other files
+        # -- are not checked
+        skip_long_lines = self.is_markerless_file(log_file_path)
         stdin_as_input = self.is_filename_stdin(log_file_path)
         matching_lines = []
         expected_lines = []
         found_start_marker = False
         found_end_marker = False
         if stdin_as_input:
-            log_file = sys.stdin
+            rev_lines = reversed(sys.stdin.readlines())
         else:
-            log_file = open(log_file_path, 'r')
+            rev_lines = reverse_readlines(log_file_path)
 
         start_marker = self.create_start_marker()
         end_marker = self.create_end_marker()
 
         ignore_marker_run_ids = []
-        for rev_line in reversed(log_file.readlines()):
+        for rev_line in rev_lines:
             if stdin_as_input:
                 in_analysis_range = True
             else:
@@ -519,7 +899,7 @@ class AnsibleLogAnalyzer:
                 # So we need to allow long lines
                 if maximum_log_length is None:
                     maximum_log_length = MAX_LOG_MESSAGE_LENGTH
-                if not check_marker and len(rev_line) > maximum_log_length:
+                if skip_long_lines and len(rev_line) > maximum_log_length:
                     continue
 
                 if self.line_is_expected(rev_line, expect_messages_regex):
@@ -589,6 +969,11 @@ def usage():
     print('                                 to all log files specified in --logs parameter.')
     print('                                 analyze - perform log analysis of files specified in --logs parameter.')
     print('                                 add_end_marker - add end marker to all log files specified in --logs parameter.')           # noqa E501
+    print('                                 init_offsets - record size of system log and files in --logs parameter into out_dir,')       # noqa E501
+    print('                                 instead of placing start-marker.')
+    print('                                 extract_since_offsets - copy the content added to the files since init_offsets')             # noqa E501
+    print('                                 into files with the same names in out_dir, fails if it is not found in')              # noqa E501
+    print('                                 the rotated files.')
     print('--out_dir path                   Directory path where to place output files, ')
     print('                                 must be present when --action == analyze')
     print('--logs path{,path}               List of full paths to log files to be analyzed.')
@@ -623,6 +1008,10 @@ def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in,
 
     if action in ['init', 'add_end_marker', 'add_start_ignore_mark', 'add_end_ignore_mark']:
         ret_code = True
+    elif action in ['init_offsets', 'extract_since_offsets']:
+        if out_dir is None or len(out_dir) == 0:
+            print('ERROR: missing required out_dir for %s action' % action)
+            ret_code = False
     elif action == 'analyze':
         if out_dir is None or len(out_dir) == 0:
             print('ERROR: missing required out_dir for analyze action')
@@ -837,12 +1226,12 @@ def main(argv):
         analyzer.place_marker(
             log_file_list, analyzer.create_end_marker(), wait_for_marker=True)
 
-        match_messages_regex, messages_regex_m = analyzer.create_msg_regex(
-            match_file_list)
-        ignore_messages_regex, messages_regex_i = analyzer.create_msg_regex(
-            ignore_file_list)
-        expect_messages_regex, messages_regex_e = analyzer.create_msg_regex(
-            expect_file_list)
+        messages_regex_m = analyzer.create_msg_regex(match_file_list)[1]
+        messages_regex_i = analyzer.create_msg_regex(ignore_file_list)[1]
+        messages_regex_e = analyzer.create_msg_regex(expect_file_list)[1]
+        match_messages_regex = MultiPatternMatcher(messages_regex_m) if messages_regex_m else None
+        ignore_messages_regex = MultiPatternMatcher(messages_regex_i) if messages_regex_i else None
+        expect_messages_regex = MultiPatternMatcher(messages_regex_e) if messages_regex_e else None
 
         # if no log file specified - add system log
         if not log_file_list:
@@ -854,6 +1243,14 @@ def main(argv):
         write_result_file(run_id, out_dir, result,
                           messages_regex_e, unused_regex_messages)
         write_summary_file(run_id, out_dir, result, unused_regex_messages)
+    elif action == "init_offsets":
+        analyzer.record_offsets(log_file_list, out_dir)
+        return 0
+    elif action == "extract_since_offsets":
+        if not analyzer.extract_since_offsets(out_dir):
+            print('ERROR: log content at recorded offset was not found')
+            sys.exit(err_log_offset_lost)
+        return 0
     elif action == "add_end_marker":
         analyzer.place_marker(
             log_file_list, analyzer.create_end_marker(), wait_for_marker=True)
@@ -1,6 +1,8 @@
 
 from __future__ import print_function
 
+import contextlib
+import copy
 import json
 import logging
 import os
@@ -37,6 +39,8 @@ DEL_FLOW_CMD = 'ovs-ofctl --names del-flows {} in_port="{}"'
 ADD_FLOW_CMD = 'ovs-ofctl --names add-flow {} in_port="{}",actions={}'
 MOD_FLOW_CMD = 'ovs-ofctl --names mod-flows {} in_port="{}",actions={}'
 
+RECONCILE_INTERVAL = 60     # Seconds between comparing flows kept in memory with flows on mux bridges
+
 RANDOM = 'random'
 TOGGLE = 'toggle'
 
@@ -179,8 +183,11 @@ class Mux(object):
         # not atomic, sometimes it needs to run a command to remove flow, then run a command to add a new flow.
         # If a request of getting mux status come in in the middle of such flow configuration change, the mux
         # status returned may not match the actual flow status. Purpose of the lock is to workaround such conflicts.
-        # All the operations of updating mux config and getting mux status must acquire the lock firstly.
+        # All the operations of updating mux config must acquire the lock firstly. Once an update is done, a new
+        # status of the mux is published. Getting mux status returns the published status without waiting for the
+        # lock, so status requests are not held up by running ovs-ofctl commands.
         self.lock = threading.Lock()
+        self._status = None
 
         self.vm_set = vm_set
 
@@ -199,6 +206,7 @@ class Mux(object):
         self._get_flows()
 
         self.flap_counter = 0
+        self._publish_status()
 
     def debug(self, msg):
         app.logger.debug('bridge={}, {}'.format(self.bridge, msg))
@@ -344,47 +352,65 @@ class Mux(object):
                 self.flows['downstream']['out_sides'] = [self.sides[out_port] for out_port, action in
                                                          flows[in_port].items() if action == OUTPUT]
 
-    @property
-    def status(self):
-        """Property for status of the mux bridge.
+    def _publish_status(self):
+        """Gather the instance attributes of the mux bridge into a new status dict.
 
-        Status of the mux bridge is maintained in instance attributes. This property is to gather the attributes and
-        return them in a dict.
+        The published status dict is never changed afterwards, it is replaced as a whole by the next update.
         """
-        with self.lock:
-            # Transform mux flows to json expected by mux simulator client
-            flows = {}
-            flows[self.ports[NIC]] = [
+        # Transform mux flows to json expected by mux simulator client
+        flows = {}
+        flows[self.ports[NIC]] = [
+            {'action': OUTPUT, 'out_port': self.ports[out_side]}
+            for out_side in self.flows['upstream']['out_sides']
+        ]
+
+        if self.flows['downstream']['in_side'] is not None:
+            in_side = self.flows['downstream']['in_side']
+            in_port = self.ports[in_side]
+            flows[in_port] = [
                 {'action': OUTPUT, 'out_port': self.ports[out_side]}
-                for out_side in self.flows['upstream']['out_sides']
+                for out_side in self.flows['downstream']['out_sides']
             ]
 
-            if self.flows['downstream']['in_side'] is not None:
-                in_side = self.flows['downstream']['in_side']
-                in_port = self.ports[in_side]
-                flows[in_port] = [
-                    {'action': OUTPUT, 'out_port': self.ports[out_side]}
-                    for out_side in self.flows['downstream']['out_sides']
-                ]
-
-            healthy = True
-            if len(self.flows['downstream']['out_sides']) != 1 or len(self.flows['upstream']['out_sides']) != 2:
-                healthy = False
-
-            status = {
-                'bridge': self.bridge,
-                'vm_set': self.vm_set,
-                'port_index': self.port_index,
-                'ports': self.ports,
-                'active_port': self.active_port,
-                'active_side': self.active_side,
-                'standby_side': self.standby_side,
-                'standby_port': self.standby_port,
-                'flows': flows,
-                'flap_counter': self.flap_counter,
-                'healthy': healthy
-            }
-            return status
+        healthy = True
+        if len(self.flows['downstream']['out_sides']) != 1 or len(self.flows['upstream']['out_sides']) != 2:
+            healthy = False
+
+        self._status = {
+            'bridge': self.bridge,
+            'vm_set': self.vm_set,
+            'port_index': self.port_index,
+            'ports': dict(self.ports),
+            'active_port': self.active_port,
+            'active_side': self.active_side,
+            'standby_side': self.standby_side,
+            'standby_port': self.standby_port,
+            'flows': flows,
+            'flap_counter': self.flap_counter,
+            'healthy': healthy
+        }
+
+    @contextlib.contextmanager
+    def _updating(self):
+        """Hold the lock while updating the mux, then publish the new status.
+
+        The status is published even if the update fails half way, because the instance attributes are updated right
+        after every flow config change.
+        """
+        with self.lock:
+            try:
+                yield
+            finally:
+                self._publish_status()
+
+    @property
+    def status(self):
+        """Property for status of the mux bridge.
+
+        Status of the mux bridge is maintained in instance attributes. A status dict of the attributes is published
+        after every update of the mux bridge, this property returns the latest published status.
+        """
+        return self._status
 
     def set_active_side(self, new_active_side):
         """Set the active side of the mux bridge to the specified side.
@@ -393,7 +419,7 @@ class Mux(object):
         this method will run ovs-ofctl command to remove flow and add a new flow to switch active side. All the
         related instance attributes are updated after open flow rules are changed.
         """
-        with self.lock:
+        with self._updating():
             self.info('>>>>>> updating mux active side from {} to {}'.format(self.active_side, new_active_side))
             if new_active_side == RANDOM:
                 new_active_side = random.choice([UPPER_TOR, LOWER_TOR])
@@ -538,7 +564,7 @@ class Mux(object):
 
         Item in out_sides could be any of: 'nic', 'upper_tor', 'lower_tor'.
         """
-        with self.lock:
+        with self._updating():
             self.info('>>>>> calling update_flows, new_action={}, out_sides={}, current flow:\n{}'
                       .format(new_action, out_sides, json.dumps(self.flows, indent=2)))
             if NIC in out_sides:
@@ -556,17 +582,46 @@ class Mux(object):
         self.info('resetting flows done <<<<<<')
 
     def clear_flap_counter(self):
-        with self.lock:
+        with self._updating():
             self.info('clear flap counter')
             self.flap_counter = 0
             self.info('clear flap counter done')
 
+    def reconcile(self):
+        """Compare flows kept in memory with flows on the mux bridge, take the flows on the bridge if they differ.
+
+        Flows kept in memory are updated by every flow config change of the mux simulator. But the flows on the bridge
+        could still be changed by others, for example by restarting OVS or by running ovs-ofctl on the server.
+
+        Returns:
+            boolean: Return True if flows in memory were updated.
+        """
+        with self._updating():
+            flows = copy.deepcopy(self.flows)
+            active_side = self.active_side
+            self.flows['upstream']['out_sides'] = []
+            self.flows['downstream']['out_sides'] = []
+            try:
+                self._get_flows()
+            except Exception:
+                self.flows = flows
+                self._active_standby_state_helper(active_side)
+                raise
+
+            if self.active_side == active_side \
+                    and set(self.flows['upstream']['out_sides']) == set(flows['upstream']['out_sides']) \
+                    and set(self.flows['downstream']['out_sides']) == set(flows['downstream']['out_sides']):
+                return False
+            self.error('flows on bridge are different from flows in memory, updated flows in memory from:\n{}\nto:\n{}'
+                       .format(json.dumps(flows, indent=2), json.dumps(self.flows, indent=2)))
+            return True
+
 
 class Muxes(object):
 
     MUXES_CONCURRENCY = 4
 
-    def __init__(self, vm_set):
+    def __init__(self, vm_set, reconcile_interval=RECONCILE_INTERVAL):
         self.vm_set = vm_set
         self.muxes = {}
         self.thread_pool = ThreadPool(Muxes.MUXES_CONCURRENCY)
@@ -577,6 +632,34 @@ class Muxes(object):
             if mux.isvalid:
                 self.muxes[bridge] = mux
 
+        self.stopped = threading.Event()
+        if reconcile_interval:
+            reconcile_thread = threading.Thread(target=self._reconcile_periodically, args=(reconcile_interval,))
+            reconcile_thread.daemon = True
+            reconcile_thread.start()
+
+    def _reconcile_periodically(self, interval):
+        while not self.stopped.wait(interval):
+            self.reconcile()
+
+    def reconcile(self):
+        """Reconcile flows of all the mux bridges, a failed bridge doesn't stop reconciling the others.
+
+        Returns:
+            list: List of bridges which had flows in memory updated.
+        """
+        updated = []
+        for mux in list(self.muxes.values()):
+            try:
+                if mux.reconcile():
+                    updated.append(mux.bridge)
+            except Exception as e:
+                mux.error('failed to reconcile flows: {}'.format(repr(e)))
+        return updated
+
+    def stop(self):
+        self.stopped.set()
+
     def _mux_bridges(self):
         """Only collect bridges belong to self.vm_set
 
@@ -648,6 +731,8 @@ class Muxes(object):
 def create_muxes(vm_set):
     app.logger.info('####################### COLLECTING BRIDGE STATUS #######################')
     global g_muxes
+    if g_muxes is not None:
+        g_muxes.stop()
     g_muxes = Muxes(vm_set)
     app.logger.info('####################### COLLECTING BRIDGE STATUS DONE #######################')
 
@@ -860,6 +945,31 @@ def drop_flow_handler(vm_set):
     return g_muxes.update_flows('drop', data['out_sides'])
 
 
+@app.route('/muxes', methods=['GET'])
+def all_vm_sets_mux_status():
+    """Handler for requests to /muxes.
+
+    Return detailed status of all the mux Y cables of all the vm_sets served by this mux simulator, in a dict keyed by
+    vm_set, then by bridge. Status is served from memory, so polling all the muxes at once is as cheap as polling
+    a single mux.
+
+    Returns:
+        object: Return a flask response object.
+    """
+    return {g_muxes.vm_set: g_muxes.get_mux_status()}
+
+
+@app.route('/mux/<vm_set>/reconcile', methods=['POST'])
+def reconcile_handler(vm_set):
+    """Handler for reconciling flows kept in memory with flows on the mux bridges right now.
+
+    Flows are also reconciled every RECONCILE_INTERVAL seconds. Return list of bridges which had flows updated.
+    """
+    _validate_vm_set(vm_set)
+    app.logger.info('===== {} POST {} ====='.format(request.remote_addr, request.url))
+    return {'updated': g_muxes.reconcile()}
+
+
 @app.route('/mux/<vm_set>/<int:port_index>/flap_counter', methods=['GET'])
 def flap_counter_port(vm_set, port_index):
     """
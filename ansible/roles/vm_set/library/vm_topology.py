@@ -31,6 +31,12 @@ except ImportError:
 
 from ansible.module_utils.debug_utils import config_module_logging
 
+try:
+    from pyroute2 import IPRoute, NetNS
+    from pyroute2.netlink.exceptions import NetlinkError
+except ImportError:
+    IPRoute = None
+
 if sys.version_info.major == 2:
     from multiprocessing.pool import ThreadPool
 else:
@@ -90,6 +96,7 @@ Parameters:
     - duts_mgmt_port: duts mgmt port
     - duts_name: duts names
     - fp_mtu: MTU for FP ports
+    - use_netlink: query and change links through netlink instead of ip/brctl commands, if pyroute2 is installed
 '''
 
 EXAMPLES = '''
@@ -226,8 +233,290 @@ def adaptive_temporary_interface(vm_set_name, interface_name, reserved_space=0):
     return t_int_if
 
 
+def _ovsdb_set(value):
+    """Return elements of an ovsdb column value in json format, a set with one element is the element itself."""
+    if isinstance(value, list) and value[0] == 'set':
+        return value[1]
+    return [value]
+
+
+class OVSBatch(object):
+    """
+    Batch of OVS port bindings and flows of bridges.
+
+    Port membership of all the bridges is changed in one ovs-vsctl transaction, then flows of every bridge are
+    replaced in one ovs-ofctl bundle, instead of running ovs-vsctl and ovs-ofctl for every port and every flow.
+    Flows are added with port names, which are translated to ofports when the batch is applied.
+    """
+
+    def __init__(self):
+        self.ports = {}
+        self.flows = {}
+
+    def add_ports(self, br_name, ports):
+        """Bind ports to a bridge, ports on other bridges are moved to the bridge."""
+        br_ports = self.ports.setdefault(br_name, [])
+        for port in ports:
+            if port not in br_ports:
+                br_ports.append(port)
+
+    def clear_flows(self, br_name):
+        """Remove all flows of a bridge, including flows added to the batch before."""
+        self.flows[br_name] = []
+
+    def add_flow(self, br_name, flow, *ports):
+        """Add a flow to a bridge, '%s' in the flow are replaced with ofports of the ports."""
+        self.flows.setdefault(br_name, []).append((flow, ports))
+
+    @staticmethod
+    def get_ovs_ports():
+        """
+        Get bridges of all OVS ports and ofports of all OVS interfaces.
+
+        Returns:
+            tuple: dict of port name to bridge name, dict of interface name to ofport. The ofport is None if it
+                   isn't assigned yet.
+        """
+        out = VMTopology.cmd('ovs-vsctl --format=json --data=json -- --columns=name,ports list Bridge '
+                             '-- --columns=_uuid,name list Port -- --columns=name,ofport list Interface')
+        tables = []
+        decoder = json.JSONDecoder()
+        pos = 0
+        while pos < len(out):
+            if out[pos].isspace():
+                pos += 1
+                continue
+            table, pos = decoder.raw_decode(out, pos)
+            tables.append([dict(zip(table['headings'], row)) for row in table['data']])
+        bridges, ports, interfaces = tables
+
+        port_names = dict((row['_uuid'][1], row['name']) for row in ports)
+        port_to_br = {}
+        for row in bridges:
+            for uuid in _ovsdb_set(row['ports']):
+                port_to_br[port_names[uuid[1]]] = row['name']
+        ofports = {}
+        for row in interfaces:
+            ofport = _ovsdb_set(row['ofport'])
+            ofports[row['name']] = ofport[0] if ofport and ofport[0] > 0 else None
+        return port_to_br, ofports
+
+    def _wait_for_ofports(self, ofports):
+        ports = set()
+        for flows in self.flows.values():
+            for _, flow_ports in flows:
+                ports.update(flow_ports)
+        # Vlan interface addition may take few secs to reflect in OVS Command,
+        # Let`s retry few times in that case.
+        for retries in range(RETRIES):
+            missing = [port for port in ports if ofports.get(port) is None]
+            if not missing:
+                return ofports
+            time.sleep(2*retries+1)
+            _, ofports = OVSBatch.get_ovs_ports()
+        raise Exception("Can't find ofport of %s" % ', '.join(sorted(missing)))
+
+    @staticmethod
+    def replace_flows(br_name, flows):
+        """Replace all flows of a bridge with the flows."""
+        data = ''.join(flow + '\n' for flow in flows)
+        try:
+            VMTopology.cmd('ovs-ofctl --bundle replace-flows %s -' % br_name, input_data=data)
+        except Exception:
+            # Bundle needs OpenFlow 1.4, which may be not enabled on the bridge
+            logging.info('Failed to replace flows of bridge %s in a bundle, replace without bundle' % br_name)
+            VMTopology.cmd('ovs-ofctl replace-flows %s -' % br_name, input_data=data)
+
+    def apply(self, worker=None):
+        """
+        Apply the batch to OVS.
+
+        Args:
+            worker (VMTopologyWorker, optional): Worker to replace flows of bridges in parallel.
+        """
+        if not self.ports and not self.flows:
+            return
+
+        port_to_br, ofports = OVSBatch.get_ovs_ports()
+        vsctl_cmds = []
+        for br_name, ports in self.ports.items():
+            for port in ports:
+                br = port_to_br.get(port)
+                if br == br_name:
+                    continue
+                if br is not None:
+                    vsctl_cmds.append('-- del-port %s %s' % (br, port))
+                vsctl_cmds.append('-- add-port %s %s' % (br_name, port))
+        if vsctl_cmds:
+            VMTopology.cmd('ovs-vsctl %s' % ' '.join(vsctl_cmds))
+            _, ofports = OVSBatch.get_ovs_ports()
+        ofports = self._wait_for_ofports(ofports)
+
+        bridge_flows = []
+        for br_name, flows in self.flows.items():
+            bridge_flows.append((br_name, [flow % tuple(ofports[port] for port in ports) for flow, ports in flows]))
+        if worker is not None:
+            worker.map(lambda args: OVSBatch.replace_flows(*args), bridge_flows)
+        else:
+            for br_name, flows in bridge_flows:
+                OVSBatch.replace_flows(br_name, flows)
+
+
+class NetlinkLinks(object):
+    """
+    Network links of the host, docker containers and network namespaces, queried and changed through netlink.
+
+    Links are looked up by name and cached per namespace, so checking links doesn't run any command. Links changed
+    through this class are refreshed in the cache, and the whole cache is cleared by clear() when links may be changed
+    by commands. A namespace is given the same way as in VMTopology: by pid of a docker container, or by name of a
+    network namespace. The host namespace is used if neither is given.
+    """
+
+    IFF_UP = 0x1
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.sockets = {}
+        # namespace -> {link name -> link, or None if the link doesn't exist}
+        self.links = {}
+        # namespaces of which all the links are cached
+        self.dumped = set()
+
+    @staticmethod
+    def _namespace(pid=None, netns=None):
+        if pid:
+            return '/proc/%s/ns/net' % pid
+        elif netns:
+            return netns
+        return None
+
+    def _ipr(self, namespace):
+        if namespace not in self.sockets:
+            self.sockets[namespace] = IPRoute() if namespace is None else NetNS(namespace, flags=0)
+        return self.sockets[namespace]
+
+    @staticmethod
+    def _link(msg):
+        linkinfo = msg.get_attr('IFLA_LINKINFO')
+        return {
+            'index': msg['index'],
+            'up': bool(msg['flags'] & NetlinkLinks.IFF_UP),
+            'master': msg.get_attr('IFLA_MASTER'),
+            'kind': linkinfo.get_attr('IFLA_INFO_KIND') if linkinfo else None
+        }
+
+    def _refresh(self, namespace, name):
+        try:
+            link = self._link(self._ipr(namespace).link('get', ifname=name)[0])
+        except NetlinkError:
+            link = None
+        self.links.setdefault(namespace, {})[name] = link
+        return link
+
+    def get(self, name, pid=None, netns=None):
+        """Return the link, a dict of index, up, master and kind, or None if the link doesn't exist."""
+        namespace = NetlinkLinks._namespace(pid, netns)
+        with self.lock:
+            links = self.links.get(namespace, {})
+            if name in links or namespace in self.dumped:
+                return links.get(name)
+            return self._refresh(namespace, name)
+
+    def dump(self, pid=None, netns=None):
+        """Return a dict of all the links in a namespace."""
+        namespace = NetlinkLinks._namespace(pid, netns)
+        with self.lock:
+            if namespace not in self.dumped:
+                self.links[namespace] = dict((msg.get_attr('IFLA_IFNAME'), self._link(msg))
+                                             for msg in self._ipr(namespace).get_links())
+                self.dumped.add(namespace)
+            return dict((name, link) for name, link in self.links[namespace].items() if link is not None)
+
+    def clear(self):
+        with self.lock:
+            self.links.clear()
+            self.dumped.clear()
+
+    def _get_existing(self, name, pid=None, netns=None):
+        link = self.get(name, pid=pid, netns=netns)
+        if link is None:
+            raise Exception('Link %s does not exist in namespace %s' % (name, NetlinkLinks._namespace(pid, netns)))
+        return link
+
+    def add(self, name, pid=None, netns=None, peer=None, **kwargs):
+        """Add a link, kwargs are attributes of the link like kind."""
+        namespace = NetlinkLinks._namespace(pid, netns)
+        with self.lock:
+            if peer is not None:
+                kwargs['peer'] = peer
+            self._ipr(namespace).link('add', ifname=name, **kwargs)
+            self._refresh(namespace, name)
+            if peer is not None:
+                self._refresh(namespace, peer)
+
+    def delete(self, name, pid=None, netns=None):
+        """Delete a link. The cache is cleared, since peer of the link may be deleted in any namespace."""
+        namespace = NetlinkLinks._namespace(pid, netns)
+        with self.lock:
+            self._ipr(namespace).link('del', index=self._get_existing(name, pid, netns)['index'])
+            self.clear()
+
+    def set(self, name, pid=None, netns=None, **kwargs):
+        """Change attributes of a link, like state, mtu, master or ifname."""
+        namespace = NetlinkLinks._namespace(pid, netns)
+        with self.lock:
+            link = dict(self._get_existing(name, pid, netns))
+            self._ipr(namespace).link('set', index=link['index'], **kwargs)
+            # The cached link is updated without querying it again
+            if 'state' in kwargs:
+                link['up'] = kwargs['state'] == 'up'
+            if 'master' in kwargs:
+                link['master'] = kwargs['master'] or None
+            links = self.links[namespace]
+            if 'ifname' in kwargs:
+                links[name] = None
+                name = kwargs['ifname']
+            links[name] = link
+
+    def move(self, name, target, pid=None, netns=None):
+        """Move a link to the namespace of target, which is pid of a docker container, 1 for the host namespace,
+        or name of a network namespace."""
+        namespace = NetlinkLinks._namespace(pid, netns)
+        with self.lock:
+            index = self._get_existing(name, pid, netns)['index']
+            if str(target) == '1':
+                self._ipr(namespace).link('set', index=index, net_ns_pid=1)
+                target_namespace = None
+            elif str(target).isdigit():
+                self._ipr(namespace).link('set', index=index, net_ns_pid=int(target))
+                target_namespace = NetlinkLinks._namespace(pid=target)
+            else:
+                self._ipr(namespace).link('set', index=index, net_ns_fd=target)
+                target_namespace = NetlinkLinks._namespace(netns=target)
+            self._refresh(namespace, name)
+            self._refresh(target_namespace, name)
+
+    def close(self):
+        with self.lock:
+            for ipr in self.sockets.values():
+                ipr.close()
+            self.sockets.clear()
+            self.clear()
+
+
 class VMTopology(object):
 
+    # Commands are passed to the recorder instead of being executed if it is set, for dry runs without OVS.
+    # The recorder is called as cmd_recorder(cmdline, grep_cmd=None, input_data=None), it returns output of the
+    # command or raises an exception if the command fails.
+    cmd_recorder = None
+
+    # Links are queried and changed through netlink instead of commands if it is set to a NetlinkLinks.
+    netlink = None
+
+    # docker container name -> pid
+    _pids = {}
+
     def __init__(self, vm_names, vm_properties, fp_mtu, max_fp_num, topo, worker, is_dpu=False, dut_interfaces=None):
         self.vm_names = vm_names
         self.vm_properties = vm_properties
@@ -473,9 +762,9 @@ class VMTopology(object):
         VMTopology.cmd('ovs-vsctl --may-exist add-br %s' % bridge_name)
 
         if mtu != DEFAULT_MTU:
-            VMTopology.cmd('ifconfig %s mtu %d' % (bridge_name, mtu))
+            VMTopology.link_set_mtu(bridge_name, mtu)
 
-        VMTopology.cmd('ifconfig %s up' % bridge_name)
+        VMTopology.iface_up(bridge_name)
 
     def destroy_bridges(self):
         for vm in self.vm_names:
@@ -573,18 +862,17 @@ class VMTopology(object):
         logging.info('=== For veth pair, add %s to bridge %s, set %s to PTF docker, tmp intf %s' % (
             ext_if, bridge, int_if, tmp_int_if))
         if VMTopology.intf_not_exists(ext_if):
-            VMTopology.cmd("ip link add %s type veth peer name %s" %
-                           (ext_if, tmp_int_if))
+            VMTopology.link_add_veth(ext_if, tmp_int_if)
 
         _, if_to_br = VMTopology.brctl_show(bridge)
         if ext_if not in if_to_br:
-            VMTopology.cmd("brctl addif %s %s" % (bridge, ext_if))
+            VMTopology.bridge_add_if(bridge, ext_if)
 
         VMTopology.iface_up(ext_if)
 
         if VMTopology.intf_exists(tmp_int_if) and VMTopology.intf_not_exists(tmp_int_if, pid=self.pid):
-            VMTopology.cmd("ip link set dev %s netns %s " % (tmp_int_if, self.pid))
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, tmp_int_if, int_if))
+            VMTopology.link_set_netns(tmp_int_if, self.pid)
+            VMTopology.link_rename(tmp_int_if, int_if, pid=self.pid)
 
         VMTopology.iface_up(int_if, pid=self.pid)
 
@@ -596,18 +884,17 @@ class VMTopology(object):
         logging.info('=== For veth pair, add %s to bridge %s, set %s to netns, tmp intf %s' % (
             ext_if, bridge, int_if, tmp_int_if))
         if VMTopology.intf_not_exists(ext_if):
-            VMTopology.cmd("ip link add %s type veth peer name %s" %
-                           (ext_if, tmp_int_if))
+            VMTopology.link_add_veth(ext_if, tmp_int_if)
 
         _, if_to_br = VMTopology.brctl_show(bridge)
         if ext_if not in if_to_br:
-            VMTopology.cmd("brctl addif %s %s" % (bridge, ext_if))
+            VMTopology.bridge_add_if(bridge, ext_if)
 
         VMTopology.iface_up(ext_if)
 
         if VMTopology.intf_exists(tmp_int_if) and VMTopology.intf_not_exists(tmp_int_if, netns=self.netns):
-            VMTopology.cmd("ip link set dev %s netns %s" % (tmp_int_if, self.netns))
-            VMTopology.cmd("ip netns exec %s ip link set dev %s name %s" % (self.netns, tmp_int_if, int_if))
+            VMTopology.link_set_netns(tmp_int_if, self.netns)
+            VMTopology.link_rename(tmp_int_if, int_if, netns=self.netns)
 
         VMTopology.iface_up(int_if, netns=self.netns)
 
@@ -673,10 +960,10 @@ class VMTopology(object):
         if VMTopology.intf_exists(dut_iface) \
                 and VMTopology.intf_not_exists(dut_iface, pid=self.pid) \
                 and VMTopology.intf_not_exists(iface_name, pid=self.pid):
-            VMTopology.cmd("ip link set dev %s netns %s" % (dut_iface, self.pid))
+            VMTopology.link_set_netns(dut_iface, self.pid)
 
         if VMTopology.intf_exists(dut_iface, pid=self.pid) and VMTopology.intf_not_exists(iface_name, pid=self.pid):
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, dut_iface, iface_name))
+            VMTopology.link_rename(dut_iface, iface_name, pid=self.pid)
 
         VMTopology.iface_up(iface_name, pid=self.pid)
 
@@ -685,10 +972,8 @@ class VMTopology(object):
         if VMTopology.intf_not_exists(iface_name, pid=self.pid):
             raise ValueError("Interface %s not present in docker" % iface_name)
         vlan_sub_iface_name = iface_name + vlan_separator + vlan_id
-        VMTopology.cmd("nsenter -t %s -n ip link add link %s name %s type vlan id %s" %
-                       (self.pid, iface_name, vlan_sub_iface_name, vlan_id))
-        VMTopology.cmd("nsenter -t %s -n ip link set %s up" %
-                       (self.pid, vlan_sub_iface_name))
+        VMTopology.link_add_vlan(iface_name, vlan_sub_iface_name, vlan_id, pid=self.pid)
+        VMTopology.iface_up(vlan_sub_iface_name, pid=self.pid)
 
     def remove_dut_if_from_docker(self, iface_name, dut_iface):
         logging.info("=== Restore docker interface %s as dut interface %s ===" % (iface_name, dut_iface))
@@ -699,12 +984,10 @@ class VMTopology(object):
             VMTopology.iface_down(iface_name, pid=self.pid)
 
             if VMTopology.intf_not_exists(dut_iface, pid=self.pid):
-                VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" %
-                               (self.pid, iface_name, dut_iface))
+                VMTopology.link_rename(iface_name, dut_iface, pid=self.pid)
 
         if VMTopology.intf_not_exists(dut_iface) and VMTopology.intf_exists(dut_iface, pid=self.pid):
-            VMTopology.cmd(
-                "nsenter -t %s -n ip link set dev %s netns 1" % (self.pid, dut_iface))
+            VMTopology.link_set_netns(dut_iface, 1, pid=self.pid)
 
     def remove_dut_vlan_subif_from_docker(self, iface_name, vlan_separator, vlan_id):
         """Remove the vlan sub interface created for the ptf interface."""
@@ -714,8 +997,7 @@ class VMTopology(object):
         vlan_sub_iface_name = iface_name + vlan_separator + vlan_id
         if VMTopology.intf_exists(vlan_sub_iface_name, pid=self.pid):
             VMTopology.iface_down(vlan_sub_iface_name, pid=self.pid)
-            VMTopology.cmd("nsenter -t %s -n ip link del %s" %
-                           (self.pid, vlan_sub_iface_name))
+            VMTopology.link_delete(vlan_sub_iface_name, pid=self.pid)
 
     def add_veth_if_to_docker(self, ext_if, int_if, create_vlan_subintf=False, **kwargs):
         """Create vethernet devices (ext_if, int_if) and put int_if into the ptf docker."""
@@ -738,59 +1020,48 @@ class VMTopology(object):
             t_int_sub_if = t_int_if + vlan_subintf_sep + vlan_subintf_vlan_id
 
         if VMTopology.intf_exists(t_int_if):
-            VMTopology.cmd("ip link del dev %s" % t_int_if)
+            VMTopology.link_delete(t_int_if)
 
         if VMTopology.intf_not_exists(ext_if):
-            VMTopology.cmd("ip link add %s type veth peer name %s" %
-                           (ext_if, t_int_if))
+            VMTopology.link_add_veth(ext_if, t_int_if)
             if create_vlan_subintf:
-                VMTopology.cmd("vconfig add %s %s" %
-                               (t_int_if, vlan_subintf_vlan_id))
+                # Named the way vconfig names vlan interfaces
+                VMTopology.link_add_vlan(t_int_if, '%s.%s' % (t_int_if, vlan_subintf_vlan_id), vlan_subintf_vlan_id)
 
         if self.fp_mtu != DEFAULT_MTU:
-            VMTopology.cmd("ip link set dev %s mtu %d" % (ext_if, self.fp_mtu))
+            VMTopology.link_set_mtu(ext_if, self.fp_mtu)
             if VMTopology.intf_exists(t_int_if):
-                VMTopology.cmd("ip link set dev %s mtu %d" %
-                               (t_int_if, self.fp_mtu))
+                VMTopology.link_set_mtu(t_int_if, self.fp_mtu)
             elif VMTopology.intf_exists(t_int_if, pid=self.pid):
-                VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" %
-                               (self.pid, t_int_if, self.fp_mtu))
+                VMTopology.link_set_mtu(t_int_if, self.fp_mtu, pid=self.pid)
             elif VMTopology.intf_exists(int_if, pid=self.pid):
-                VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" %
-                               (self.pid, int_if, self.fp_mtu))
+                VMTopology.link_set_mtu(int_if, self.fp_mtu, pid=self.pid)
             if create_vlan_subintf:
                 if VMTopology.intf_exists(t_int_sub_if):
-                    VMTopology.cmd("ip link set dev %s mtu %d" %
-                                   (t_int_sub_if, self.fp_mtu))
+                    VMTopology.link_set_mtu(t_int_sub_if, self.fp_mtu)
                 elif VMTopology.intf_exists(t_int_sub_if, pid=self.pid):
-                    VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" %
-                                   (self.pid, t_int_sub_if, self.fp_mtu))
+                    VMTopology.link_set_mtu(t_int_sub_if, self.fp_mtu, pid=self.pid)
                 elif VMTopology.intf_exists(int_sub_if, pid=self.pid):
-                    VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" %
-                                   (self.pid, int_sub_if, self.fp_mtu))
+                    VMTopology.link_set_mtu(int_sub_if, self.fp_mtu, pid=self.pid)
 
         VMTopology.iface_up(ext_if)
 
         if VMTopology.intf_exists(t_int_if) \
                 and VMTopology.intf_not_exists(t_int_if, pid=self.pid) \
                 and VMTopology.intf_not_exists(int_if, pid=self.pid):
-            VMTopology.cmd("ip link set dev %s netns %s" %
-                           (t_int_if, self.pid))
+            VMTopology.link_set_netns(t_int_if, self.pid)
         if create_vlan_subintf \
                 and VMTopology.intf_exists(t_int_sub_if) \
                 and VMTopology.intf_not_exists(t_int_sub_if, pid=self.pid) \
                 and VMTopology.intf_not_exists(int_sub_if, pid=self.pid):
-            VMTopology.cmd("ip link set dev %s netns %s" %
-                           (t_int_sub_if, self.pid))
+            VMTopology.link_set_netns(t_int_sub_if, self.pid)
 
         if VMTopology.intf_exists(t_int_if, pid=self.pid) and VMTopology.intf_not_exists(int_if, pid=self.pid):
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" %
-                           (self.pid, t_int_if, int_if))
+            VMTopology.link_rename(t_int_if, int_if, pid=self.pid)
         if create_vlan_subintf \
                 and VMTopology.intf_exists(t_int_sub_if, pid=self.pid) \
                 and VMTopology.intf_not_exists(int_sub_if, pid=self.pid):
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" %
-                           (self.pid, t_int_sub_if, int_sub_if))
+            VMTopology.link_rename(t_int_sub_if, int_sub_if, pid=self.pid)
 
         VMTopology.iface_up(int_if, pid=self.pid)
         if create_vlan_subintf:
@@ -804,35 +1075,29 @@ class VMTopology(object):
         t_int_if = adaptive_temporary_interface(self.vm_set_name, int_if)
 
         if VMTopology.intf_exists(t_int_if):
-            VMTopology.cmd("ip link del dev %s" % t_int_if)
+            VMTopology.link_delete(t_int_if)
 
         if VMTopology.intf_not_exists(ext_if):
-            VMTopology.cmd("ip link add %s type veth peer name %s" %
-                           (ext_if, t_int_if))
+            VMTopology.link_add_veth(ext_if, t_int_if)
 
         if self.fp_mtu != DEFAULT_MTU:
-            VMTopology.cmd("ip link set dev %s mtu %d" % (ext_if, self.fp_mtu))
+            VMTopology.link_set_mtu(ext_if, self.fp_mtu)
             if VMTopology.intf_exists(t_int_if):
-                VMTopology.cmd("ip link set dev %s mtu %d" %
-                               (t_int_if, self.fp_mtu))
+                VMTopology.link_set_mtu(t_int_if, self.fp_mtu)
             elif VMTopology.intf_exists(t_int_if, netns=self.netns):
-                VMTopology.cmd("ip netns exec %s ip link set dev %s mtu %d" % (
-                    self.netns, t_int_if, self.fp_mtu))
+                VMTopology.link_set_mtu(t_int_if, self.fp_mtu, netns=self.netns)
             elif VMTopology.intf_exists(int_if, netns=self.netns):
-                VMTopology.cmd("ip netns exec %s ip link set dev %s mtu %d" % (
-                    self.netns, int_if, self.fp_mtu))
+                VMTopology.link_set_mtu(int_if, self.fp_mtu, netns=self.netns)
 
         VMTopology.iface_up(ext_if)
 
         if VMTopology.intf_exists(t_int_if) \
                 and VMTopology.intf_not_exists(t_int_if, netns=self.netns) \
                 and VMTopology.intf_not_exists(int_if, netns=self.netns):
-            VMTopology.cmd("ip link set dev %s netns %s" %
-                           (t_int_if, self.netns))
+            VMTopology.link_set_netns(t_int_if, self.netns)
 
         if VMTopology.intf_exists(t_int_if, netns=self.netns) and VMTopology.intf_not_exists(int_if, netns=self.netns):
-            VMTopology.cmd("ip netns exec %s ip link set dev %s name %s" % (
-                self.netns, t_int_if, int_if))
+            VMTopology.link_rename(t_int_if, int_if, netns=self.netns)
 
         VMTopology.iface_up(int_if, netns=self.netns)
 
@@ -841,15 +1106,15 @@ class VMTopology(object):
                      (mgmt_port, br_name))
         _, if_to_br = VMTopology.brctl_show(br_name)
         if mgmt_port not in if_to_br:
-            VMTopology.cmd("brctl addif %s %s" % (br_name, mgmt_port))
+            VMTopology.bridge_add_if(br_name, mgmt_port)
 
     def unbind_mgmt_port(self, mgmt_port):
         _, if_to_br = VMTopology.brctl_show()
         if mgmt_port in if_to_br:
-            VMTopology.cmd("brctl delif %s %s" %
-                           (if_to_br[mgmt_port], mgmt_port))
+            VMTopology.bridge_del_if(if_to_br[mgmt_port], mgmt_port)
 
     def bind_devices_interconnect(self):
+        batch = OVSBatch()
         for link_index, vlans in self.devices_interconnect_interfaces.items():
             interconnection_bridge = OVS_INTERCONNECTION_BRIDGE_TEMPLATE % (
                 self.vm_set_name, link_index)
@@ -863,7 +1128,8 @@ class VMTopology(object):
             vlan2_iface = self.duts_fp_ports[self.duts_name[dut_index_1]][str(
                 vlan_index_1)]
             self.bind_devices_interconnect_ports(
-                interconnection_bridge, vlan1_iface, vlan2_iface)
+                interconnection_bridge, vlan1_iface, vlan2_iface, batch=batch)
+        batch.apply(self.worker)
 
     def unbind_devices_interconnect(self):
         for link_index, vlans in self.devices_interconnect_interfaces.items():
@@ -881,21 +1147,18 @@ class VMTopology(object):
             self.unbind_ovs_port(interconnection_bridge, vlan2_iface)
             self.destroy_ovs_bridge(interconnection_bridge)
 
-    def bind_devices_interconnect_ports(self, br_name, vlan1_iface, vlan2_iface):
-        ports = VMTopology.get_ovs_br_ports(br_name)
-        if vlan1_iface not in ports:
-            VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, vlan1_iface))
-        if vlan2_iface not in ports:
-            VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, vlan2_iface))
-        bindings = VMTopology.get_ovs_port_bindings(br_name)
-        vlan1_iface_id = bindings[vlan1_iface]
-        vlan2_iface_id = bindings[vlan2_iface]
+    def bind_devices_interconnect_ports(self, br_name, vlan1_iface, vlan2_iface, batch=None):
+        if batch is None:
+            ovs_batch = OVSBatch()
+        else:
+            ovs_batch = batch
+        ovs_batch.add_ports(br_name, [vlan1_iface, vlan2_iface])
         # clear old bindings
-        VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
-        VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                       (br_name, vlan1_iface_id, vlan2_iface_id))
-        VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                       (br_name, vlan2_iface_id, vlan1_iface_id))
+        ovs_batch.clear_flows(br_name)
+        ovs_batch.add_flow(br_name, "table=0,in_port=%s,action=output:%s", vlan1_iface, vlan2_iface)
+        ovs_batch.add_flow(br_name, "table=0,in_port=%s,action=output:%s", vlan2_iface, vlan1_iface)
+        if batch is None:
+            ovs_batch.apply()
 
     def bind_fp_ports(self, disconnect_vm=False):
         """
@@ -913,7 +1176,7 @@ class VMTopology(object):
                             +----------------------+
 
         """
-        bind_ovs_ports_args = []
+        batch = OVSBatch()
         for attr in self.VMs.values():
             for idx, vlan in enumerate(attr['vlans']):
                 br_name = adaptive_name(
@@ -925,11 +1188,9 @@ class VMTopology(object):
                     INJECTED_INTERFACES_TEMPLATE, self.vm_set_name, ptf_index)
                 if len(self.duts_fp_ports[self.duts_name[dut_index]]) == 0:
                     continue
-                bind_ovs_ports_args.append(
-                    (br_name, self.duts_fp_ports[self.duts_name[dut_index]][str(vlan_index)],
-                     injected_iface, vm_iface, disconnect_vm)
-                )
-        self.worker.map(lambda args: self.bind_ovs_ports(*args), bind_ovs_ports_args)
+                self.bind_ovs_ports(br_name, self.duts_fp_ports[self.duts_name[dut_index]][str(vlan_index)],
+                                    injected_iface, vm_iface, disconnect_vm, batch=batch)
+        batch.apply(self.worker)
 
         if self.topo and 'DUT' in self.topo and 'vs_chassis' in self.topo['DUT']:
             # We have a KVM based virtaul chassis, bind the midplane and inband ports
@@ -952,6 +1213,7 @@ class VMTopology(object):
 
             self.bind_vm_link(br_name, port1, port2)
 
+        batch = OVSBatch()
         for k, attr in self.OVS_LINKs.items():
             logging.info("Create OVS links for {} : {}".format(k, attr))
             br_name = "br_{}".format(k.lower())
@@ -968,7 +1230,8 @@ class VMTopology(object):
             for vlan in vlans:
                 (_, _, ptf_index) = VMTopology.parse_vm_vlan_port(vlan)
                 injected_iface = adaptive_name(INJECTED_INTERFACES_TEMPLATE, self.vm_set_name, ptf_index)
-                self.bind_ovs_ports(br_name, port1, injected_iface, port2, disconnect_vm)
+                self.bind_ovs_ports(br_name, port1, injected_iface, port2, disconnect_vm, batch=batch)
+        batch.apply(self.worker)
 
     def unbind_fp_ports(self):
         logging.info("=== unbind front panel ports ===")
@@ -1036,14 +1299,14 @@ class VMTopology(object):
     def unbind_vm_link(self, br_name, port1, port2):
         _, if_to_br = VMTopology.brctl_show()
         if port1 in if_to_br:
-            VMTopology.cmd("brctl delif %s %s" % (br_name, port1))
+            VMTopology.bridge_del_if(br_name, port1)
         if port2 in if_to_br:
-            VMTopology.cmd("brctl delif %s %s" % (br_name, port2))
-        VMTopology.cmd('brctl delbr %s' % br_name)
+            VMTopology.bridge_del_if(br_name, port2)
+        VMTopology.bridge_delete(br_name)
 
     def bind_vm_link(self, br_name, port1, port2):
         if VMTopology.intf_not_exists(br_name):
-            VMTopology.cmd('brctl addbr %s' % br_name)
+            VMTopology.bridge_add(br_name)
         VMTopology.iface_up(br_name)
 
         # Remove port from ovs bridge
@@ -1057,16 +1320,16 @@ class VMTopology(object):
 
         m_to_ifs, _ = VMTopology.brctl_show()
         if port1 not in m_to_ifs[br_name]:
-            VMTopology.cmd("brctl addif %s %s" % (br_name, port1))
+            VMTopology.bridge_add_if(br_name, port1)
         if port2 not in m_to_ifs[br_name]:
-            VMTopology.cmd("brctl addif %s %s" % (br_name, port2))
+            VMTopology.bridge_add_if(br_name, port2)
         VMTopology.iface_up(port1)
         VMTopology.iface_up(port2)
 
     def bind_vm_backplane(self):
 
         if VMTopology.intf_not_exists(self.bp_bridge):
-            VMTopology.cmd('brctl addbr %s' % self.bp_bridge)
+            VMTopology.bridge_add(self.bp_bridge)
 
         VMTopology.iface_up(self.bp_bridge)
 
@@ -1076,8 +1339,7 @@ class VMTopology(object):
 
             br_to_ifs, _ = VMTopology.brctl_show()
             if bp_port_name not in br_to_ifs[self.bp_bridge]:
-                VMTopology.cmd("brctl addif %s %s" %
-                               (self.bp_bridge, bp_port_name))
+                VMTopology.bridge_add_if(self.bp_bridge, bp_port_name)
 
             VMTopology.iface_up(bp_port_name)
 
@@ -1085,7 +1347,7 @@ class VMTopology(object):
 
         if VMTopology.intf_exists(self.bp_bridge):
             VMTopology.iface_down(self.bp_bridge)
-            VMTopology.cmd('brctl delbr %s' % self.bp_bridge)
+            VMTopology.bridge_delete(self.bp_bridge)
 
     def bind_vs_dut_ports(self, br_name, dut_ports):
         # dut_ports is a list of port on each DUT that has to be bound together. eg. 30,30,30 - will bind ports
@@ -1115,7 +1377,7 @@ class VMTopology(object):
                     VMTopology.cmd('ovs-vsctl del-port %s %s' %
                                    (br_name, port_name))
 
-    def bind_ovs_ports(self, br_name, dut_iface, injected_iface, vm_iface, disconnect_vm=False):
+    def bind_ovs_ports(self, br_name, dut_iface, injected_iface, vm_iface, disconnect_vm=False, batch=None):
         """
         bind dut/injected/vm ports under an ovs bridge as follows
 
@@ -1124,117 +1386,72 @@ class VMTopology(object):
             PTF (injected_iface) --+ OVS bridge (br_name) |
                                    |                      +---- vm_iface
                                    +----------------------+
-        """
-        br = VMTopology.get_ovs_bridge_by_port(injected_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, injected_iface))
-
-        br = VMTopology.get_ovs_bridge_by_port(dut_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, dut_iface))
-
-        br = VMTopology.get_ovs_bridge_by_port(vm_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, vm_iface))
-
-        ports = VMTopology.get_ovs_br_ports(br_name)
-        if injected_iface not in ports:
-            VMTopology.cmd('ovs-vsctl add-port %s %s' %
-                           (br_name, injected_iface))
 
-        if dut_iface not in ports:
-            VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, dut_iface))
-
-        if vm_iface not in ports:
-            VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, vm_iface))
+        If batch is given, the binding is added to the batch, and applied together with the batch.
+        """
+        if batch is None:
+            ovs_batch = OVSBatch()
+        else:
+            ovs_batch = batch
 
-        bindings = VMTopology.get_ovs_port_bindings(br_name, [dut_iface])
-        dut_iface_id = bindings[dut_iface]
-        injected_iface_id = bindings[injected_iface]
-        vm_iface_id = bindings[vm_iface]
+        ovs_batch.add_ports(br_name, [injected_iface, dut_iface, vm_iface])
 
         # clear old bindings
-        VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
+        ovs_batch.clear_flows(br_name)
 
         if disconnect_vm:
             # Drop packets from VM
-            VMTopology.cmd(
-                "ovs-ofctl add-flow %s table=0,in_port=%s,action=drop" % (br_name, vm_iface_id))
+            ovs_batch.add_flow(br_name, "table=0,in_port=%s,action=drop", vm_iface)
         else:
             # Add flow from a VM to an external iface
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, vm_iface_id, dut_iface_id))
+            ovs_batch.add_flow(br_name, "table=0,in_port=%s,action=output:%s", vm_iface, dut_iface)
 
         if disconnect_vm:
             # Add flow from external iface to ptf container
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, dut_iface_id, injected_iface_id))
+            ovs_batch.add_flow(br_name, "table=0,in_port=%s,action=output:%s", dut_iface, injected_iface)
         else:
             # Add flow from external iface to a VM and a ptf container
             # Allow BGP, IPinIP, fragmented packets, ICMP, SNMP packets and layer2 packets from DUT to neighbors
             # Block other traffic from DUT to EOS for EOS's stability,
             # Allow all traffic from DUT to PTF.
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,tcp,in_port=%s,tp_src=179,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,tcp,in_port=%s,tp_dst=179,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,tcp,in_port=%s,tp_dst=22,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,tcp,in_port=%s,tp_src=22,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,tcp6,in_port=%s,tp_src=179,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,tcp6,in_port=%s,tp_dst=179,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,tcp6,in_port=%s,tp_dst=22,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,tcp6,in_port=%s,tp_src=22,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,ip,in_port=%s,nw_proto=4,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=8,ip,in_port=%s,nw_frag=yes,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=8,ipv6,in_port=%s,nw_frag=yes,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=8,icmp,in_port=%s,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=8,icmp6,in_port=%s,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=8,udp,in_port=%s,udp_src=161,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=8,udp,in_port=%s,udp_src=53,action=output:%s" %
-                           (br_name, dut_iface_id, vm_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=8,udp6,in_port=%s,udp_src=161,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=5,ip,in_port=%s,action=output:%s" %
-                           (br_name, dut_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=5,ipv6,in_port=%s,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=3,in_port=%s,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,ip,in_port=%s,nw_proto=89,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,priority=10,ipv6,in_port=%s,nw_proto=89,action=output:%s,%s" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-
-        # Add flow for BFD Control packets (UDP port 3784)
-            VMTopology.cmd("ovs-ofctl add-flow %s 'table=0,priority=10,udp,in_port=%s,\
-                           udp_dst=3784,action=output:%s,%s'" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s 'table=0,priority=10,udp6,in_port=%s,\
-                           udp_dst=3784,action=output:%s,%s'" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            # Add flow for BFD Control packets (UDP port 3784)
-            VMTopology.cmd("ovs-ofctl add-flow %s 'table=0,priority=10,udp,in_port=%s,\
-                           udp_src=49152,udp_dst=3784,action=output:%s,%s'" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            VMTopology.cmd("ovs-ofctl add-flow %s 'table=0,priority=10,udp6,in_port=%s,\
-                           udp_src=49152,udp_dst=3784,action=output:%s,%s'" %
-                           (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-
-        # Add flow from a ptf container to an external iface
-            VMTopology.cmd("ovs-ofctl add-flow %s 'table=0,in_port=%s,action=output:%s'" %
-                           (br_name, injected_iface_id, dut_iface_id))
+            for flow in ["table=0,priority=10,tcp,in_port=%s,tp_src=179,action=output:%s,%s",
+                         "table=0,priority=10,tcp,in_port=%s,tp_dst=179,action=output:%s,%s",
+                         "table=0,priority=10,tcp,in_port=%s,tp_dst=22,action=output:%s,%s",
+                         "table=0,priority=10,tcp,in_port=%s,tp_src=22,action=output:%s,%s",
+                         "table=0,priority=10,tcp6,in_port=%s,tp_src=179,action=output:%s,%s",
+                         "table=0,priority=10,tcp6,in_port=%s,tp_dst=179,action=output:%s,%s",
+                         "table=0,priority=10,tcp6,in_port=%s,tp_dst=22,action=output:%s,%s",
+                         "table=0,priority=10,tcp6,in_port=%s,tp_src=22,action=output:%s,%s",
+                         "table=0,priority=10,ip,in_port=%s,nw_proto=4,action=output:%s,%s",
+                         "table=0,priority=8,ip,in_port=%s,nw_frag=yes,action=output:%s,%s",
+                         "table=0,priority=8,ipv6,in_port=%s,nw_frag=yes,action=output:%s,%s",
+                         "table=0,priority=8,icmp,in_port=%s,action=output:%s,%s",
+                         "table=0,priority=8,icmp6,in_port=%s,action=output:%s,%s",
+                         "table=0,priority=8,udp,in_port=%s,udp_src=161,action=output:%s,%s"]:
+                ovs_batch.add_flow(br_name, flow, dut_iface, vm_iface, injected_iface)
+            ovs_batch.add_flow(br_name, "table=0,priority=8,udp,in_port=%s,udp_src=53,action=output:%s",
+                               dut_iface, vm_iface)
+            ovs_batch.add_flow(br_name, "table=0,priority=8,udp6,in_port=%s,udp_src=161,action=output:%s,%s",
+                               dut_iface, vm_iface, injected_iface)
+            ovs_batch.add_flow(br_name, "table=0,priority=5,ip,in_port=%s,action=output:%s",
+                               dut_iface, injected_iface)
+            for flow in ["table=0,priority=5,ipv6,in_port=%s,action=output:%s,%s",
+                         "table=0,priority=3,in_port=%s,action=output:%s,%s",
+                         "table=0,priority=10,ip,in_port=%s,nw_proto=89,action=output:%s,%s",
+                         "table=0,priority=10,ipv6,in_port=%s,nw_proto=89,action=output:%s,%s",
+                         # Add flow for BFD Control packets (UDP port 3784)
+                         "table=0,priority=10,udp,in_port=%s,udp_dst=3784,action=output:%s,%s",
+                         "table=0,priority=10,udp6,in_port=%s,udp_dst=3784,action=output:%s,%s",
+                         # Add flow for BFD Control packets (UDP port 3784)
+                         "table=0,priority=10,udp,in_port=%s,udp_src=49152,udp_dst=3784,action=output:%s,%s",
+                         "table=0,priority=10,udp6,in_port=%s,udp_src=49152,udp_dst=3784,action=output:%s,%s"]:
+                ovs_batch.add_flow(br_name, flow, dut_iface, vm_iface, injected_iface)
+
+            # Add flow from a ptf container to an external iface
+            ovs_batch.add_flow(br_name, "table=0,in_port=%s,action=output:%s", injected_iface, dut_iface)
+
+        if batch is None:
+            ovs_batch.apply()
 
     def unbind_ovs_ports(self, br_name, vm_port):
         """unbind all ports except the vm port from an ovs bridge"""
@@ -1279,43 +1496,26 @@ class VMTopology(object):
 
         self.create_ovs_bridge(br_name, self.fp_mtu)
 
-        for intf in [host_if, upper_if, lower_if]:
-            br = VMTopology.get_ovs_bridge_by_port(intf)
-            if br is not None and br != br_name:
-                VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, intf))
-
-        ports = VMTopology.get_ovs_br_ports(br_name)
+        batch = OVSBatch()
         ports_to_be_attached = [host_if, upper_if, lower_if]
         if nic_if is not None:
             ports_to_be_attached.append(nic_if)
-        for intf in ports_to_be_attached:
-            if intf not in ports:
-                VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, intf))
-
-        bridge_ports = [upper_if, lower_if]
-        if nic_if is not None:
-            bridge_ports.append(nic_if)
-        bindings = VMTopology.get_ovs_port_bindings(br_name, bridge_ports)
-        host_if_id = bindings[host_if]
-        upper_if_id = bindings[upper_if]
-        lower_if_id = bindings[lower_if]
+        batch.add_ports(br_name, ports_to_be_attached)
 
         # clear old bindings
-        VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
+        batch.clear_flows(br_name)
 
         if nic_if is not None:
             # TODO: open-flow configuration for ovs-bridge simulating server smart NIC
             pass
         else:
             # open-flow configuration for ovs-bridge simulating mux of dualtor y-cable
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s,%s" %
-                           (br_name, host_if_id, upper_if_id, lower_if_id))
+            batch.add_flow(br_name, "table=0,in_port=%s,action=output:%s,%s", host_if, upper_if, lower_if)
             if active_if_index == 0:
-                VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                               (br_name, upper_if_id, host_if_id))
+                batch.add_flow(br_name, "table=0,in_port=%s,action=output:%s", upper_if, host_if)
             else:
-                VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                               (br_name, lower_if_id, host_if_id))
+                batch.add_flow(br_name, "table=0,in_port=%s,action=output:%s", lower_if, host_if)
+        batch.apply()
 
     def remove_dualtor_cable(self, host_ifindex, is_active_active=False):
         """
@@ -1412,7 +1612,7 @@ class VMTopology(object):
 
     def enable_netns_loopback(self):
         """Enable loopback device in the netns."""
-        VMTopology.cmd("ip netns exec %s ifconfig lo up" % self.netns)
+        VMTopology.iface_up('lo', netns=self.netns)
 
     def setup_netns_source_routing(self):
         """Setup policy-based routing to forward packet to its igress ports."""
@@ -1512,13 +1712,13 @@ class VMTopology(object):
         if VMTopology.intf_exists(int_if, pid=self.pid):
             # Name it back to temp name in PTF container to avoid potential conflicts
             VMTopology.iface_down(int_if, pid=self.pid)
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, int_if, tmp_name))
+            VMTopology.link_rename(int_if, tmp_name, pid=self.pid)
             # Set it to default namespace
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s netns 1" % (self.pid, tmp_name))
+            VMTopology.link_set_netns(tmp_name, 1, pid=self.pid)
 
         # Delete its peer in default namespace
         if VMTopology.intf_exists(ext_if):
-            VMTopology.cmd("ip link delete dev %s" % ext_if)
+            VMTopology.link_delete(ext_if)
 
     def remove_ptf_mgmt_port(self):
         ext_if = PTF_MGMT_IF_TEMPLATE % self.vm_set_name
@@ -1570,12 +1770,12 @@ class VMTopology(object):
     def intf_exists(intf, pid=None, netns=None):
         """Check if the specified interface exists.
 
-        This function uses command "ifconfig <intf name>" to check the existence of the specified interface. By default
-        the command is executed on host. If a pid is specified, this command is executed in the network namespace
-        of the specified pid. The meaning is to check if the interface exists in a specific docker.
-        If a netns is specified, this command is executed in the specified network namespace. The specified network
-        namespace is not a docker container. It is a network namespace created using the "ip netns" command.
-        The both pip and netns arguments are specified, the pid argument takes precedence.
+        This function uses netlink, or command "ifconfig <intf name>" if netlink is not used, to check the existence of
+        the specified interface. By default the command is executed on host. If a pid is specified, this command is
+        executed in the network namespace of the specified pid. The meaning is to check if the interface exists in a
+        specific docker. If a netns is specified, this command is executed in the specified network namespace. The
+        specified network namespace is not a docker container. It is a network namespace created using the "ip netns"
+        command. The both pip and netns arguments are specified, the pid argument takes precedence.
 
         Args:
             intf (str): Name of the interface.
@@ -1585,6 +1785,13 @@ class VMTopology(object):
         Returns:
             bool: True if the interface exists. Otherwise False.
         """
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            try:
+                return netlink.get(intf, pid=pid, netns=netns) is not None
+            except Exception:
+                return False
+
         cmdline = VMTopology._intf_cmd(intf, pid=pid, netns=netns)
 
         try:
@@ -1597,12 +1804,12 @@ class VMTopology(object):
     def intf_not_exists(intf, pid=None, netns=None):
         """Check if the specified interface does not exist.
 
-        This function uses command "ifconfig <intf name>" to check the existence of the specified interface. By default
-        the command is executed on host. If a pid is specified, this command is executed in the network namespace
-        of the specified pid. The meaning is to check if the interface exists in a specific docker.
-        If a netns is specified, this command is executed in the specified network namespace. The specified network
-        namespace is not a docker container. It is a network namespace created using the "ip netns" command.
-        The both pip and netns arguments are specified, the pid argument takes precedence.
+        This function uses netlink, or command "ifconfig <intf name>" if netlink is not used, to check the existence of
+        the specified interface. By default the command is executed on host. If a pid is specified, this command is
+        executed in the network namespace of the specified pid. The meaning is to check if the interface exists in a
+        specific docker. If a netns is specified, this command is executed in the specified network namespace. The
+        specified network namespace is not a docker container. It is a network namespace created using the "ip netns"
+        command. The both pip and netns arguments are specified, the pid argument takes precedence.
 
         Args:
             intf (str): Name of the interface.
@@ -1612,6 +1819,14 @@ class VMTopology(object):
         Returns:
             bool: True if the interface does not exist. Otherwise False.
         """
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            try:
+                return netlink.get(intf, pid=pid, netns=netns) is None
+            except Exception:
+                # The namespace doesn't exist
+                return True
+
         cmdline = VMTopology._intf_cmd(intf, pid=pid, netns=netns)
 
         try:
@@ -1630,6 +1845,9 @@ class VMTopology(object):
 
     @staticmethod
     def iface_updown(iface_name, state, pid, netns):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            return netlink.set(iface_name, pid=pid, netns=netns, state=state)
         if pid is not None:
             return VMTopology.cmd('nsenter -t %s -n ip link set %s %s' % (pid, iface_name, state))
         elif netns is not None:
@@ -1637,6 +1855,102 @@ class VMTopology(object):
         else:
             return VMTopology.cmd('ip link set %s %s' % (iface_name, state))
 
+    @staticmethod
+    def _netlink():
+        """Return the NetlinkLinks if links are changed through netlink, or None if commands are used."""
+        # Commands are recorded in dry runs, links of the host should not be changed
+        if VMTopology.cmd_recorder is None:
+            return VMTopology.netlink
+        return None
+
+    @staticmethod
+    def _ns_cmd(cmdline, pid=None, netns=None):
+        if pid is not None:
+            return 'nsenter -t %s -n %s' % (pid, cmdline)
+        elif netns is not None:
+            return 'ip netns exec %s %s' % (netns, cmdline)
+        return cmdline
+
+    @staticmethod
+    def link_add_veth(iface_name, peer_name):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            return netlink.add(iface_name, kind='veth', peer=peer_name)
+        return VMTopology.cmd('ip link add %s type veth peer name %s' % (iface_name, peer_name))
+
+    @staticmethod
+    def link_add_vlan(link_name, iface_name, vlan_id, pid=None, netns=None):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            link = netlink.get(link_name, pid=pid, netns=netns)
+            if link is None:
+                raise Exception('Link %s does not exist' % link_name)
+            return netlink.add(iface_name, pid=pid, netns=netns, kind='vlan', link=link['index'],
+                               vlan_id=int(vlan_id))
+        return VMTopology.cmd(VMTopology._ns_cmd('ip link add link %s name %s type vlan id %s' %
+                                                 (link_name, iface_name, vlan_id), pid, netns))
+
+    @staticmethod
+    def link_delete(iface_name, pid=None, netns=None):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            return netlink.delete(iface_name, pid=pid, netns=netns)
+        return VMTopology.cmd(VMTopology._ns_cmd('ip link del dev %s' % iface_name, pid, netns))
+
+    @staticmethod
+    def link_rename(iface_name, new_name, pid=None, netns=None):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            return netlink.set(iface_name, pid=pid, netns=netns, ifname=new_name)
+        return VMTopology.cmd(VMTopology._ns_cmd('ip link set dev %s name %s' % (iface_name, new_name), pid, netns))
+
+    @staticmethod
+    def link_set_mtu(iface_name, mtu, pid=None, netns=None):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            return netlink.set(iface_name, pid=pid, netns=netns, mtu=mtu)
+        return VMTopology.cmd(VMTopology._ns_cmd('ip link set dev %s mtu %d' % (iface_name, mtu), pid, netns))
+
+    @staticmethod
+    def link_set_netns(iface_name, target, pid=None, netns=None):
+        """Move a link to the namespace of target, which is pid of a docker container, 1 for the host namespace,
+        or name of a network namespace."""
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            return netlink.move(iface_name, target, pid=pid, netns=netns)
+        return VMTopology.cmd(VMTopology._ns_cmd('ip link set dev %s netns %s' % (iface_name, target), pid, netns))
+
+    @staticmethod
+    def bridge_add(br_name):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            return netlink.add(br_name, kind='bridge')
+        return VMTopology.cmd('brctl addbr %s' % br_name)
+
+    @staticmethod
+    def bridge_delete(br_name):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            return netlink.delete(br_name)
+        return VMTopology.cmd('brctl delbr %s' % br_name)
+
+    @staticmethod
+    def bridge_add_if(br_name, iface_name):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            bridge = netlink.get(br_name)
+            if bridge is None:
+                raise Exception('Bridge %s does not exist' % br_name)
+            return netlink.set(iface_name, master=bridge['index'])
+        return VMTopology.cmd('brctl addif %s %s' % (br_name, iface_name))
+
+    @staticmethod
+    def bridge_del_if(br_name, iface_name):
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            return netlink.set(iface_name, master=0)
+        return VMTopology.cmd('brctl delif %s %s' % (br_name, iface_name))
+
     @staticmethod
     def iface_disable_txoff(iface_name, pid=None):
         if pid is None:
@@ -1645,7 +1959,8 @@ class VMTopology(object):
             return VMTopology.cmd('nsenter -t %s -n ethtool -K %s tx off' % (pid, iface_name))
 
     @staticmethod
-    def cmd(cmdline, grep_cmd=None, retry=1, negative=False, shell=False, split_cmd=True, ignore_errors=False):
+    def cmd(cmdline, grep_cmd=None, retry=1, negative=False, shell=False, split_cmd=True, ignore_errors=False,
+            input_data=None):
         """Execute a command and return the output
 
         Args:
@@ -1654,6 +1969,7 @@ class VMTopology(object):
             retry (int, optional): Max number of retry if command result is unexpected. Defaults to 1.
             negative (bool, optional): If negative is True, expect the command to fail. Defaults to False.
             ignore_errors (bool, optional): If ignore_errors is True, return the output even if the command fails.
+            input_data (str, optional): Data sent to stdin of the command. Not supported with grep_cmd.
 
         Raises:
             Exception: If command result is unexpected after max number of retries, raise an exception.
@@ -1662,6 +1978,12 @@ class VMTopology(object):
             str: Output of the command.
         """
 
+        if VMTopology.cmd_recorder is not None:
+            return VMTopology.cmd_recorder(cmdline, grep_cmd=grep_cmd, input_data=input_data)
+        if VMTopology.netlink is not None:
+            # Links may be changed by the command
+            VMTopology.netlink.clear()
+
         cmdline_ori = cmdline
         grep_cmd_ori = grep_cmd
         for attempt in range(retry):
@@ -1687,7 +2009,7 @@ class VMTopology(object):
                 out, err = process_grep.communicate()
                 ret_code = process_grep.returncode
             else:
-                out, err = process.communicate()
+                out, err = process.communicate(input_data.encode('utf-8') if input_data is not None else None)
                 ret_code = process.returncode
             out, err = out.decode('utf-8'), err.decode('utf-8')
 
@@ -1765,19 +2087,36 @@ class VMTopology(object):
 
     @staticmethod
     def get_pid(ptf_name):
+        if ptf_name in VMTopology._pids:
+            return VMTopology._pids[ptf_name]
+
         cli = docker.from_env()
         try:
             ctn = cli.containers.get(ptf_name)
         except Exception:
             return None
 
-        return ctn.attrs['State']['Pid']
+        VMTopology._pids[ptf_name] = ctn.attrs['State']['Pid']
+        return VMTopology._pids[ptf_name]
 
     @staticmethod
     def brctl_show(bridge=None):
         br_to_ifs = {}
         if_to_br = {}
 
+        netlink = VMTopology._netlink()
+        if netlink is not None:
+            links = netlink.dump()
+            bridges = dict((link['index'], name) for name, link in links.items()
+                           if link['kind'] == 'bridge' and (not bridge or name == bridge))
+            for name in bridges.values():
+                br_to_ifs[name] = []
+            for name, link in sorted(links.items()):
+                if link['master'] in bridges:
+                    br_to_ifs[bridges[link['master']]].append(name)
+                    if_to_br[name] = bridges[link['master']]
+            return br_to_ifs, if_to_br
+
         cmdline = "brctl show "
         if bridge:
             cmdline += bridge
@@ -2111,6 +2450,7 @@ def main():
             netns_mgmt_ip_addr=dict(required=False, type='str', default=None),
             is_dpu=(dict(required=False, type='bool', default=False)),
             use_thread_worker=dict(required=False, type='bool', default=True),
+            use_netlink=dict(required=False, type='bool', default=True),
             thread_worker_count=dict(required=False, type='int',
                                      default=max(MIN_THREAD_WORKER_COUNT,
                                                  multiprocessing.cpu_count() // 8))
@@ -2127,9 +2467,16 @@ def main():
     dut_interfaces = module.params['dut_interfaces']
     use_thread_worker = module.params['use_thread_worker']
     thread_worker_count = module.params['thread_worker_count']
+    use_netlink = module.params['use_netlink']
 
     config_module_logging(construct_log_filename(cmd, vm_set_name))
 
+    if use_netlink:
+        if IPRoute is None:
+            logging.info("pyroute2 is not installed, change links with commands")
+        else:
+            VMTopology.netlink = NetlinkLinks()
+
     if cmd == 'bind_keysight_api_server_ip':
         vm_names = []
 
@@ -2408,6 +2755,9 @@ def main():
     except Exception as error:
         logging.error(traceback.format_exc())
         module.fail_json(msg=str(error))
+    finally:
+        if VMTopology.netlink is not None:
+            VMTopology.netlink.close()
 
     module.exit_json(changed=True)
 
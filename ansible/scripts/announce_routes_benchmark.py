@@ -0,0 +1,124 @@
+"""Benchmark of announcing routes to the exabgp http api, posting forms vs streaming.
+
+The http api script of the exabgp module is run locally, its stdout is read by a stand-in of exabgp which counts the
+commands and optionally spends some time on each of them. Routes are generated the way announce_routes generates
+routes of a T1 spine VM.
+
+Flask is required to run the http api. Usage:
+    python announce_routes_benchmark.py --podset-number 200 --tor-number 16 --tor-subnet-number 32
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import ansible.module_utils
+
+ANSIBLE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# announce_routes imports module_utils of sonic-mgmt, which ansible adds to ansible.module_utils when running modules
+ansible.module_utils.__path__.append(os.path.join(ANSIBLE_PATH, 'module_utils'))
+sys.path.insert(0, os.path.join(ANSIBLE_PATH, 'library'))
+
+import announce_routes    # noqa: E402
+import exabgp    # noqa: E402
+
+
+class ExabgpStandIn(object):
+    """Reads commands from stdout of the http api like exabgp does."""
+
+    def __init__(self, pipe, delay):
+        self.pipe = pipe
+        self.delay = delay
+        self.count = 0
+        self.cond = threading.Condition()
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    def run(self):
+        for line in iter(self.pipe.readline, b''):
+            if self.delay:
+                time.sleep(self.delay)
+            with self.cond:
+                self.count += 1
+                self.cond.notify_all()
+
+    def wait_for(self, count, timeout=600):
+        deadline = time.time() + timeout
+        with self.cond:
+            while self.count < count and time.time() < deadline:
+                self.cond.wait(1)
+            return self.count >= count
+
+
+def timed(name, count, standin, func):
+    expected = standin.count + count
+    start = time.time()
+    func()
+    if not standin.wait_for(expected):
+        raise Exception('{}: exabgp stand-in received {} of {} commands'.format(name, standin.count, expected))
+    elapsed = time.time() - start
+    print('{:<8} {} routes in {:.3f}s, {:.0f} routes per second'.format(name, count, elapsed, count / elapsed))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark announcing routes to the exabgp http api')
+    parser.add_argument('--podset-number', type=int, default=announce_routes.PODSET_NUMBER)
+    parser.add_argument('--tor-number', type=int, default=announce_routes.TOR_NUMBER)
+    parser.add_argument('--tor-subnet-number', type=int, default=announce_routes.TOR_SUBNET_NUMBER)
+    parser.add_argument('--form-batch', type=int, default=20000,
+                        help='Routes per form post, forms are limited to 4MB by the http api')
+    parser.add_argument('--delay-us', type=float, default=0, help='Time the exabgp stand-in spends on a command')
+    parser.add_argument('--port', type=int, default=15000)
+    args = parser.parse_args()
+
+    max_tor_subnet_number = max(args.tor_subnet_number, announce_routes.MAX_TOR_SUBNET_NUMBER)
+    routes = announce_routes.generate_routes(
+        'v4', args.podset_number, args.tor_number, args.tor_subnet_number, None, announce_routes.LEAF_ASN_START,
+        announce_routes.TOR_ASN_START, announce_routes.NHIPV4, announce_routes.NHIPV6,
+        announce_routes.TOR_SUBNET_SIZE, max_tor_subnet_number, 't1', router_type='spine')
+
+    tmpdir = tempfile.mkdtemp()
+    script = os.path.join(tmpdir, 'http_api.py')
+    with open(script, 'w') as f:
+        f.write(exabgp.http_api_py)
+    proc = subprocess.Popen([sys.executable, script, str(args.port)], stdout=subprocess.PIPE)
+    try:
+        standin = ExabgpStandIn(proc.stdout, args.delay_us / 1000000.0)
+        for _ in range(60):
+            time.sleep(1)
+            if announce_routes.wait_for_http('127.0.0.1', args.port, timeout=1):
+                break
+        else:
+            raise Exception('http api is not listening on port {}'.format(args.port))
+        url = 'http://127.0.0.1:{}'.format(args.port)
+
+        def post_forms():
+            for start in range(0, len(routes), args.form_batch):
+                cmds = announce_routes.route_commands('announce', routes[start:start + args.form_batch])
+                r = announce_routes.post_with_retry(url, {'commands': ';'.join(cmds)})
+                if r.status_code != 200:
+                    raise Exception('Posting form failed, status_code={}'.format(r.status_code))
+
+        def stream():
+            if not announce_routes.stream_routes('announce', '127.0.0.1', args.port, routes):
+                raise Exception('Streaming is not supported by the http api')
+
+        form_time = timed('form', len(routes), standin, post_forms)
+        stream_time = timed('stream', len(routes), standin, stream)
+        print('speedup: {:.1f}x'.format(form_time / stream_time))
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(tmpdir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
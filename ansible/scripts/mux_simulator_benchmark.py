@@ -0,0 +1,182 @@
+"""Load benchmark of the mux simulator with concurrent clients.
+
+The mux simulator is started in this process with ovs-vsctl and ovs-ofctl commands simulated on an in-memory model of
+the mux bridges, running a command is simulated by sleeping for --cmd-time seconds. Client processes poll status of
+muxes, the way the simulated y_cable driver on the DUTs does, while writer processes keep toggling active side of
+random muxes. Latency of status requests is reported. At the end, status of every mux is compared with the simulated
+flows on its bridge.
+
+Usage:
+    python mux_simulator_benchmark.py --ports 32 --clients 16 --writers 2
+    python mux_simulator_benchmark.py --ports 32 --clients 16 --bulk
+"""
+
+import argparse
+import collections
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import shlex
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+ANSIBLE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VM_SET = 'vms-bench'
+
+
+class OVSSimulator(object):
+    """Simulates ovs-vsctl and ovs-ofctl commands run by the mux simulator on mux bridges."""
+
+    def __init__(self, mux_simulator, ports, cmd_time):
+        self.cmd_time = cmd_time
+        self.lock = threading.Lock()
+        self.bridges = collections.OrderedDict()
+        # flows[bridge][in_port] = [out_port, ...]
+        self.flows = {}
+        for port_index in range(ports):
+            bridge = mux_simulator.adaptive_name(mux_simulator.MUX_BRIDGE_TEMPLATE, VM_SET, port_index)
+            nic = mux_simulator.adaptive_name('muxy-', VM_SET, port_index)
+            upper_tor, lower_tor = 'ens1f0.%d' % (1000 + port_index), 'ens1f1.%d' % (1000 + port_index)
+            self.bridges[bridge] = [upper_tor, lower_tor, nic]
+            self.flows[bridge] = {nic: [upper_tor, lower_tor], upper_tor: [nic]}
+
+    def __call__(self, cmdline):
+        args = [arg for arg in shlex.split(cmdline) if not arg.startswith('--')]
+        time.sleep(self.cmd_time)
+        with self.lock:
+            if args[:2] == ['ovs-vsctl', 'list-ports']:
+                return ''.join(port + '\n' for port in sorted(self.bridges[args[2]]))
+            command, bridge = args[1], args[2]
+            flows = self.flows[bridge]
+            if command == 'dump-flows':
+                return ''.join('cookie=0x0, duration=1.000s, table=0, n_packets=0, n_bytes=0, in_port="{}" '
+                               'actions={}\n'.format(port, ','.join('output:"{}"'.format(out) for out in outs))
+                               for port, outs in flows.items())
+            in_port, _, actions = args[3][len('in_port='):].partition(',actions=')
+            if command == 'del-flows':
+                flows.pop(in_port, None)
+            elif command in ('add-flow', 'mod-flows'):
+                flows[in_port] = re.findall(r'output:(\S+?)(?:,|$)', actions)
+            else:
+                raise Exception('Unsupported command {}'.format(cmdline))
+            return ''
+
+
+def http_request(port, method, path, data=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        body = json.dumps(data) if data is not None else None
+        conn.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+        resp = conn.getresponse()
+        content = resp.read()
+        if resp.status != 200:
+            raise Exception('{} {} failed with {}: {}'.format(method, path, resp.status, content))
+        return json.loads(content)
+    finally:
+        conn.close()
+
+
+def poll_status(http_port, paths, deadline, results):
+    latencies = []
+    while time.time() < deadline:
+        start = time.time()
+        http_request(http_port, 'GET', random.choice(paths))
+        latencies.append(time.time() - start)
+    results.put(latencies)
+
+
+def toggle_muxes(http_port, ports, deadline, results):
+    count = 0
+    while time.time() < deadline:
+        path = '/mux/{}/{}'.format(VM_SET, random.randrange(ports))
+        http_request(http_port, 'POST', path, {'active_side': 'toggle'})
+        count += 1
+    results.put(count)
+
+
+def load_mux_simulator(path):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    module = __import__(os.path.splitext(os.path.basename(path))[0])
+    module.app.config['VERBOSE'] = False
+    module.app.logger.setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    return module
+
+
+def check_status(http_port, ovs):
+    """Compare status of every mux with the simulated flows on its bridge."""
+    status = http_request(http_port, 'GET', '/mux/{}'.format(VM_SET))
+    errors = 0
+    for bridge, flows in ovs.flows.items():
+        status_flows = dict((in_port, [flow['out_port'] for flow in outs])
+                            for in_port, outs in status[bridge]['flows'].items() if outs)
+        if dict((in_port, sorted(outs)) for in_port, outs in status_flows.items()) \
+                != dict((in_port, sorted(outs)) for in_port, outs in flows.items()):
+            print('ERROR: status of bridge {} is {}, but flows on bridge are {}'.format(bridge, status_flows, flows))
+            errors += 1
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load benchmark of the mux simulator with concurrent clients')
+    parser.add_argument('--simulator', help='Path of the mux simulator',
+                        default=os.path.join(ANSIBLE_PATH, 'roles', 'vm_set', 'files', 'mux_simulator.py'))
+    parser.add_argument('--ports', type=int, default=32, help='Number of muxes')
+    parser.add_argument('--clients', type=int, default=16, help='Number of client processes polling status')
+    parser.add_argument('--writers', type=int, default=2, help='Number of client processes toggling muxes')
+    parser.add_argument('--duration', type=float, default=10, help='Duration of the benchmark in seconds')
+    parser.add_argument('--cmd-time', type=float, default=0.01,
+                        help='Time in seconds of running an ovs-vsctl or ovs-ofctl command')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Poll status of all the muxes at once from /muxes, instead of polling muxes one by one')
+    args = parser.parse_args()
+
+    mux_simulator = load_mux_simulator(args.simulator)
+    ovs = OVSSimulator(mux_simulator, args.ports, args.cmd_time)
+    mux_simulator.run_cmd = ovs
+    mux_simulator.Muxes._mux_bridges = lambda self: list(ovs.bridges)
+    mux_simulator.create_muxes(VM_SET)
+
+    server = make_server('127.0.0.1', 0, mux_simulator.app, threaded=True)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    if args.bulk:
+        paths = ['/muxes']
+    else:
+        paths = ['/mux/{}/{}'.format(VM_SET, port_index) for port_index in range(args.ports)]
+    deadline = time.time() + args.duration
+    readers, writers = multiprocessing.Queue(), multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=poll_status, args=(server.port, paths, deadline, readers))
+                 for _ in range(args.clients)]
+    processes += [multiprocessing.Process(target=toggle_muxes, args=(server.port, args.ports, deadline, writers))
+                  for _ in range(args.writers)]
+    for process in processes:
+        process.start()
+    latencies = sorted(sum((readers.get() for _ in range(args.clients)), []))
+    toggles = sum(writers.get() for _ in range(args.writers))
+    for process in processes:
+        process.join()
+
+    statuses = len(latencies) * (args.ports if args.bulk else 1)
+    print('{} status requests, {:.0f} requests per second, {:.0f} mux statuses per second'.format(
+        len(latencies), len(latencies) / args.duration, statuses / args.duration))
+    print('latency p50 {:.2f}ms, p99 {:.2f}ms, max {:.2f}ms'.format(
+        latencies[len(latencies) // 2] * 1000, latencies[len(latencies) * 99 // 100] * 1000, latencies[-1] * 1000))
+    print('{} toggles, {:.0f} toggles per second'.format(toggles, toggles / args.duration))
+
+    errors = check_status(server.port, ovs)
+    server.shutdown()
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
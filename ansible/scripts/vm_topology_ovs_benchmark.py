@@ -0,0 +1,232 @@
+"""Dry run benchmark of binding front panel ports of a topology to OVS bridges by vm_topology.
+
+Commands of vm_topology are recorded by a dry run recorder instead of being executed, and the recorder keeps an
+in-memory model of OVS bridges, ports and flows, so no OVS is needed. Front panel ports are bound port by port,
+each binding applied on its own, then all at once in one batch. Number of commands run and the flows programmed are
+compared. Running a command of ovs-vsctl or ovs-ofctl is simulated by sleeping for --cmd-time seconds.
+
+Usage:
+    python vm_topology_ovs_benchmark.py --topo ../vars/topo_t1-64.yml
+"""
+
+import argparse
+import collections
+import json
+import logging
+import os
+import re
+import shlex
+import sys
+import time
+
+import yaml
+
+import ansible.module_utils
+
+ANSIBLE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# vm_topology imports module_utils of sonic-mgmt, which ansible adds to ansible.module_utils when running modules
+ansible.module_utils.__path__.append(os.path.join(ANSIBLE_PATH, 'module_utils'))
+sys.path.insert(0, os.path.join(ANSIBLE_PATH, 'roles', 'vm_set', 'library'))
+
+import vm_topology    # noqa: E402
+
+
+class OVSDryRun(object):
+    """Records commands of vm_topology, and simulates ovs-vsctl and ovs-ofctl commands on an in-memory model."""
+
+    def __init__(self, cmd_time=0):
+        self.cmd_time = cmd_time
+        self.commands = []
+        self.bridges = collections.OrderedDict()
+        self.ofports = {}
+        self.next_ofport = {}
+        self.flows = {}
+
+    def __call__(self, cmdline, grep_cmd=None, input_data=None):
+        self.commands.append(cmdline)
+        args = shlex.split(cmdline)
+        if self.cmd_time and args[0] in ('ovs-vsctl', 'ovs-ofctl'):
+            time.sleep(self.cmd_time)
+        if args[0] == 'ovs-vsctl':
+            return self.vsctl(args[1:])
+        if args[0] == 'ovs-ofctl':
+            return self.ofctl(args[1:], input_data)
+        return ''
+
+    def port_to_br(self, port):
+        for br_name, ports in self.bridges.items():
+            if port in ports:
+                return br_name
+        return None
+
+    def vsctl(self, args):
+        groups = [[]]
+        for arg in args:
+            if arg == '--':
+                groups.append([])
+            else:
+                groups[-1].append(arg)
+        out = []
+        for group in groups:
+            options = dict(arg[2:].partition('=')[::2] for arg in group if arg.startswith('--'))
+            words = [arg for arg in group if not arg.startswith('--')]
+            if words:
+                out.append(self.vsctl_command(words, options))
+        return ''.join(out)
+
+    def vsctl_command(self, words, options):
+        command = words[0]
+        if command == 'add-br':
+            self.bridges.setdefault(words[1], [])
+            self.next_ofport.setdefault(words[1], 1)
+            self.flows.setdefault(words[1], [])
+        elif command == 'del-br':
+            if words[1] not in self.bridges and 'if-exists' not in options:
+                raise Exception('no bridge named %s' % words[1])
+            for port in self.bridges.pop(words[1], []):
+                self.ofports.pop(port)
+        elif command == 'add-port':
+            if self.port_to_br(words[2]) is not None:
+                raise Exception('cannot create a port named %s because a port named %s already exists on bridge %s'
+                                % (words[2], words[2], self.port_to_br(words[2])))
+            self.bridges[words[1]].append(words[2])
+            self.ofports[words[2]] = self.next_ofport[words[1]]
+            self.next_ofport[words[1]] += 1
+        elif command == 'del-port':
+            self.bridges[words[1]].remove(words[2])
+            self.ofports.pop(words[2])
+        elif command == 'list-ports':
+            return ''.join(port + '\n' for port in sorted(self.bridges[words[1]]))
+        elif command == 'port-to-br':
+            if self.port_to_br(words[1]) is None:
+                raise Exception('no port named %s' % words[1])
+            return self.port_to_br(words[1]) + '\n'
+        elif command == 'list':
+            return self.vsctl_list(words[1], options['columns'].split(','))
+        else:
+            raise Exception('Unsupported ovs-vsctl command %s' % command)
+        return ''
+
+    def vsctl_list(self, table, columns):
+        rows = []
+        if table == 'Bridge':
+            for br_name, ports in self.bridges.items():
+                uuids = [['uuid', 'port-' + port] for port in ports]
+                rows.append({'name': br_name, 'ports': uuids[0] if len(uuids) == 1 else ['set', uuids]})
+        elif table == 'Port':
+            for ports in self.bridges.values():
+                rows.extend({'_uuid': ['uuid', 'port-' + port], 'name': port} for port in ports)
+        elif table == 'Interface':
+            rows.extend({'name': port, 'ofport': ofport} for port, ofport in self.ofports.items())
+        return json.dumps({'data': [[row[column] for column in columns] for row in rows], 'headings': columns}) + '\n'
+
+    def ofctl(self, args, input_data):
+        words = [arg for arg in args if not arg.startswith('--') or arg == '-']
+        command, br_name = words[0], words[1]
+        if command == 'show':
+            return ''.join(' %d(%s): addr:00:00:00:00:00:00\n' % (self.ofports[port], port)
+                           for port in self.bridges[br_name])
+        if command == 'del-flows':
+            self.flows[br_name] = []
+        elif command == 'add-flow':
+            self.flows[br_name].append(''.join(words[2].split()))
+        elif command == 'replace-flows':
+            self.flows[br_name] = [''.join(flow.split()) for flow in input_data.splitlines() if flow.strip()]
+        else:
+            raise Exception('Unsupported ovs-ofctl command %s' % command)
+        return ''
+
+    def snapshot(self):
+        """Ports and flows of bridges, with ofports in flows replaced with port names."""
+        result = {}
+        for br_name, ports in self.bridges.items():
+            names = dict((str(self.ofports[port]), port) for port in ports)
+            flows = []
+            for flow in self.flows[br_name]:
+                match, sep, actions = flow.partition('action=')
+                match = re.sub(r'in_port=(\d+)', lambda m: 'in_port=' + names[m.group(1)], match)
+                if actions.startswith('output:'):
+                    actions = 'output:' + ','.join(names[ofport] for ofport in actions[len('output:'):].split(','))
+                flows.append(match + sep + actions)
+            result[br_name] = (sorted(ports), sorted(flows))
+        return result
+
+
+def load_topology(topo_file):
+    with open(topo_file) as f:
+        topo = yaml.safe_load(f)['topology']
+    vm_count = max(attr['vm_offset'] for attr in topo['VMs'].values()) + 1
+    vm_names = ['VM%04d' % (100 + i) for i in range(vm_count)]
+    duts_fp_ports = collections.defaultdict(dict)
+    for attr in topo['VMs'].values():
+        for vlan in attr['vlans']:
+            dut_index, vlan_index, _ = vm_topology.VMTopology.parse_vm_vlan_port(vlan)
+            duts_fp_ports['dut%d' % dut_index][str(vlan_index)] = 'ens1f%d.%d' % (dut_index, 1000 + vlan_index)
+    duts_name = sorted(duts_fp_ports)
+    return topo, vm_names, dict(duts_fp_ports), duts_name
+
+
+def new_topology(args):
+    topo, vm_names, duts_fp_ports, duts_name = load_topology(args.topo)
+    worker = vm_topology.VMTopologyWorker(False, 0)
+    net = vm_topology.VMTopology(vm_names, {}, 9100, vm_topology.NUM_FP_VLANS_PER_FP, topo, worker)
+    net.init('vms-t1', vm_names[0], duts_fp_ports, duts_name, ptf_exists=False, check_bridge=False)
+    return net
+
+
+def fp_bindings(net):
+    for attr in net.VMs.values():
+        vm_name = net.vm_names[net.vm_base_index + attr['vm_offset']]
+        for idx, vlan in enumerate(attr['vlans']):
+            dut_index, vlan_index, ptf_index = vm_topology.VMTopology.parse_vm_vlan_port(vlan)
+            yield (vm_topology.adaptive_name(vm_topology.OVS_FP_BRIDGE_TEMPLATE, vm_name, idx),
+                   net.duts_fp_ports[net.duts_name[dut_index]][str(vlan_index)],
+                   vm_topology.adaptive_name(vm_topology.INJECTED_INTERFACES_TEMPLATE, net.vm_set_name, ptf_index),
+                   vm_topology.OVS_FP_TAP_TEMPLATE % (vm_name, idx))
+
+
+def run(args, name, bind):
+    net = new_topology(args)
+    dry_run = OVSDryRun(args.cmd_time)
+    vm_topology.VMTopology.cmd_recorder = dry_run
+    try:
+        net.create_bridges()
+        bind_commands = len(dry_run.commands)
+        results = []
+        for attempt in ('bind', 'rebind'):
+            start = time.time()
+            bind(net)
+            elapsed = time.time() - start
+            commands = len(dry_run.commands) - bind_commands
+            bind_commands = len(dry_run.commands)
+            print('{:<10} {:<7} {} commands in {:.3f}s'.format(name, attempt, commands, elapsed))
+            results.append(dry_run.snapshot())
+    finally:
+        vm_topology.VMTopology.cmd_recorder = None
+    return results
+
+
+def bind_port_by_port(net):
+    for br_name, dut_iface, injected_iface, vm_iface in fp_bindings(net):
+        net.bind_ovs_ports(br_name, dut_iface, injected_iface, vm_iface)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dry run benchmark of binding front panel ports to OVS bridges')
+    parser.add_argument('--topo', default=os.path.join(ANSIBLE_PATH, 'vars', 'topo_t1-64.yml'),
+                        help='Topology file')
+    parser.add_argument('--cmd-time', type=float, default=0.005,
+                        help='Time in seconds of running an ovs-vsctl or ovs-ofctl command')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    port_by_port = run(args, 'per-port', bind_port_by_port)
+    batched = run(args, 'batched', lambda net: net.bind_fp_ports())
+    if port_by_port != batched:
+        print('ERROR: ports and flows bound port by port and in a batch are different')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
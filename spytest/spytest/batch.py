@@ -6,9 +6,11 @@ import psutil
 import socket
 import signal
 import logging
+import threading
 from random import randint
 from random import Random
 from operator import itemgetter
+from collections import OrderedDict
 from spytest.dicts import SpyTestDict
 from spytest.testbed import Testbed
 import spytest.spydist as dist
@@ -36,6 +38,7 @@ def trace_calls(event, data, fpath, line):
 def batch_init_env(wa):
     wa.debug_level = env.getint("SPYTEST_BATCH_DEBUG_LEVEL", "0")
     wa.max_bucket_setups = env.getint("SPYTEST_BATCH_MAX_BUCKET_SETUPS", "200")
+    wa.report_interval = env.getint("SPYTEST_BATCH_REPORT_INTERVAL", "5")
 
 
 def batch_init():
@@ -69,6 +72,9 @@ def batch_init():
     wa.tclist_cache = {}
     wa.chip_coverate_history = {}
     wa.platform_coverate_history = {}
+    wa.module_durations = {}
+    wa.module_durations_by_name = {}
+    wa.function_duration = None
 
     # None disable backup/rerun nodes
     # 0 create same number of backup/rerun nodes
@@ -86,6 +92,9 @@ def batch_init():
     wa.repeated_tests = None
     wa.abort_run = None
     wa.lock = putils.Lock()
+    wa.report_pending = False
+    wa.report_thread = False
+    wa.render_lock = threading.Lock()
 
     wa.make_scheduler = make_scheduler
     wa.configure_nodes = configure_nodes
@@ -116,6 +125,101 @@ def load_coverage_history():
         tcmap.read_coverage_history(csv_file)
 
 
+# time in seconds of a test function of a module without duration history
+DEFAULT_FUNCTION_DURATION = 120
+
+
+def get_module_durations_file():
+    return os.path.join(wa.logs_path, "batch_module_durations.csv")
+
+
+def load_module_durations():
+    # durations of previous runs, the history file is batch_module_durations.csv of
+    # a previous run, or the one in current logs path when run again in the same logs path
+    wa.module_durations, wa.module_durations_by_name, wa.function_duration = {}, {}, None
+    csv_file = env.get("SPYTEST_BATCH_DURATION_HISTORY", "") or get_module_durations_file()
+    rows = utils.read_csv(csv_file)
+    for row in rows[1:]:
+        try:
+            mname, tpref, funcs, duration, runs = row[:5]
+            tpref = utils.integer_parse(tpref, wa.default_topo_pref)
+            _set_module_duration(mname, tpref, [float(duration), int(funcs), int(runs)])
+        except Exception:
+            warn("Invalid module duration {} in {}".format(row, csv_file))
+    if wa.module_durations:
+        trace("Loaded durations of {} modules from {}".format(len(wa.module_durations), csv_file))
+
+
+def save_module_durations():
+    header, rows = ["Module", "Pref", "Functions", "Duration", "Runs"], []
+    for (mname, tpref), (duration, funcs, runs) in sorted(wa.module_durations.items()):
+        rows.append([mname, tpref, funcs, "{:.1f}".format(duration), runs])
+    utils.write_csv_file(header, rows, get_module_durations_file())
+
+
+def _set_module_duration(mname, tpref, entry):
+    wa.module_durations[(mname, tpref)] = entry
+    wa.module_durations_by_name.setdefault(mname, {})[tpref] = entry
+    wa.function_duration = None
+
+
+def record_module_duration(mname, tpref, funcs, duration):
+    # the duration is the mean of the runs executing the same number of functions
+    entry = wa.module_durations.get((mname, tpref))
+    if entry and entry[1] == funcs:
+        old_duration, runs = entry[0], entry[2]
+        duration = (old_duration * runs + duration) / (runs + 1)
+        _set_module_duration(mname, tpref, [duration, funcs, runs + 1])
+    else:
+        _set_module_duration(mname, tpref, [duration, funcs, 1])
+    debug("Module {} Pref {} Functions {} Duration {:.1f}".format(mname, tpref, funcs, duration))
+
+
+def _get_function_duration():
+    # average duration of test functions in all the modules
+    if wa.function_duration is None:
+        entries = list(wa.module_durations.values())
+        total_funcs = sum([entry[1] for entry in entries])
+        if not total_funcs:
+            wa.function_duration = DEFAULT_FUNCTION_DURATION
+        else:
+            wa.function_duration = sum([entry[0] for entry in entries]) / total_funcs
+    return wa.function_duration
+
+
+def estimate_module_duration(mname, tpref, funcs):
+    # use the duration of the same topology preference, then any preference of the module
+    # and finally the average duration of test functions in all the modules
+    prefs = wa.module_durations_by_name.get(mname, {})
+    entries = [prefs[tpref]] if tpref in prefs else list(prefs.values())
+    if not entries:
+        return _get_function_duration() * funcs
+    total_funcs = sum([entry[1] for entry in entries])
+    if not total_funcs:
+        return DEFAULT_FUNCTION_DURATION * funcs
+    return sum([entry[0] for entry in entries]) * funcs / total_funcs
+
+
+def plan_longest_first(modules, loads):
+    """
+    Plan modules on nodes by the longest processing time first, each module is planned
+    on the node which can run it and becomes free first, ties go to the first node in loads
+    :param modules: list of (module name, duration, names of nodes which can run the module)
+    :param loads: ordered dict of node name to the time needed to finish the running tests
+    :return: dict of node name to the list of module names planned on it
+    """
+    loads = OrderedDict(loads)
+    plan = OrderedDict([(node, []) for node in loads])
+    for mname, duration, nodes in sorted(modules, key=lambda m: m[1], reverse=True):
+        nodes = [node for node in loads if node in nodes]
+        if not nodes:
+            continue
+        node = min(nodes, key=lambda n: loads[n])
+        plan[node].append(mname)
+        loads[node] = loads[node] + duration
+    return plan
+
+
 def init_type_nodes():
     node_types = ["one", "two", "three", "four"]
     backup_nodes = env.get("SPYTEST_BATCH_BACKUP_NODES")
@@ -268,20 +372,87 @@ def check_worker_status(node_modules, collection):
             _show_testbed_info()
 
 
-def save_report():
-    save_running_report()
-    save_progress_report()
-    save_pending_report()
+def report_snapshot():
+    # copy of the report data taken with wa.lock held, the reports are rendered from it without the lock
+    snapshot = SpyTestDict()
+    snapshot.executed = dict(wa.executed)
+    snapshot.rerun_nodeids = list(wa.rerun_nodeids)
+    snapshot.matching_nodes = {}
+    for nodeid in snapshot.rerun_nodeids + [k for k, v in snapshot.executed.items() if not v[0]]:
+        module = paths.parse_nodeid(nodeid)[0]
+        if module not in snapshot.matching_nodes:
+            snapshot.matching_nodes[module] = wa.sched.find_matching_nodes(module) if wa.sched else ""
+    return snapshot
+
+
+def save_report(snapshot=None):
+    snapshot = snapshot or report_snapshot()
+    save_running_report(snapshot)
+    save_progress_report(snapshot)
+    save_pending_report(snapshot)
     if wa.rerun_list:
-        save_rerun_report()
+        save_rerun_report(snapshot)
+
+
+def request_report():
+    # reports are rendered from all the executed tests, render them at most once every report interval
+    # instead of on every event, so that the cost of an event does not grow with the number of tests
+    if wa.report_interval <= 0:
+        render_report(True)
+        return
+    wa.report_pending = True
+    if not wa.report_thread:
+        wa.report_thread = True
+        putils.callback(wa.report_interval, wa.report_interval, render_report)
+
+
+def render_report(locked=False, force=False):
+    # with locked the caller holds wa.lock until the files are written,
+    # otherwise render lock is held from the snapshot till the files are written
+    # so that the files of an older snapshot never overwrite the files of a newer one
+    if locked:
+        _render_report(locked, force)
+    elif force or wa.report_pending:
+        with wa.render_lock:
+            _render_report(locked, force)
+
+
+def _render_report(locked, force):
+    if not locked and not force and not wa.report_pending:
+        return
+    # the final report waits for the lock, others give up instead of piling up behind it
+    if not locked and not wa.lock.acquire(timeout=None if force else 120):
+        return
+    try:
+        wa.report_pending = False
+        snapshot = report_snapshot()
+        _show_testbed_info(False)
+    except Exception as exp:
+        print(exp)
+        snapshot = None
+    finally:
+        if not locked:
+            wa.lock.release()
+    try:
+        if snapshot:
+            save_report(snapshot)
+    except Exception as exp:
+        print(exp)
+
 
+def log_report_event(op, nodeid, node_name):
+    # append only log of the report events, the reports show only the latest state
+    if nodeid:
+        line = "{} {} {} {}\n".format(get_timestamp(), op, node_name or "-", nodeid)
+        utils.write_file(os.path.join(wa.logs_path, "batch_events.log"), line, "a")
 
-def save_running_report():
+
+def save_running_report(snapshot):
     # prepare running rows
     header, rows = ['#', "Module", "Function", "TestCase", "Node", "Status"], []
     all_modules, all_functions, all_testcases, all_nodes = {}, {}, {}, {}
-    for nodeid in wa.executed:
-        [node_name, status] = wa.executed[nodeid]
+    for nodeid in snapshot.executed:
+        [node_name, status] = snapshot.executed[nodeid]
         if status != "Queued":
             continue
         if not node_name or is_infra_test(nodeid):
@@ -311,12 +482,12 @@ def save_running_report():
     utils.write_html_table3(header, rows, filepath, links=links, align=align)
 
 
-def save_progress_report():
+def save_progress_report(snapshot):
     # prepare progress rows
     header, rows = ['#', "Module", "Function", "TestCase", "Node", "Status"], []
     all_modules, all_functions, all_testcases, all_nodes = {}, {}, {}, {}
-    for nodeid in wa.executed:
-        [node_name, status] = wa.executed[nodeid]
+    for nodeid in snapshot.executed:
+        [node_name, status] = snapshot.executed[nodeid]
         if not node_name or is_infra_test(nodeid):
             continue
         module, func = paths.parse_nodeid(nodeid)
@@ -344,16 +515,16 @@ def save_progress_report():
     utils.write_html_table3(header, rows, filepath, links=links, align=align)
 
 
-def save_pending_report():
+def save_pending_report(snapshot):
     # prepare pending rows
     header, rows = ['#', "Module", "Function", "TestCase", "Nodes"], []
     all_modules, all_functions, all_testcases = {}, {}, {}
-    for nodeid in wa.executed:
-        [node_name, _] = wa.executed[nodeid]
+    for nodeid in snapshot.executed:
+        [node_name, _] = snapshot.executed[nodeid]
         if node_name or is_infra_test(nodeid):
             continue
         module, func = paths.parse_nodeid(nodeid)
-        nodes = wa.sched.find_matching_nodes(module)
+        nodes = snapshot.matching_nodes[module]
         all_modules[module] = 1
         all_functions[func] = 1
         for tcid in _get_tclist(func):
@@ -369,16 +540,16 @@ def save_pending_report():
     utils.write_html_table3(header, rows, filepath, align=align)
 
 
-def save_rerun_report():
+def save_rerun_report(snapshot):
 
     # prepare rerun rows
     header, rows = ['#', "Module", "Function", "TestCase", "Nodes"], []
     all_modules, all_functions, all_testcases = {}, {}, {}
-    for nodeid in wa.rerun_nodeids:
+    for nodeid in snapshot.rerun_nodeids:
         if is_infra_test(nodeid):
             continue
         module, func = paths.parse_nodeid(nodeid)
-        nodes = wa.sched.find_matching_nodes(module)
+        nodes = snapshot.matching_nodes[module]
         all_modules[module] = 1
         all_functions[func] = 1
         for tcid in _get_tclist(func):
@@ -491,6 +662,7 @@ def save_finished_testbeds():
 
 def report(op, nodeid, node_name):
     op = op.lower()
+    log_report_event(op, nodeid, node_name)
     if op == "load":
         wa.executed[nodeid] = ["", "Pending"]
         return
@@ -513,11 +685,7 @@ def report(op, nodeid, node_name):
     elif op == "finish":
         if nodeid in wa.executed:
             wa.executed[nodeid] = [node_name, "Completed"]
-    try:
-        save_report()
-        _show_testbed_info(False)
-    except Exception as exp:
-        print(exp)
+    request_report()
 
 
 def shutdown():
@@ -551,6 +719,10 @@ class SpyTestScheduling(object):
         self.default_order = 2
         self.default_topo = ""
         self.max_order = self.default_order
+        self.duration_scheduler = env.match("SPYTEST_BATCH_SCHEDULER", "duration", "default")
+        self.item_modules = {}
+        self.item_estimates = {}
+        self.module_progress = {}
         self._load_buckets()
 
         self.test_spytest_infra_first = None
@@ -993,6 +1165,7 @@ class SpyTestScheduling(object):
         item_list = self.collection[item_index]
         if item_index in self.node_modules[node]:
             self.node_modules[node].remove(item_index)
+            self._track_complete(item_index, duration)
             report("finish", item_list, name)
             debug("[{}]: ===== Completed {} {}".format(name, item_index, item_list))
         else:
@@ -1022,9 +1195,14 @@ class SpyTestScheduling(object):
         if env.match("SPYTEST_BATCH_ORDER_HIGH2LOW", "1", "1"):
             orders = reversed(orders)
         for order in orders:
+            selected = None
+            if self.duration_scheduler:
+                selected = self._select_longest_first(name, modules, order)
             for mname, minfo in modules.items():
                 if name not in minfo.nodes:
                     continue
+                if selected and mname != selected:
+                    continue
                 md = self.get_module_data(mname, minfo.used_tpref)
                 if self.order_support and md.order != order:
                     continue
@@ -1032,6 +1210,7 @@ class SpyTestScheduling(object):
                     return True
                 del modules[mname]
                 self.node_modules[node].extend(minfo.node_indexes)
+                self._track_module(mname, minfo)
                 if self.test_spytest_infra_last is not None:
                     if env.match("SPYTEST_BATCH_APPEND_INFRA_TEST", "1", "1"):
                         self.node_modules[node].append(self.test_spytest_infra_last)
@@ -1043,6 +1222,69 @@ class SpyTestScheduling(object):
                 return True
         return False
 
+    def _is_running_locked(self, node):
+        worker = self.wa.workers[get_gw_name(node.gateway)]
+        if node.shutting_down or worker.excluded:
+            return False
+        return bool(worker.started and worker.completed is False)
+
+    def _remaining_time(self, node):
+        return sum([self.item_estimates.get(i, 0) for i in self.node_modules.get(node, [])])
+
+    def _select_longest_first(self, name, modules, order):
+        # plan all the pending modules of the order on running nodes and pick the first one planned on this node
+        pending = []
+        for mname, minfo in modules.items():
+            md = self.get_module_data(mname, minfo.used_tpref)
+            if not minfo.nodes or (self.order_support and md.order != order):
+                continue
+            duration = estimate_module_duration(mname, minfo.used_tpref, len(minfo.node_indexes))
+            pending.append((mname, duration, minfo.nodes))
+        applicable = [m for m in pending if name in m[2]]
+        if not applicable:
+            return None
+        # this node goes first to break the ties
+        loads = OrderedDict([(name, 0)])
+        for node in self.node_modules:
+            gid = get_gw_name(node.gateway)
+            if gid == name or self._is_running_locked(node):
+                loads[gid] = self._remaining_time(node)
+        plan = plan_longest_first(pending, loads)
+        if plan.get(name):
+            return plan[name][0]
+        # other nodes are better for all the modules, but do not leave this node idle
+        return min(applicable, key=lambda m: m[1])[0]
+
+    def _track_module(self, mname, minfo):
+        count = len(minfo.node_indexes)
+        progress = SpyTestDict()
+        progress.tpref = minfo.used_tpref
+        progress.funcs = count
+        progress.pending = count
+        progress.elapsed = 0
+        self.module_progress[mname] = progress
+        estimate = estimate_module_duration(mname, minfo.used_tpref, count)
+        for item_index in minfo.node_indexes:
+            self.item_modules[item_index] = mname
+            self.item_estimates[item_index] = estimate / count
+
+    def _track_complete(self, item_index, duration):
+        self.item_estimates.pop(item_index, None)
+        mname = self.item_modules.pop(item_index, None)
+        if mname not in self.module_progress:
+            return
+        progress = self.module_progress[mname]
+        progress.pending = progress.pending - 1
+        progress.elapsed = progress.elapsed + (duration or 0)
+        if progress.pending > 0:
+            return
+        self.module_progress.pop(mname)
+        record_module_duration(mname, progress.tpref, progress.funcs, progress.elapsed)
+        try:
+            save_module_durations()
+        except Exception as exp:
+            debug("Failed to save module durations {}".format(repr(exp)))
+
     def _pending_count(self, worker, modules=None, dbg=False):
         count, modules = 0, modules or self.main_modules
         for mname, minfo in modules.items():
@@ -1338,9 +1580,10 @@ def _show_testbed_info(show=True):
     # init totals
     total_wait_count, total_run_count, total_nes = 0, 0, 0
     total_start_time = total_end_time = get_timestamp(False)
-    total_running, total_executed, total_applicable = 0, 0, 0
+    total_running, total_executed = 0, 0
 
     _read_pid(wa)
+    total_applicable = wa.sched._pending_count(None) if wa.sched else 0
 
     # handle NES when no applicable testbeds are available
     for nes in wa.nes_nodeids:
@@ -1421,7 +1664,6 @@ def _show_testbed_info(show=True):
 
         # count applicable
         applicable = worker.applicable
-        total_applicable = wa.sched._pending_count(None) if wa.sched else 0
 
         session_log = paths.get_session_log(worker.name)
 
@@ -1626,6 +1868,7 @@ def configure(config, logs_path, root_logs_path):
     wa.tcmap = dict()
     load_module_csv()
     load_coverage_history()
+    load_module_durations()
     init_stdout(config, logs_path)
     dist.configure(config, logs_path, is_worker(), wa)
     create_dashboard()
@@ -1688,6 +1931,8 @@ def unconfigure(config):
         debug("============== batch unconfigure =====================")
         if wa.custom_scheduling and wa.sched:
             wa.sched._pending_count(None, dbg=True)
+            # render the final reports, waiting for the reports being written by the timer
+            render_report(force=True)
     for line in utils.dump_connections("batch unconfig: "):
         trace(line)
     return retval
@@ -2011,7 +2256,7 @@ def finish_node_locked(gw, gid, error, reader, status=None):
 
     # update the reports
     _show_testbed_info()
-    save_report()
+    request_report()
     try:
         save_finished_testbeds()
     except Exception as exp:
@@ -0,0 +1,168 @@
+"""
+Replays durations of modules from previous batch runs to compare the makespan of the batch schedulers.
+
+The default scheduler gives a node, which asks for tests, the first module which it can run.
+The duration scheduler plans the pending modules on the running nodes by the longest processing
+time first, and gives the node the first module planned on it. Order of modules is not simulated.
+
+Usage:
+    python spytest/batch_simulator.py --durations logs/batch_module_durations.csv --nodes 8
+    python spytest/batch_simulator.py --durations logs/batch_module_durations.csv \
+        --modules logs/batch_modules.csv --kill gw1:3600 --noise 20
+"""
+import os
+import sys
+import random
+import argparse
+from collections import namedtuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import utilities.common as utils  # noqa: E402
+from spytest import batch  # noqa: E402
+from spytest.dicts import SpyTestDict  # noqa: E402
+
+Gateway = namedtuple("Gateway", "id")
+Node = namedtuple("Node", "gateway")
+
+
+class Scheduling(object):
+    """
+    State of the batch scheduling used by the duration scheduler of SpyTestScheduling
+    """
+    order_support = False
+    _select_longest_first = batch.SpyTestScheduling._select_longest_first
+
+    def __init__(self, nodes):
+        self.node_modules = dict([(Node(Gateway(node)), []) for node in nodes])
+        self.remaining = dict([(node, 0.0) for node in nodes])
+
+    def get_module_data(self, mname, tpref=None):
+        return SpyTestDict(order=0)
+
+    def _is_running_locked(self, node):
+        return node.gateway.id in self.remaining
+
+    def _remaining_time(self, node):
+        return self.remaining[node.gateway.id]
+
+    def select(self, name, pending, free_at, now):
+        self.remaining = dict([(node, max(0.0, free_at[node] - now)) for node in free_at])
+        modules = batch.OrderedDict()
+        for mname, tpref, funcs, nodes in pending:
+            modules[mname] = SpyTestDict(nodes=nodes, used_tpref=tpref, node_indexes=list(range(funcs)))
+        return self._select_longest_first(name, modules, 0)
+
+
+def load_modules(args):
+    os.environ["SPYTEST_BATCH_DURATION_HISTORY"] = args.durations
+    batch.load_module_durations()
+    nodes = [batch.build_node_name(i) for i in range(args.nodes)]
+    if not args.modules:
+        return [[mname, tpref, funcs, nodes] for (mname, tpref), (_, funcs, _)
+                in sorted(batch.wa.module_durations.items())]
+
+    # batch_modules.csv has the names of modules as shown in logs, which could be the base names
+    names = {}
+    for mname, _ in batch.wa.module_durations:
+        names[mname] = mname
+        names.setdefault(os.path.basename(mname), mname)
+    modules, rows = [], utils.read_csv(args.modules)
+    header = rows[0] if rows else []
+    for row in rows[1:]:
+        row = dict(zip(header, row))
+        if not row.get("Module"):
+            continue
+        tpref = utils.integer_parse(row["Pref"], batch.wa.default_topo_pref)
+        mname = names.get(row["Module"], row["Module"])
+        modules.append([mname, tpref, int(row["Functions"]), row["Nodes"].split()])
+    return modules
+
+
+def simulate(modules, durations, kills, scheduler):
+    """
+    :param modules: list of [module name, topology preference, functions, names of nodes]
+    :param durations: dict of module name to the time it actually takes
+    :param kills: dict of node name to the time it dies
+    :return: makespan, and the modules which are not executed
+    """
+    nodes = []
+    for module in modules:
+        utils.list_append(nodes, *module[3])
+    free_at = dict([(node, 0.0) for node in nodes])
+    running = {}
+    pending = list(modules)
+    scheduling = Scheduling(nodes)
+    makespan = 0.0
+    while free_at:
+        # the node which becomes free first asks for a module
+        name = min(free_at, key=lambda n: (free_at[n], nodes.index(n)))
+        now = free_at[name]
+
+        # nodes which die before now put their modules back to pending
+        for node, kill_time in kills.items():
+            if node in free_at and kill_time <= now:
+                if node in running and free_at[node] > kill_time:
+                    pending.append(running[node])
+                free_at.pop(node)
+                running.pop(node, None)
+        if name not in free_at:
+            continue
+
+        running.pop(name, None)
+        applicable = [m for m in pending if name in m[3]]
+        if not applicable:
+            # node finishes when there are no modules which it can run
+            free_at.pop(name)
+            continue
+        if scheduler == "duration":
+            selected = scheduling.select(name, pending, free_at, now)
+            module = [m for m in applicable if m[0] == selected][0]
+        else:
+            module = applicable[0]
+        pending.remove(module)
+        running[name] = module
+        free_at[name] = now + durations[module[0]]
+        if name not in kills or free_at[name] <= kills[name]:
+            makespan = max(makespan, free_at[name])
+    return makespan, [m[0] for m in pending]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare makespan of the batch schedulers")
+    parser.add_argument("--durations", required=True, help="batch_module_durations.csv of previous runs")
+    parser.add_argument("--modules", help="batch_modules.csv of a run, for the nodes which can run each module")
+    parser.add_argument("--nodes", type=int, default=4, help="Number of nodes, when --modules is not given")
+    parser.add_argument("--kill", action="append", default=[], help="Node which dies at a time, NODE:SECONDS")
+    parser.add_argument("--noise", type=float, default=0,
+                        help="Actual durations differ randomly from the history by up to this percent")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the random noise")
+    args = parser.parse_args()
+
+    modules = load_modules(args)
+    if not modules:
+        print("No modules to simulate")
+        return 1
+    rand = random.Random(args.seed)
+    durations = {}
+    for module in modules:
+        noise = 1 + rand.uniform(-args.noise, args.noise) / 100
+        durations[module[0]] = batch.estimate_module_duration(*module[:3]) * noise
+    kills = {}
+    for kill in args.kill:
+        node, _, kill_time = kill.rpartition(":")
+        kills[node] = float(kill_time)
+
+    total = sum(durations.values())
+    print("Modules: {} Total Duration: {:.0f}s".format(len(modules), total))
+    for scheduler in ["default", "duration"]:
+        makespan, not_executed = simulate(modules, durations, kills, scheduler)
+        msg = "{:<10} makespan {:.0f}s".format(scheduler, makespan)
+        if not_executed:
+            msg = "{} not executed {}".format(msg, ",".join(not_executed))
+        print(msg)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
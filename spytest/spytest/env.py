@@ -87,6 +87,7 @@ defaults = {
     "SPYTEST_BATCH_DEFAULT_BUCKET": "1",
     "SPYTEST_BATCH_DEAD_NODE_MAX_TIME": "0",
     "SPYTEST_BATCH_POLL_STATUS_TIME": "0",
+    "SPYTEST_BATCH_REPORT_INTERVAL": "5",
     "SPYTEST_BATCH_SAVE_FREE_DEVICES": "1",
     "SPYTEST_BATCH_TOPO_PREF": "0",
     "SPYTEST_TECH_SUPPORT_DELETE_ON_DUT": "0",
@@ -107,6 +108,9 @@ dev_defaults = {
     "SPYTEST_BATCH_MODULE_TOPO_PREF": None,
     "SPYTEST_BATCH_MATCHING_BUCKET_ORDER": "larger,largest",
     "SPYTEST_BATCH_RERUN": None,
+    # default: modules in the order of collection, duration: longest modules first by durations of previous runs
+    "SPYTEST_BATCH_SCHEDULER": "default",
+    "SPYTEST_BATCH_DURATION_HISTORY": None,
     "SPYTEST_TESTBED_FILE": "testbed.yaml",
     "SPYTEST_FILE_MODE": "0",
     "SPYTEST_SCHEDULING": None,
@@ -117,6 +121,9 @@ dev_defaults = {
     "SPYTEST_CMDLINE_ARGS": "",
     "SPYTEST_SUITE_ARGS": "",
     "SPYTEST_TEXTFSM_DUMP_INDENT_JSON": None,
+    # cache compiled templates and the templates of commands
+    "SPYTEST_TEXTFSM_CACHE": "1",
+    "SPYTEST_TEXTFSM_CACHE_SIZE": "4096",
     "SPYTEST_TESTBED_EXCLUDE_DEVICES": None,
     "SPYTEST_TESTBED_INCLUDE_DEVICES": None,
     "SPYTEST_LOGS_PATH": None,
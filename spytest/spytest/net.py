@@ -120,6 +120,9 @@ class Net(object):
         # 1: fallback 2: always 3: not supported
         self.console_file_transfer = env.getint("SPYTEST_CONSOLE_FILE_TRANSFER", "1")
         self.max_cmds_once = 100
+        # stream the base64 encoded file in a here-document, lines written before waiting for echo
+        self.console_file_stream = env.match("SPYTEST_CONSOLE_FILE_TRANSFER_STREAM", "1", "1")
+        self.console_file_window = env.getint("SPYTEST_CONSOLE_FILE_TRANSFER_WINDOW", "256")
         self.pending_downloads = dict()
         self.log_dutid_fmt = env.get("SPYTEST_LOG_DUTID_FMT", "LABEL")
         self.dut_log_lock = putils.Lock()
@@ -3864,8 +3867,73 @@ class Net(object):
         self.tryssh_switch(devname, True, True)
         return retval
 
+    def _read_channel_until(self, hndl, match, timeout):
+        output, end_time = "", time.time() + timeout
+        while time.time() < end_time:
+            data = hndl.read_channel()
+            if not data:
+                time.sleep(0.01)
+                continue
+            output = output + data
+            if match(output):
+                return True
+        return False
+
+    def _transfer_stream(self, access, src_file, dst_file):
+        devname = access["devname"]
+        hndl = self._get_handle(devname)
+        if not hasattr(hndl, "write_channel") or not hasattr(hndl, "read_channel"):
+            return False
+        self._enter_linux(devname)
+        prompt = self._get_cli_prompt(devname)
+        script_cmd = "rm -f {}".format(dst_file)
+        self._send_command(access, script_cmd, prompt)
+        lines, marker = utils.b64encode(src_file), "SPYTEST_EOF"
+        script_cmd = "base64 -d > {} << '{}'".format(dst_file, marker)
+        self.dut_log(devname, "Streaming: DST: {} Lines: {}".format(dst_file, len(lines)))
+        if not self._cli_lock(access, script_cmd):
+            return False
+        in_heredoc = False
+        try:
+            hndl.clear_buffer()
+            hndl.write_channel(script_cmd + nl)
+            in_heredoc = True
+            # the echo of the command line is read along with the echo of the first lines
+            count = 1
+            for clist in utils.split_list(lines, self.console_file_window):
+                hndl.write_channel(nl.join(clist) + nl)
+                # wait for the echo of written lines, not to overrun the terminal servers
+                # echoed lines can be scrolled by the terminal, so only the new lines are counted
+                count = count + len(clist)
+                if not self._read_channel_until(hndl, lambda output: output.count(nl) >= count, 120):
+                    self.dut_warn(devname, "Streaming: No echo of written lines")
+                    return False
+                count = 0
+            in_heredoc = False
+            hndl.write_channel(marker + nl)
+            if not self._read_channel_until(hndl, lambda output: re.search(prompt, output.rpartition(marker)[2]), 120):
+                self.dut_warn(devname, "Streaming: No prompt after the transfer")
+                return False
+        finally:
+            if in_heredoc:
+                # end the here-document and interrupt base64 before falling back to other commands
+                try:
+                    hndl.write_channel(marker + nl)
+                except Exception:
+                    pass
+                self._try_send_ctrl_c(devname, hndl, 1)
+            self._cli_unlock(access, script_cmd)
+        return self._check_md5(devname, access, prompt, src_file, dst_file)
+
     def _transfer_base64(self, access, src_file, dst_file):
         devname = access["devname"]
+        if self.console_file_stream:
+            try:
+                if self._transfer_stream(access, src_file, dst_file):
+                    return
+            except Exception as e:
+                self.dut_warn(devname, "Streaming: Failed {}".format(e))
+            self.dut_warn(devname, "Streaming: Transferring {} line by line".format(src_file))
         self._enter_linux(devname)
         prompt = self._get_cli_prompt(devname)
         script_cmd = "rm -f {0}.tmp {0}".format(dst_file)
@@ -3999,7 +4067,6 @@ class Net(object):
             src_md5 = utils.md5(src_file)
             if src_md5 == dst_md5:
                 skip_transfer = True
-                self.skip_trans_helper[devname][src_file] = remote_file
             else:
                 self.dut_log(devname, "MD5 different SRC: {} DST: {}".format(src_md5, dst_md5))
         except Exception as e:
@@ -4025,6 +4092,7 @@ class Net(object):
         if md5check:
             skip_transfer = self._check_md5(devname, access, prompt, src_file, remote_file)
         if skip_transfer:
+            self.skip_trans_helper[devname][src_file] = remote_file
             return remote_file
 
         done = False
@@ -2,6 +2,7 @@ import sys
 import os
 import re
 import json
+import threading
 from collections import OrderedDict
 
 bundled_parser = os.getenv("SPYTEST_TEXTFSM_USE_BUNDLED_PARSER")
@@ -18,6 +19,20 @@ except Exception:
 from spytest import env  # noqa: E402
 import utilities.common as utils  # noqa: E402
 
+# compiled TextFSM of the template files, shared by all the Template objects
+fsm_cache = {}
+
+
+def parse_textfsm(tmpl_path, data):
+    # TextFSM keeps the state of parsing, a compiled template is used by one thread at a time
+    if tmpl_path not in fsm_cache:
+        with open(tmpl_path, "r") as tmpl_fp:
+            fsm_cache[tmpl_path] = [textfsm.TextFSM(tmpl_fp), threading.Lock()]
+    re_table, lock = fsm_cache[tmpl_path]
+    with lock:
+        re_table.Reset()
+        return re_table.header, re_table.ParseText(data)
+
 
 class Template(object):
 
@@ -41,23 +56,47 @@ class Template(object):
             self.cli_tables[index] = clitable.CliTable(index, self.root)
         self.platform = platform
         self.cli = cli
+        self.use_cache = bool(env.get("SPYTEST_TEXTFSM_CACHE", "1") != "0")
+        self.max_resolved = env.getint("SPYTEST_TEXTFSM_CACHE_SIZE", "4096")
+        self.resolved = {}
 
-    # find the template given command
-    def get_tmpl(self, cmd):
+    def get_attrs(self, cmd):
+        attrs = dict(Command=cmd)
+        if self.platform:
+            attrs["Platform"] = self.platform
+        if self.cli:
+            attrs["cli"] = self.cli
+        return attrs
+
+    # find the template, the index table and the templates to parse given command
+    def resolve(self, cmd):
+        key = (cmd, self.platform, self.cli)
+        if self.use_cache and key in self.resolved:
+            return self.resolved[key]
+        retval = [None, None, None]
         attrs = dict(Command=cmd)
         for cli_table in self.cli_tables.values():
             row_idx = cli_table.index.GetRowMatch(attrs)
             if row_idx != 0:
-                return cli_table.index.index[row_idx]['Template']
-        return None
+                retval[0] = cli_table.index.index[row_idx]['Template']
+                retval[1] = cli_table
+                row_idx = cli_table.index.GetRowMatch(self.get_attrs(cmd))
+                if row_idx != 0:
+                    retval[2] = cli_table.index.index[row_idx]['Template']
+                break
+        if self.use_cache:
+            # commands have variable parts, do not let the cache grow forever
+            if len(self.resolved) >= self.max_resolved:
+                self.resolved.clear()
+            self.resolved[key] = retval
+        return retval
+
+    # find the template given command
+    def get_tmpl(self, cmd):
+        return self.resolve(cmd)[0]
 
     def get_table(self, cmd):
-        attrs = dict(Command=cmd)
-        for cli_table in self.cli_tables.values():
-            row_idx = cli_table.index.GetRowMatch(attrs)
-            if row_idx != 0:
-                return cli_table
-        return None
+        return self.resolve(cmd)[1]
 
     # retrieve template and sample file given the command
     def read_sample(self, cmd):
@@ -84,22 +123,22 @@ class Template(object):
 
     # find template the given command and apply on given data
     def apply(self, output, cmd):
-        attrs = dict(Command=cmd)
-        if self.platform:
-            attrs["Platform"] = self.platform
-        if self.cli:
-            attrs["cli"] = self.cli
+        attrs = self.get_attrs(cmd)
 
-        tmpl_file = self.get_tmpl(cmd)
+        tmpl_file, cli_table, templates = self.resolve(cmd)
         if not tmpl_file:
             raise ValueError('Unknown command "%s"' % (cmd))
 
-        cli_table = self.get_table(cmd)
         if not cli_table:
             raise ValueError('Unable to parse command "%s"' % (cmd))
 
-        cli_table.ParseCmd(output, attrs)
-        objs = self.result(cli_table.header, cli_table)
+        if not self.use_cache or not templates or ":" in templates:
+            # multiple templates are merged by the index table
+            cli_table.ParseCmd(output, attrs)
+            objs = self.result(cli_table.header, cli_table)
+        else:
+            header, rows = parse_textfsm(os.path.join(cli_table.template_dir, templates), output)
+            objs = self.result(header, rows)
         return [tmpl_file, objs]
 
     def result(self, header, rows):
@@ -160,12 +199,16 @@ class Template(object):
     # apply the given template on given data
     def apply_textfsm(self, tmpl_file, data):
         tmpl_file2 = os.path.join(self.root, tmpl_file)
-        tmpl_fp = open(tmpl_file2, "r")
-        re_table = textfsm.TextFSM(tmpl_fp)
-        out = re_table.ParseText(data)
-        tmpl_fp.close()
-        objs = self.result(re_table.header, out)
-        return re_table.header, objs
+        if self.use_cache:
+            header, out = parse_textfsm(tmpl_file2, data)
+        else:
+            tmpl_fp = open(tmpl_file2, "r")
+            re_table = textfsm.TextFSM(tmpl_fp)
+            out = re_table.ParseText(data)
+            tmpl_fp.close()
+            header = re_table.header
+        objs = self.result(header, out)
+        return header, objs
 
 
 if __name__ == "__main__":
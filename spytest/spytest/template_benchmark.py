@@ -0,0 +1,74 @@
+"""
+Benchmark of parsing the sample outputs of show commands with and without caching the templates.
+
+Samples are the *.info.log and *.data.log files saved by Template.save_sample, by default from the
+test folder of the templates. Every sample is parsed by both ways and the results are compared,
+then verify_samples is timed over all the samples for the given number of rounds.
+
+Usage:
+    python spytest/template_benchmark.py --samples /path/to/samples --rounds 20
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import utilities.common as utils  # noqa: E402
+from spytest.template import Template  # noqa: E402
+
+
+def load_samples(path):
+    samples = []
+    for info_file in utils.list_files_tree(path, "*.info.log"):
+        lines = utils.read_lines(info_file, [])
+        for i in range(0, len(lines), 4):
+            tmpl, cmd, _, md5 = [data.strip() for data in lines[i:i + 4]]
+            data_file = os.path.join(path, "{}.{}.data.log".format(tmpl, md5))
+            samples.append([cmd, "\n".join(utils.read_lines(data_file, []))])
+    return samples
+
+
+def timed(name, rounds, samples, func):
+    start = time.time()
+    for _ in range(rounds):
+        func()
+    elapsed = time.time() - start
+    count = rounds * samples
+    print("{:<10} {} samples in {:.3f}s, {:.3f}ms per sample".format(name, count, elapsed, elapsed * 1000 / count))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing of sample outputs with and without template cache")
+    parser.add_argument("--samples", help="Folder of the samples, default is the test folder of templates")
+    parser.add_argument("--platform", help="Platform of the templates")
+    parser.add_argument("--rounds", type=int, default=10, help="Number of times all the samples are parsed")
+    args = parser.parse_args()
+
+    cached = Template(args.platform)
+    uncached = Template(args.platform)
+    uncached.use_cache = False
+    path = args.samples or cached.samples
+    samples = load_samples(path)
+    if not samples:
+        print("No samples in {}".format(path))
+        return 1
+
+    for cmd, data in samples:
+        if cached.apply(data, cmd) != uncached.apply(data, cmd):
+            print("ERROR: output of '{}' is parsed differently with the cache".format(cmd))
+            return 1
+    errors = [err for _, errs in cached.verify_samples(path) for err in errs]
+    for err in errors:
+        print("ERROR: {}".format(err))
+
+    uncached_time = timed("uncached", args.rounds, len(samples), lambda: uncached.verify_samples(path))
+    cached_time = timed("cached", args.rounds, len(samples), lambda: cached.verify_samples(path))
+    print("speedup: {:.1f}x".format(uncached_time / cached_time))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
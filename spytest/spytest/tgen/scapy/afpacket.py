@@ -6,8 +6,14 @@ in the data returned by recv. Instead, it delivers the VLAN TCI in a control
 message. Python 2.x doesn't have built-in support for recvmsg, so we have to
 use ctypes to call it. The recv function exported by this module reconstructs
 the VLAN tag if it was offloaded.
+
+RxRing receives packets from a TPACKET_V3 ring, which the kernel fills with
+blocks of packets in memory shared with the process, so that a block of
+packets is read without a system call for every packet.
 """
 
+import mmap
+import select
 import struct
 from ctypes import sizeof
 from ctypes import get_errno
@@ -29,6 +35,12 @@ ETH_P_8021Q = 0x8100
 SOL_PACKET = 263
 PACKET_AUXDATA = 8
 TP_STATUS_VLAN_VALID = 1 << 4
+TP_STATUS_VLAN_TPID_VALID = 1 << 6
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
 
 
 class struct_iovec(Structure):
@@ -131,3 +143,68 @@ def recv(sk, bufsize):
         return buf.raw[:12] + tag + buf.raw[12:rv]
     else:
         return buf.raw[:rv]
+
+
+class RxRing(object):
+    """
+    TPACKET_V3 receive ring of an AF_PACKET socket
+
+    The kernel hands over a block when it is full or when it is not filled
+    in retire_ms milliseconds. Packets are copied out of the block, with the
+    offloaded VLAN tag inserted, and the block is given back to the kernel.
+    """
+
+    # struct tpacket_block_desc: block_status, num_pkts, offset_to_first_pkt
+    BLOCK_HDR = struct.Struct("=8xIII")
+    BLOCK_STATUS = struct.Struct("=8xI")
+    # struct tpacket3_hdr: tp_next_offset, tp_snaplen, tp_status, tp_mac, tp_vlan_tci, tp_vlan_tpid
+    PKT_HDR = struct.Struct("=I8xI4xIH6xIH")
+
+    def __init__(self, sk, block_size=1 << 18, block_nr=8, frame_size=1 << 14, retire_ms=10):
+        sk.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        req = struct.pack("=7I", block_size, block_nr, frame_size,
+                          (block_size // frame_size) * block_nr, retire_ms, 0, 0)
+        sk.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+        self.ring = mmap.mmap(sk.fileno(), block_size * block_nr, mmap.MAP_SHARED,
+                              mmap.PROT_READ | mmap.PROT_WRITE)
+        self.block_size = block_size
+        self.block_nr = block_nr
+        self.block = 0
+        self.poller = select.poll()
+        self.poller.register(sk.fileno(), select.POLLIN | select.POLLERR)
+
+    def close(self):
+        try:
+            self.ring.close()
+        except Exception:
+            pass
+
+    def recv(self, timeout=1):
+        """
+        Receive the packets of next block
+        @timeout Seconds to wait for the kernel to hand over the block
+        @return List of packets, empty if the block is not handed over
+        """
+        ring, offset = self.ring, self.block * self.block_size
+        if not self.BLOCK_STATUS.unpack_from(ring, offset)[0] & TP_STATUS_USER:
+            self.poller.poll(timeout * 1000)
+            if not self.BLOCK_STATUS.unpack_from(ring, offset)[0] & TP_STATUS_USER:
+                return []
+
+        _, num_pkts, pos = self.BLOCK_HDR.unpack_from(ring, offset)
+        pkts, pos = [], offset + pos
+        for _ in range(num_pkts):
+            next_offset, snaplen, status, mac, tci, tpid = self.PKT_HDR.unpack_from(ring, pos)
+            start = pos + mac
+            if tci != 0 or status & TP_STATUS_VLAN_VALID:
+                # Insert VLAN tag
+                tpid = tpid if status & TP_STATUS_VLAN_TPID_VALID else ETH_P_8021Q
+                tag = struct.pack("!HH", tpid, tci)
+                pkts.append(ring[start:start + 12] + tag + ring[start + 12:start + snaplen])
+            else:
+                pkts.append(ring[start:start + snaplen])
+            pos += next_offset
+
+        self.BLOCK_STATUS.pack_into(ring, offset, TP_STATUS_KERNEL)
+        self.block = (self.block + 1) % self.block_nr
+        return pkts
@@ -1,5 +1,6 @@
 import os
 import time
+import binascii
 import traceback
 import threading
 
@@ -121,9 +122,9 @@ class ScapyDriver(object):
             # read packets
             while self.rx_any_enable():
                 try:
-                    packet = self.packet.readp(self.iface, self.port)
-                    if packet:
-                        self.handle_recv(packet)
+                    packets = self.packet.readp(self.iface, self.port)
+                    if packets:
+                        self.handle_recv(packets)
                 except Exception as e:
                     if str(e) != "[Errno 100] Network is down":
                         self.logger.debug(e, traceback.format_exc())
@@ -159,14 +160,46 @@ class ScapyDriver(object):
                 stream.incrStat('bytesReceived', pktlen)
                 break  # no need to check in other streams
 
-    def handle_capture(self, packet):
-        self.pkts_captured.append(packet)
-
-    def handle_recv(self, packet):
+    def handle_stats_bulk(self, packets):
+        # streams by the signature inserted before CRC, first stream when the signatures are same
+        streams = dict()
+        for stream in reversed(self.port.track_streams):
+            sid = stream.get_sid()
+            if sid:
+                streams[binascii.unhexlify(sid)] = stream
+
+        bytesReceived, oversizeFramesReceived, stream_stats = 0, 0, dict()
+        for packet in packets:
+            pktlen = len(packet)
+            bytesReceived += pktlen
+            if pktlen > 1518:
+                oversizeFramesReceived += 1
+            stream = streams.get(packet[-8:-4])
+            if stream:
+                stats = stream_stats.setdefault(stream, [0, 0])
+                stats[0] += 1
+                stats[1] += pktlen
+
+        self.port.incrStat('framesReceived', len(packets))
+        self.port.incrStat('bytesReceived', bytesReceived)
+        if oversizeFramesReceived:
+            self.port.incrStat('oversizeFramesReceived', oversizeFramesReceived)
+        for stream, stats in stream_stats.items():
+            stream.incrStat('framesReceived', stats[0])
+            stream.incrStat('bytesReceived', stats[1])
+
+    def handle_capture(self, packets):
+        self.pkts_captured.extend(packets)
+
+    def handle_recv(self, packets):
         if self.statState.is_set():
-            self.handle_stats(packet)
+            if self.dbg > 2:
+                for packet in packets:
+                    self.handle_stats(packet)
+            else:
+                self.handle_stats_bulk(packets)
         if self.captureState.is_set():
-            self.handle_capture(packet)
+            self.handle_capture(packets)
 
     def txInit(self):
         self.txState = threading.Event()
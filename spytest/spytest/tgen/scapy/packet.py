@@ -149,6 +149,10 @@ class ScapyPacket(object):
         self.tx_count = 0
         self.rx_count = 0
         self.rx_sock = None
+        self.rx_ring = None
+        # number of 256KB blocks of the RX ring, which is locked in memory for each port
+        # 0 to receive packet by packet
+        self.rx_ring_blocks = self.utils.get_env_int("SPYTEST_SCAPY_RX_RING", 8)
         self.tx_sock = None
         self.tx_sock_failed = False
         self.finished = False
@@ -261,6 +265,7 @@ class ScapyPacket(object):
         self.dot1x.cleanup()
         self.dhcps.cleanup()
         self.finished = True
+        self.rx_ring = self.close_sock(self.rx_ring)
         self.rx_sock = self.close_sock(self.rx_sock)
         self.tx_sock = self.close_sock(self.tx_sock)
         self.tx_sock_failed = False
@@ -281,6 +286,12 @@ class ScapyPacket(object):
             if not self.use_custom_exp:
                 raise exp
             raise RunTimeException(exp, msg)
+        if self.rx_ring_blocks > 0:
+            try:
+                self.rx_ring = afpacket.RxRing(self.rx_sock, block_nr=self.rx_ring_blocks)
+                return
+            except Exception as exp:
+                self.logger.info("RX ring not supported {} - receiving packet by packet".format(exp))
         afpacket.enable_auxdata(self.rx_sock)
 
     def set_link(self, status):
@@ -297,29 +308,41 @@ class ScapyPacket(object):
             return None
 
         try:
-            data = afpacket.recv(self.rx_sock, 12 * 1024)
+            if self.rx_ring:
+                pkts = self.rx_ring.recv()
+            else:
+                pkts = [afpacket.recv(self.rx_sock, 12 * 1024)]
         except Exception as exp:
             if self.finished:
                 return None
             raise exp
-        packet = Ether(data)
+        if not pkts:
+            return pkts
         self.stats_lock.acquire()
-        self.rx_count = self.rx_count + 1
+        self.rx_count = self.rx_count + len(pkts)
+        rx_count = self.rx_count - len(pkts)
         self.stats_lock.release()
         self.trace_stats()
 
-        if self.dbg > 1:
-            cmd = "" if not self.show_summary else packet.command()
-            msg = "readp:{} len:{} count:{} {}".format
-            self.logger.debug(msg(iface, len(data), self.rx_count, cmd))
+        # packets are decoded only for protocols and traces
+        for data in pkts:
+            packet = Ether(data) if self.dbg > 3 or self.pp.is_protocol_packet(data) else None
+            rx_count = rx_count + 1
 
-        if self.dbg > 3:
-            self.trace_packet(packet, self.hex)
+            if self.dbg > 1:
+                cmd = "" if not self.show_summary else self.mkcmd(data)
+                msg = "readp:{} len:{} count:{} {}".format
+                self.logger.debug(msg(iface, len(data), rx_count, cmd))
+
+            if self.dbg > 3:
+                self.trace_packet(packet, self.hex)
 
-        # handle protocol packets
-        self.pp.process(port, packet)
+            # handle protocol packets
+            if packet is not None:
+                self.pp.process_rx(port, packet)
+        self.pp.process_periodic(port)
 
-        return packet
+        return pkts
 
     def sendp(self, pkt, data, iface, stream_name, left):
         self.stats_lock.acquire()
@@ -406,7 +429,8 @@ class ScapyPacket(object):
     def trace_packet(self, pkt, hex=True, fields=True, force=False):
         if not fields and not hex:
             return
-        if isinstance(pkt, str):
+        # received packets are raw bytes until they are decoded
+        if isinstance(pkt, (str, bytes)):
             pkt = Ether(pkt)
         if fields:
             self.show_pkt(pkt, force)
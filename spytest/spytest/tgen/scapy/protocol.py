@@ -1,10 +1,11 @@
 import copy
+import struct
 import binascii
 import traceback
 
 from scapy.packet import Padding
 from scapy.layers.l2 import Dot1Q, Ether
-from scapy.layers.inet import IP, UDP
+from scapy.layers.inet import IP, UDP, TCP
 from scapy.layers.inet6 import IPv6
 from scapy.layers.dhcp import BOOTP, DHCP
 from scapy.layers.dhcp6 import DUID_LLT
@@ -28,11 +29,53 @@ class PacketProtocol(object):
         self.logger = pif.logger
         self.utils = pif.utils
         self.next_xid = 1
+        self.l4_ports = {6: self.bound_ports(TCP), 17: self.bound_ports(UDP)}
 
     def __del__(self):
         pass
 
     def process(self, port, pkt):
+        self.process_rx(port, pkt)
+        self.process_periodic(port)
+
+    def is_protocol_packet(self, data):
+        """
+        Check, without decoding, if the packet could be one of the protocol packets processed.
+        Only plain ICMP, ICMPv6 and TCP/UDP packets of ports without scapy layers are skipped.
+        """
+        try:
+            offset, etype = 14, struct.unpack_from("!H", data, 12)[0]
+            while etype in (0x8100, 0x88a8, 0x9100):
+                etype = struct.unpack_from("!H", data, offset + 2)[0]
+                offset = offset + 4
+            if etype == 0x0806:
+                return False
+            if etype == 0x0800:
+                ver_ihl, proto = struct.unpack_from("!B8xB", data, offset)
+                offset = offset + (ver_ihl & 0x0F) * 4
+            elif etype == 0x86DD:
+                proto = struct.unpack_from("!6xB", data, offset)[0]
+                offset = offset + 40
+            else:
+                return True
+            if proto in (1, 58):
+                return False
+            if proto not in self.l4_ports:
+                return True
+            sport, dport = struct.unpack_from("!HH", data, offset)
+            return bool(sport in self.l4_ports[proto] or dport in self.l4_ports[proto])
+        except struct.error:
+            return True
+
+    @staticmethod
+    def bound_ports(layer):
+        # ports of which the payload is decoded by scapy into some other layer
+        ports = set()
+        for fval, _ in layer.payload_guess:
+            ports.update([fval.get(name) for name in ["sport", "dport"] if name in fval])
+        return ports
+
+    def process_rx(self, port, pkt):
 
         if IP in pkt and pkt.proto == 89:
             self.ospf_rx(port, pkt)
@@ -46,6 +89,7 @@ class PacketProtocol(object):
         if EAP in pkt:
             self.dot1x_rx(port, pkt)
 
+    def process_periodic(self, port):
         self.igmp_tx_query_periodic(port)
         self.dot1x_tx_periodic(port)
 
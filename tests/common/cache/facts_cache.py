@@ -1,12 +1,15 @@
 
 
+import contextlib
+import fcntl
 import inspect
+import json
 import logging
 import os
 import pickle
 import shutil
 import sys
-import time
+import tempfile
 
 from collections import defaultdict
 from threading import Lock
@@ -21,6 +24,19 @@ CACHE_LOCATION = os.path.join(CURRENT_PATH, '../../../_cache')
 SIZE_LIMIT = 1000000000  # 1G bytes, max disk usage allowed by cache
 ENTRY_LIMIT = 1000000    # Max number of pickle files allowed in cache.
 DISABLE_CACHE_PARAM = "disable_cache"
+LEDGER_FILE = '.ledger.json'    # Size of each pickle file in cache, keyed by its path relative to cache location
+LOCK_FILE = '.lock'             # Advisory lock file for serializing cache updates between processes
+FINGERPRINT_SUFFIX = '__fingerprint'    # Suffix of the key of fingerprint stored along with validated cached facts
+
+
+def _get_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Mode of files created by open(), temporary files created by mkstemp are only accessible by the owner
+FILE_MODE = 0o666 & ~_get_umask()
 
 
 class Singleton(type):
@@ -51,28 +67,128 @@ class FactsCache(with_metaclass(Singleton, object)):
         self._cache_location = os.path.abspath(cache_location)
         self._cache = defaultdict(dict)
         self._write_lock = Lock()
+        self._fingerprints = {}
+        self._ledger_verified = False
 
-    def _check_usage(self):
-        """Check cache usage, raise exception if usage exceeds the limitations.
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the advisory lock of cache location, for serializing cache updates between processes.
         """
-        total_size = 0
-        total_entries = 0
+        if not os.path.exists(self._cache_location):
+            os.makedirs(self._cache_location, exist_ok=True)
+        with open(os.path.join(self._cache_location, LOCK_FILE), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _facts_file(self, zone, key):
+        return os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
+
+    def _load_ledger(self):
+        """Load size of each cached pickle file. The ledger is rebuilt from cache location if it is not usable, or if
+        it disagrees with cache location when it is loaded first time in current process.
+
+        Must be called with the cache lock held.
+        """
+        try:
+            with open(os.path.join(self._cache_location, LEDGER_FILE)) as f:
+                ledger = json.load(f)
+        except (IOError, ValueError):
+            return self._scan_ledger()
+        if not self._ledger_verified:
+            self._ledger_verified = True
+            disk_ledger = self._scan_ledger()
+            if disk_ledger != ledger:
+                logger.info('[Cache] Cache ledger disagrees with cache location, rebuilt it')
+                return disk_ledger
+        return ledger
+
+    def _scan_ledger(self):
+        """Build the ledger from the pickle files in cache location.
+        """
+        ledger = {}
         for root, _, files in os.walk(self._cache_location):
             for f in files:
-                fp = os.path.join(root, f)
-                total_size += os.path.getsize(fp)
-                total_entries += 1
+                if f.endswith('.pickle'):
+                    fp = os.path.join(root, f)
+                    try:
+                        ledger[os.path.relpath(fp, self._cache_location)] = os.path.getsize(fp)
+                    except OSError:
+                        pass
+        logger.debug('[Cache] Rebuilt cache ledger, total_entries={}'.format(len(ledger)))
+        return ledger
+
+    def _save_ledger(self, ledger):
+        """Save the ledger atomically. Must be called with the cache lock held.
+        """
+        self._atomic_write(os.path.join(self._cache_location, LEDGER_FILE), json.dumps(ledger).encode())
 
-        if total_size > SIZE_LIMIT or total_entries > ENTRY_LIMIT:
-            msg = 'Cache usage exceeds limitations. total_size={}, SIZE_LIMIT={}, total_entries={}, ENTRY_LIMIT={}' \
-                .format(total_size, SIZE_LIMIT, total_entries, ENTRY_LIMIT)
-            raise Exception(msg)
+    @staticmethod
+    def _atomic_write(path, data):
+        """Write a file through a temporary file and rename, so that readers never see a partially written file.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, FILE_MODE)
+            os.rename(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _evict(self, ledger, keep):
+        """Remove least recently used pickle files until cache usage is within the limitations.
+
+        Must be called with the cache lock held.
+
+        Args:
+            ledger (dict): Size of each cached pickle file, updated in place.
+            keep (str): Pickle file just written that must not be removed.
+        """
+        total_size = sum(ledger.values())
+        if total_size <= SIZE_LIMIT and len(ledger) <= ENTRY_LIMIT:
+            return
+
+        # Files may have been removed or written without updating the ledger, check the usage on disk before evicting
+        disk_ledger = self._scan_ledger()
+        if disk_ledger != ledger:
+            logger.info('[Cache] Cache ledger disagrees with cache location, rebuilt it')
+            ledger.clear()
+            ledger.update(disk_ledger)
+            total_size = sum(ledger.values())
+
+        def _last_used(rel_path):
+            try:
+                return os.path.getmtime(os.path.join(self._cache_location, rel_path))
+            except OSError:
+                return 0
+
+        for rel_path in sorted([p for p in ledger if p != keep], key=_last_used):
+            if total_size <= SIZE_LIMIT and len(ledger) <= ENTRY_LIMIT:
+                break
+            total_size -= ledger.pop(rel_path)
+            zone, key = os.path.split(rel_path)
+            self._cache.get(zone, {}).pop(key[:-len('.pickle')], None)
+            try:
+                os.remove(os.path.join(self._cache_location, rel_path))
+            except OSError:
+                pass
+            logger.info('[Cache] Evicted least recently used cache file "{}"'.format(rel_path))
 
     def _read_facts_file(self, facts_file, z, k):
         with open(facts_file, 'rb') as f:
             self._cache[z][k] = pickle.load(f)
             logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(z, k, facts_file))
-            return self._cache[z][k]
+        try:
+            # Mark the file as recently used for LRU eviction
+            os.utime(facts_file)
+        except OSError:
+            pass
+        return self._cache[z][k]
 
     def read(self, zone, key):
         """Read cached facts.
@@ -90,35 +206,20 @@ class FactsCache(with_metaclass(Singleton, object)):
             logger.debug('[Cache] Read cached facts "{}.{}"'.format(zone, key))
             return self._cache[zone][key]
         else:
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
+            # Cache files are replaced atomically by writers, so a cache file is never partially written.
+            facts_file = self._facts_file(zone, key)
             try:
                 return self._read_facts_file(facts_file, zone, key)
-            except (IOError, ValueError) as e:
+            except (IOError, ValueError, EOFError, pickle.UnpicklingError) as e:
                 logger.info('[Cache] Load cache file "{}" failed with exception: {}'
                             .format(os.path.abspath(facts_file), repr(e)))
                 return self.NOTEXIST
-            except EOFError as eof_err:
-                # When parallel run is enabled, multiple processes may try to read/write the same cache file,
-                # so there will be a chance that the file is being written by process 1 while process 2 is reading
-                # it, which will cause EOFError in process 2. In this case, we will retry reading the file in
-                # process 2. If we still get EOFError after retrying, we will return NOTEXIST to overwrite the file.
-                retry_attempts = 3
-                retry_interval = 5
-                for attempt in range(retry_attempts):
-                    time.sleep(retry_interval)
-                    try:
-                        return self._read_facts_file(facts_file, zone, key)
-                    except EOFError:
-                        logger.warning('[Cache] Retry {}/{} failed for file "{}"'
-                                       .format(attempt + 1, retry_attempts, facts_file))
-
-                logger.error('[Cache] Load cache file "{}" failed with exception: {}'
-                             .format(facts_file, repr(eof_err)))
-                return self.NOTEXIST
 
     def write(self, zone, key, value):
         """Store facts to cache.
 
+        When cache usage exceeds the limitations, least recently used cache files are removed.
+
         Args:
             zone (str): Cached facts are organized by zones. This argument is to specify the zone name.
                 The zone name could be hostname.
@@ -128,24 +229,68 @@ class FactsCache(with_metaclass(Singleton, object)):
         Returns:
             boolean: Caching facts is successful or not.
         """
-        with self._write_lock:
-            self._check_usage()
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
+        facts_file = self._facts_file(zone, key)
+        try:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.error('[Cache] Dump cache file "{}" failed with exception: {}'.format(facts_file, repr(e)))
+            return False
+
+        with self._write_lock, self._locked():
             try:
                 cache_subfolder = os.path.join(self._cache_location, zone)
                 if not os.path.exists(cache_subfolder):
                     logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
-                    os.makedirs(cache_subfolder)
-
-                with open(facts_file, 'wb') as f:
-                    pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
-                    self._cache[zone][key] = value
-                    logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
-                    return True
-            except (IOError, ValueError) as e:
+                    os.makedirs(cache_subfolder, exist_ok=True)
+
+                self._atomic_write(facts_file, data)
+                self._cache[zone][key] = value
+
+                ledger = self._load_ledger()
+                rel_path = os.path.relpath(facts_file, self._cache_location)
+                ledger[rel_path] = len(data)
+                self._evict(ledger, keep=rel_path)
+                self._save_ledger(ledger)
+                logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
+                return True
+            except (IOError, OSError, ValueError) as e:
                 logger.error('[Cache] Dump cache file "{}" failed with exception: {}'.format(facts_file, repr(e)))
                 return False
 
+    def fingerprint(self, zone, validator, function, func_args, func_kargs):
+        """Get current fingerprint of a zone computed by a validator function.
+
+        The fingerprint is computed only once in current process for each zone and validator. It is computed again
+        after `invalidate_fingerprints` is called for the zone.
+
+        Args:
+            zone (str): Zone name of the cached facts.
+            validator (function): Function with signature '(function, func_args, func_kargs)' returning the fingerprint.
+            function (function): The decorated function.
+            func_args (tuple): Positional arguments passed to the decorated function.
+            func_kargs (dict): Keyword arguments passed to the decorated function.
+
+        Returns:
+            obj: Fingerprint returned by the validator.
+        """
+        memo_key = (zone, validator)
+        if memo_key not in self._fingerprints:
+            self._fingerprints[memo_key] = validator(function, func_args, func_kargs)
+            logger.debug('[Cache] Fingerprint of zone "{}" is {}'.format(zone, self._fingerprints[memo_key]))
+        return self._fingerprints[memo_key]
+
+    def invalidate_fingerprints(self, zone=None):
+        """Forget fingerprints computed in current process, so that they are computed again on next use.
+
+        Should be called when the state of a device is changed, for example after config reload or image upgrade.
+
+        Args:
+            zone (str): Zone name. Default is None, fingerprints of all zones are forgotten.
+        """
+        for memo_key in list(self._fingerprints):
+            if zone is None or memo_key[0] == zone:
+                del self._fingerprints[memo_key]
+
     def cleanup(self, zone=None, key=None):
         """Cleanup cached files.
 
@@ -155,28 +300,36 @@ class FactsCache(with_metaclass(Singleton, object)):
                 will be cleaned up.
             key (str): Name of cached facts. Default is None.
         """
+        self.invalidate_fingerprints(zone)
         if zone:
-            if key:
-                if zone in self._cache and key in self._cache[zone]:
-                    del self._cache[zone][key]
-                    logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
-                try:
-                    cache_file = os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
-                    os.remove(cache_file)
-                    logger.debug('[Cache] Removed cache file "{}.pickle"'.format(cache_file))
-                except OSError as e:
-                    logger.error('[Cache] Cleanup cache {}.{}.pickle failed with exception: {}'
-                                 .format(zone, key, repr(e)))
-            else:
-                if zone in self._cache:
-                    del self._cache[zone]
-                    logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
-                try:
-                    cache_subfolder = os.path.join(self._cache_location, zone)
-                    shutil.rmtree(cache_subfolder)
-                    logger.debug('[Cache] Removed cache subfolder "{}"'.format(cache_subfolder))
-                except OSError as e:
-                    logger.error('[Cache] Remove cache subfolder "{}" failed with exception: {}'.format(zone, repr(e)))
+            with self._write_lock, self._locked():
+                ledger = self._load_ledger()
+                if key:
+                    if zone in self._cache and key in self._cache[zone]:
+                        del self._cache[zone][key]
+                        logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
+                    try:
+                        cache_file = os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
+                        ledger.pop(os.path.relpath(cache_file, self._cache_location), None)
+                        os.remove(cache_file)
+                        logger.debug('[Cache] Removed cache file "{}.pickle"'.format(cache_file))
+                    except OSError as e:
+                        logger.error('[Cache] Cleanup cache {}.{}.pickle failed with exception: {}'
+                                     .format(zone, key, repr(e)))
+                else:
+                    if zone in self._cache:
+                        del self._cache[zone]
+                        logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
+                    for rel_path in [p for p in ledger if os.path.dirname(p) == zone]:
+                        del ledger[rel_path]
+                    try:
+                        cache_subfolder = os.path.join(self._cache_location, zone)
+                        shutil.rmtree(cache_subfolder)
+                        logger.debug('[Cache] Removed cache subfolder "{}"'.format(cache_subfolder))
+                    except OSError as e:
+                        logger.error('[Cache] Remove cache subfolder "{}" failed with exception: {}'
+                                     .format(zone, repr(e)))
+                self._save_ledger(ledger)
         else:
             self._cache = defaultdict(dict)
             try:
@@ -235,7 +388,7 @@ def _get_disable_cache(target, args, kwargs):
     return bound_args.arguments.get(DISABLE_CACHE_PARAM, False)
 
 
-def cached(name, zone_getter=None, after_read=None, before_write=None):
+def cached(name, zone_getter=None, after_read=None, before_write=None, validator=None):
     """Decorator for enabling cache for facts.
 
     The cached facts are to be stored by <name>.pickle. Because the cached pickle files must be stored under subfolder
@@ -246,12 +399,16 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
     With default zone getter function, this decorator can try to find zone:
     if the function is a bound method of class AnsibleHostBase and its derivatives, it will try to use its
     attribute 'hostname' as zone, or raises an error if 'hostname' doesn't exists or is not a string.
+    With a validator function, a fingerprint of the zone is stored along with the cached facts. Cached facts are used
+    only when the stored fingerprint equals to current fingerprint returned by the validator, otherwise the facts are
+    gathered again. The validator function has the same signature as the zone getter function.
 
     Args:
         name ([str]): Name of the cached facts.
         zone_getter ([function]): Function used to get hostname used as zone.
         after_read ([function]): Hook function used to process facts after read from cache.
         before_write ([function]): Hook function used to process facts before write into cache.
+        validator ([function]): Function used to get fingerprint for validating the cached facts.
     Returns:
         [function]: Decorator function.
     """
@@ -268,7 +425,20 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
             _zone_getter = zone_getter or _get_default_zone
             zone = _zone_getter(target, args, kargs)
 
+            fingerprint = None
+            if validator:
+                try:
+                    fingerprint = cache.fingerprint(zone, validator, target, args, kargs)
+                except Exception as e:
+                    logger.warning('[Cache] Get fingerprint of zone "{}" failed with exception: {}, '
+                                   'bypass cache for key "{}"'.format(zone, repr(e), name))
+                    return target(*args, **kargs)
+
             cached_facts = cache.read(zone, name)
+            if validator and cached_facts is not FactsCache.NOTEXIST \
+                    and cache.read(zone, name + FINGERPRINT_SUFFIX) != fingerprint:
+                logger.info('[Cache] Fingerprint of cached facts "{}.{}" changed, refresh it'.format(zone, name))
+                cached_facts = FactsCache.NOTEXIST
             if after_read:
                 cached_facts = after_read(cached_facts, target, args, kargs)
             if cached_facts is not FactsCache.NOTEXIST:
@@ -281,6 +451,9 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
                     cache.write(zone, name, _facts)
                 else:
                     cache.write(zone, name, facts)
+                if validator:
+                    # Written after the facts, so that an interrupted refresh leaves a mismatched fingerprint
+                    cache.write(zone, name + FINGERPRINT_SUFFIX, fingerprint)
                 return facts
         return wrapper
     return decorator
@@ -2,6 +2,7 @@ import time
 import logging
 import os
 
+from tests.common.cache import FactsCache
 from tests.common.helpers.assertions import pytest_assert
 from tests.common.plugins.loganalyzer.utils import support_ignore_loganalyzer
 from tests.common.platform.processes_utils import wait_critical_processes
@@ -191,6 +192,9 @@ def config_reload(sonic_host, config_source='config_db', wait=120, start_bgp=Tru
             cmd = f'config reload -y -f -l {golden_path} &>/dev/null'
         sonic_host.shell(cmd, executable="/bin/bash")
 
+    # Configuration is changed, validate the cached facts against new fingerprints on next use
+    FactsCache().invalidate_fingerprints()
+
     modular_chassis = sonic_host.get_facts().get("modular_chassis")
     wait = max(wait, 600) if modular_chassis else wait
 
@@ -4,6 +4,7 @@ import logging
 
 from multiprocessing.pool import ThreadPool
 
+from tests.common.devices.command_channel import CommandChannel
 from tests.common.errors import RunAnsibleModuleFail
 
 logger = logging.getLogger(__name__)
@@ -32,6 +33,9 @@ class AnsibleHostBase(object):
     on the host.
     """
 
+    # Opt-in fast path for the 'shell' and 'command' modules, see enable_command_channel
+    command_channel = None
+
     class CustomEncoder(json.JSONEncoder):
         def default(self, obj):
             if isinstance(obj, bytes):
@@ -60,6 +64,45 @@ class AnsibleHostBase(object):
             "'%s' object has no attribute '%s'" % (self.__class__, module_name)
             )
 
+    def _get_host_var(self, *names):
+        """Get the templated value of the first defined host variable in names.
+        """
+        from ansible.parsing.dataloader import DataLoader
+        from ansible.template import Templar
+
+        host = self.host.options["inventory_manager"].get_host(self.hostname)
+        hostvars = self.host.options["variable_manager"].get_vars(host=host)
+        templar = Templar(loader=DataLoader(), variables=hostvars)
+        for name in names:
+            if name in hostvars:
+                return templar.template(hostvars[name])
+        return None
+
+    def enable_command_channel(self, username=None, password=None, port=22):
+        """Run the 'shell' and 'command' modules through a persistent SSH command channel.
+
+        Module calls with arguments not supported by the channel, or with 'module_async', still run through ansible.
+        Commands run as root through 'sudo -n', so passwordless sudo is required for the login user.
+
+        Args:
+            username (str): SSH login user. Default is the ansible user of the host in inventory.
+            password (str): SSH login password. Default is the ansible password of the host in inventory.
+            port (int): SSH port.
+        """
+        if not getattr(self, "mgmt_ip", None):
+            raise ValueError("Command channel is not supported by host {}".format(self.hostname))
+        username = username or self._get_host_var("ansible_user", "ansible_ssh_user")
+        password = password or self._get_host_var("ansible_password", "ansible_ssh_pass")
+        self.disable_command_channel()
+        self.command_channel = CommandChannel(self.hostname, self.mgmt_ip, username, password, port=port)
+        logger.info("Enabled command channel for host {}".format(self.hostname))
+
+    def disable_command_channel(self):
+        if self.command_channel:
+            self.command_channel.close()
+            self.command_channel = None
+            logger.info("Disabled command channel for host {}".format(self.hostname))
+
     def _run(self, *module_args, **complex_args):
 
         previous_frame = inspect.currentframe().f_back
@@ -100,9 +143,12 @@ class AnsibleHostBase(object):
             result = pool.apply_async(run_module, (module_args, complex_args))
             return pool, result
 
-        module_args = json.loads(json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder))
-        complex_args = json.loads(json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder))
-        res = self.module(*module_args, **complex_args)[self.hostname]
+        if self.command_channel and CommandChannel.supports(self.module_name, module_args, complex_args):
+            res = self.command_channel.run(self.module_name, *module_args, **complex_args)
+        else:
+            module_args = json.loads(json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder))
+            complex_args = json.loads(json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder))
+            res = self.module(*module_args, **complex_args)[self.hostname]
 
         if verbose:
             logger.debug(
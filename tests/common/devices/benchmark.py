@@ -0,0 +1,133 @@
+"""Benchmark of running commands on a host through ansible and through the persistent command channel.
+
+A local sshd or a container can be used as the stand-in DUT. Commands run without sudo unless '--become' is given.
+
+Usage:
+    python tests/common/devices/benchmark.py --host 127.0.0.1 --port 2222 --user admin --password password
+    python tests/common/devices/benchmark.py --host 10.0.0.100 --user admin --password password --count 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+# Same as ansible/ansible.cfg, must be set before ansible is imported
+os.environ.setdefault('ANSIBLE_PIPELINING', 'True')
+os.environ.setdefault('ANSIBLE_HOST_KEY_CHECKING', 'False')
+
+from ansible import context    # noqa: E402
+from ansible.executor.task_queue_manager import TaskQueueManager    # noqa: E402
+from ansible.inventory.manager import InventoryManager    # noqa: E402
+from ansible.module_utils.common.collections import ImmutableDict    # noqa: E402
+from ansible.parsing.dataloader import DataLoader    # noqa: E402
+from ansible.playbook.play import Play    # noqa: E402
+from ansible.plugins.callback import CallbackBase    # noqa: E402
+from ansible.vars.manager import VariableManager    # noqa: E402
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '../../..')))
+
+from tests.common.devices.command_channel import CommandChannel    # noqa: E402
+
+
+class ResultCallback(CallbackBase):
+
+    def __init__(self):
+        super(ResultCallback, self).__init__()
+        self.results = []
+        if hasattr(self, '_init_callback_methods'):
+            # Implemented callback methods are registered by the plugin loader since ansible-core 2.19
+            self._init_callback_methods()
+
+    def v2_runner_on_ok(self, result, **kwargs):
+        self.results.append(dict(result._result))
+
+    v2_runner_on_failed = v2_runner_on_ok
+    v2_runner_on_unreachable = v2_runner_on_ok
+
+
+class AnsibleRunner(object):
+    """Run ad-hoc 'shell' module calls in current process, like pytest-ansible does.
+    """
+
+    def __init__(self, args):
+        try:
+            from ansible.plugins.loader import init_plugin_loader    # noqa: E402
+            init_plugin_loader()
+        except ImportError:
+            # Plugin loader is initialized on import before ansible-core 2.15
+            pass
+        context.CLIARGS = ImmutableDict(connection=args.connection, forks=1, become=args.become, check=False,
+                                        diff=False, verbosity=0)
+        self.loader = DataLoader()
+        self.inventory = InventoryManager(loader=self.loader, sources='{},'.format(args.host))
+        self.variable_manager = VariableManager(loader=self.loader, inventory=self.inventory)
+        host_vars = {'ansible_port': args.port, 'ansible_user': args.user, 'ansible_password': args.password,
+                     'ansible_python_interpreter': args.python}
+        for key, value in host_vars.items():
+            self.variable_manager.set_host_variable(args.host, key, value)
+        self.host = args.host
+        self.become = args.become
+
+    def run(self, cmd):
+        callback = ResultCallback()
+        play = Play().load({'hosts': self.host, 'gather_facts': 'no', 'become': self.become,
+                            'tasks': [{'shell': cmd}]},
+                           variable_manager=self.variable_manager, loader=self.loader)
+        tqm = TaskQueueManager(inventory=self.inventory, variable_manager=self.variable_manager, loader=self.loader,
+                               passwords={})
+        # Loading of callback plugins is skipped when there is one already
+        tqm._callback_plugins.append(callback)
+        try:
+            tqm.run(play)
+        finally:
+            tqm.cleanup()
+        return callback.results[0]
+
+
+def timed(name, count, func):
+    start = time.time()
+    results = func()
+    elapsed = time.time() - start
+    print('{:<20} {} commands in {:.3f}s, {:.2f}ms per command'.format(name, count, elapsed, elapsed * 1000 / count))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ansible shell module and command channel')
+    parser.add_argument('--host', required=True, help='Address of the stand-in DUT')
+    parser.add_argument('--port', type=int, default=22, help='SSH port')
+    parser.add_argument('--user', required=True, help='SSH login user')
+    parser.add_argument('--password', required=True, help='SSH login password')
+    parser.add_argument('--become', action='store_true', help='Run commands through sudo')
+    parser.add_argument('--connection', default='ssh', help='Ansible connection plugin')
+    parser.add_argument('--python', default='/usr/bin/python3', help='Python interpreter on the host')
+    parser.add_argument('--count', type=int, default=1000, help='Number of commands')
+    parser.add_argument('--ansible-count', type=int, default=None,
+                        help='Number of commands through ansible, default is the same as --count')
+    parser.add_argument('--cmd', default='echo {}', help='Command to run, {} is replaced by the command index')
+    args = parser.parse_args()
+
+    cmds = [args.cmd.format(i) for i in range(args.count)]
+    ansible_cmds = cmds[:args.ansible_count]
+    channel = CommandChannel(args.host, args.host, args.user, args.password, port=args.port, become=args.become)
+
+    runner = AnsibleRunner(args)
+    ansible_results = timed('ansible', len(ansible_cmds), lambda: [runner.run(cmd) for cmd in ansible_cmds])
+    channel.run('shell', 'true')     # Exclude time of connecting
+    channel_results = timed('command channel', len(cmds), lambda: [channel.run('shell', cmd) for cmd in cmds])
+    pipelined_results = timed('pipelined channel', len(cmds),
+                              lambda: channel.collect([channel.start('shell', cmd) for cmd in cmds]))
+    channel.close()
+
+    for results in (channel_results, pipelined_results):
+        for ansible_result, channel_result in zip(ansible_results, results):
+            for key in ('rc', 'stdout_lines', 'stderr_lines'):
+                if ansible_result.get(key) != channel_result.get(key):
+                    print('ERROR: {} of "{}" is different: {} vs {}'.format(
+                        key, channel_result['cmd'], ansible_result.get(key), channel_result.get(key)))
+                    return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""Persistent SSH command channel used as a fast path of the ansible 'shell' and 'command' modules.
+
+Running an ansible module packages the module, starts a new ssh session and executes python on the remote host for
+every call. The CommandChannel keeps one authenticated SSH transport per host. Each command is executed in its own
+SSH channel multiplexed over the transport, so a command costs only one round trip. Several commands can be started
+before their results are collected, their channels are then served concurrently over the same transport.
+
+The result of a command has the same shape as the result of the ansible 'shell' and 'command' modules. Errors of
+the SSH connection and commands not finished in time are returned as failed results instead of being raised, like
+failures of ansible modules.
+"""
+import datetime
+import logging
+import select
+import shlex
+import socket
+import threading
+import time
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_MODULES = ('shell', 'command')
+SUPPORTED_MODULE_ARGS = ('cmd', 'executable', 'chdir')
+RECV_SIZE = 65536
+DEFAULT_SHELL = '/bin/sh'
+# Default 'MaxSessions' of sshd, more sessions opened over one transport are rejected
+MAX_SESSIONS = 10
+COMMAND_TIMEOUT = 3600
+
+
+class CommandResult(dict):
+    """Result of a command run through the CommandChannel, compatible with the result of ansible modules.
+    """
+
+    @property
+    def is_failed(self):
+        return bool(self.get('failed', False))
+
+    @property
+    def is_successful(self):
+        return not self.is_failed
+
+    @property
+    def is_changed(self):
+        return bool(self.get('changed', False))
+
+
+class CommandChannel(object):
+    """Persistent SSH transport to a host for running commands.
+
+    The transport is connected on first use and reconnected when it is found broken. The object can be shared
+    between threads. At most `max_sessions` commands run at the same time, commands started beyond that are queued
+    and their sessions are opened by `collect` as running commands finish.
+
+    Host keys are handled like the ansible paramiko connection: when host key checking is disabled, as it is in
+    ansible.cfg of sonic-mgmt, the key of the host is accepted without verification. Otherwise the system known
+    hosts are loaded and unknown host keys are rejected.
+    """
+
+    def __init__(self, hostname, address, username, password, port=22, become=True, timeout=30,
+                 max_sessions=MAX_SESSIONS, command_timeout=COMMAND_TIMEOUT, host_key_checking=None):
+        """
+        Args:
+            hostname (str): Name of the host, used for logging.
+            address (str): IP address of the host.
+            username (str): SSH login user.
+            password (str): SSH login password.
+            port (int): SSH port.
+            become (bool): Run commands as root through passwordless sudo, like ansible 'become'.
+            timeout (int): Timeout in seconds of connecting to the host.
+            max_sessions (int): Maximum number of commands running at the same time, not more than 'MaxSessions'
+                of sshd on the host.
+            command_timeout (int): Default timeout in seconds of waiting for commands in `collect`.
+            host_key_checking (bool): Verify the host key against the system known hosts, default is the
+                'host_key_checking' setting of ansible.
+        """
+        self.hostname = hostname
+        self.address = address
+        self.username = username
+        self.password = password
+        self.port = port
+        self.become = become
+        self.timeout = timeout
+        self.command_timeout = command_timeout
+        if host_key_checking is None:
+            from ansible import constants
+            host_key_checking = constants.HOST_KEY_CHECKING
+        self.host_key_checking = host_key_checking
+        self._client = None
+        self._lock = threading.Lock()
+        self._sessions = threading.BoundedSemaphore(max_sessions)
+
+    def _transport(self):
+        with self._lock:
+            transport = self._client.get_transport() if self._client else None
+            if transport is None or not transport.is_active():
+                if self._client:
+                    self._client.close()
+                logger.debug('[{}] Connect command channel to {}:{}'.format(self.hostname, self.address, self.port))
+                client = paramiko.SSHClient()
+                if self.host_key_checking:
+                    client.load_system_host_keys()
+                    client.set_missing_host_key_policy(paramiko.RejectPolicy())
+                else:
+                    # Host key is not verified, it is only kept in memory of this client
+                    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                client.connect(self.address, port=self.port, username=self.username, password=self.password,
+                               allow_agent=False, look_for_keys=False, timeout=self.timeout)
+                client.get_transport().set_keepalive(30)
+                # Commands are small request/response exchanges, don't let Nagle's algorithm delay them
+                client.get_transport().sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._client = client
+                transport = client.get_transport()
+            return transport
+
+    def close(self):
+        with self._lock:
+            if self._client:
+                self._client.close()
+                self._client = None
+
+    @staticmethod
+    def supports(module_name, module_args, complex_args):
+        """Check whether a module call can be run through the channel.
+
+        Args:
+            module_name (str): Name of the ansible module.
+            module_args (tuple): Positional arguments of the module call.
+            complex_args (dict): Keyword arguments of the module call.
+
+        Returns:
+            bool: True if the module call is a plain 'shell' or 'command' call.
+        """
+        if module_name not in SUPPORTED_MODULES:
+            return False
+        if any(key not in SUPPORTED_MODULE_ARGS for key in complex_args):
+            return False
+        if module_name == 'command' and 'executable' in complex_args:
+            return False
+        commands = list(module_args) + ([complex_args['cmd']] if 'cmd' in complex_args else [])
+        return len(commands) == 1 and isinstance(commands[0], str)
+
+    def build_command(self, module_name, module_args, complex_args):
+        """Build the command line executed by the remote login shell for a module call.
+        """
+        cmd = module_args[0] if module_args else complex_args['cmd']
+        if module_name == 'shell':
+            command = '{} -c {}'.format(shlex.quote(complex_args.get('executable') or DEFAULT_SHELL), shlex.quote(cmd))
+        else:
+            # The 'command' module doesn't process the command with shell, every argument is passed literally
+            command = ' '.join(shlex.quote(arg) for arg in shlex.split(cmd))
+        if complex_args.get('chdir'):
+            command = 'cd {} && {}'.format(shlex.quote(complex_args['chdir']), command)
+        if self.become:
+            command = 'sudo -n -H {} -c {}'.format(DEFAULT_SHELL, shlex.quote(command))
+        return cmd, command
+
+    def start(self, module_name, *module_args, **complex_args):
+        """Start a module call without waiting for it.
+
+        The command is queued if `max_sessions` commands are already running. A started command holds its session
+        until it is collected, so every pending command must be passed to `collect`.
+
+        Returns:
+            dict: Pending command, to be passed to `collect`.
+        """
+        cmd, command = self.build_command(module_name, module_args, complex_args)
+        pending = {'cmd': cmd, 'command': command, 'channel': None, 'error': None, 'start': datetime.datetime.now(),
+                   'stdout': [], 'stderr': [], 'invocation': {'module_args': dict(complex_args, _raw_params=cmd)}}
+        self._open(pending)
+        return pending
+
+    def _open(self, pending):
+        """Open the session of a queued command if a session is free.
+
+        Returns:
+            bool: False if the command is still queued.
+        """
+        if not self._sessions.acquire(False):
+            return False
+        channel = None
+        try:
+            channel = self._transport().open_session()
+            channel.exec_command(pending['command'])
+        except (paramiko.SSHException, socket.error) as e:
+            logger.warning('[{}] Failed to run "{}" through command channel: {}'.format(
+                self.hostname, pending['cmd'], repr(e)))
+            if channel:
+                channel.close()
+            self._sessions.release()
+            pending['error'] = 'Failed to run command through command channel: {}'.format(repr(e))
+            return True
+        pending['channel'] = channel
+        pending['start'] = datetime.datetime.now()
+        return True
+
+    def _close(self, pending):
+        if pending['channel']:
+            pending['channel'].close()
+            pending['channel'] = None
+            self._sessions.release()
+
+    def collect(self, pendings, timeout=None):
+        """Wait for pending commands and get their results.
+
+        Output of all the pending commands is read as it arrives, so a command is never blocked by a full SSH window
+        while the result of another command is being read. Commands not finished before the timeout are closed and
+        their results are failed.
+
+        Args:
+            pendings (list): Pending commands returned by `start`.
+            timeout (int): Timeout in seconds of waiting for all the commands, default is `command_timeout`.
+
+        Returns:
+            list: CommandResult of each pending command, in the same order.
+        """
+        timeout = self.command_timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        results = [None] * len(pendings)
+        running = dict(enumerate(pendings))
+        while running:
+            for index, pending in list(running.items()):
+                if not pending['channel'] and not pending['error'] and not self._open(pending):
+                    continue
+                if pending['error']:
+                    results[index] = self._result(pending, -1, pending['error'])
+                    del running[index]
+                    continue
+                channel = pending['channel']
+                try:
+                    while channel.recv_ready():
+                        pending['stdout'].append(channel.recv(RECV_SIZE))
+                    while channel.recv_stderr_ready():
+                        pending['stderr'].append(channel.recv_stderr(RECV_SIZE))
+                except (paramiko.SSHException, socket.error) as e:
+                    results[index] = self._result(
+                        pending, -1, 'Failed to read output from command channel: {}'.format(repr(e)))
+                    self._close(pending)
+                    del running[index]
+                    continue
+                # No more output after EOF is received, exit status may arrive before or after EOF
+                if channel.eof_received and channel.exit_status_ready() \
+                        and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    results[index] = self._result(pending, channel.recv_exit_status())
+                    self._close(pending)
+                    del running[index]
+            if running and time.time() >= deadline:
+                for index, pending in running.items():
+                    logger.warning('[{}] Command "{}" is not finished in {} seconds'.format(
+                        self.hostname, pending['cmd'], timeout))
+                    results[index] = self._result(
+                        pending, -1, 'Command is not finished in {} seconds, channel is closed'.format(timeout))
+                    self._close(pending)
+                break
+            if running:
+                channels = [pending['channel'] for pending in running.values() if pending['channel']]
+                if channels:
+                    select.select(channels, [], [], 0.1)
+                else:
+                    # All the commands are queued for sessions of other threads
+                    time.sleep(0.1)
+        return results
+
+    @staticmethod
+    def _result(pending, rc, msg=None):
+        end = datetime.datetime.now()
+        stdout = b''.join(pending['stdout']).decode('utf-8', errors='replace').rstrip('\r\n')
+        stderr = b''.join(pending['stderr']).decode('utf-8', errors='replace').rstrip('\r\n')
+        return CommandResult(
+            cmd=pending['cmd'],
+            rc=rc,
+            stdout=stdout,
+            stderr=stderr,
+            stdout_lines=stdout.splitlines(),
+            stderr_lines=stderr.splitlines(),
+            start=str(pending['start']),
+            end=str(end),
+            delta=str(end - pending['start']),
+            changed=True,
+            failed=rc != 0,
+            msg=msg or ('non-zero return code' if rc != 0 else ''),
+            invocation=pending['invocation']
+        )
+
+    def run(self, module_name, *module_args, **complex_args):
+        """Run a module call and wait for its result, no longer than `command_timeout`.
+
+        Returns:
+            CommandResult: Result in the same shape as the result of the ansible module.
+        """
+        return self.collect([self.start(module_name, *module_args, **complex_args)])[0]
@@ -20,9 +20,11 @@ from tests.common.helpers.dut_utils import is_supervisor_node, is_macsec_capable
 from tests.common.str_utils import str2bool
 from tests.common.utilities import get_host_visible_vars
 from tests.common.cache import cached
+from tests.common.helpers.cache_utils import sonic_config_fingerprint
 from tests.common.helpers.constants import DEFAULT_ASIC_ID, DEFAULT_NAMESPACE
 from tests.common.helpers.platform_api.chassis import is_inband_port
 from tests.common.helpers.parallel import parallel_run_threaded
+from tests.common.helpers.shell_batch import MAX_PARALLEL_JOBS, build_batch_script, new_marker, parse_batch_output
 from tests.common.errors import RunAnsibleModuleFail
 from tests.common import constants
 
@@ -192,7 +194,7 @@ class SonicHost(AnsibleHostBase):
 
         self.critical_services = service_list
 
-    @cached(name='basic_facts')
+    @cached(name='basic_facts', validator=sonic_config_fingerprint)
     def _gather_facts(self):
         """
         Gather facts about the platform for this SONiC device.
@@ -336,7 +338,7 @@ class SonicHost(AnsibleHostBase):
 
         return result
 
-    @cached(name='os_version')
+    @cached(name='os_version', validator=sonic_config_fingerprint)
     def _get_os_version(self):
         """
         Gets the SONiC OS version that is running on this device.
@@ -345,7 +347,7 @@ class SonicHost(AnsibleHostBase):
         output = self.command("sonic-cfggen -y /etc/sonic/sonic_version.yml -v build_version")
         return output["stdout_lines"][0].strip()
 
-    @cached(name='sonic_release')
+    @cached(name='sonic_release', validator=sonic_config_fingerprint)
     def _get_sonic_release(self):
         """
         Gets the SONiC Release that is running on this device.
@@ -361,7 +363,7 @@ class SonicHost(AnsibleHostBase):
             return 'none'
         return output["stdout_lines"][0].strip()
 
-    @cached(name='kernel_version')
+    @cached(name='kernel_version', validator=sonic_config_fingerprint)
     def _get_kernel_version(self):
         """
         Gets the SONiC kernel version
@@ -425,6 +427,54 @@ class SonicHost(AnsibleHostBase):
         inv_files = im._sources
         return is_macsec_capable_node(inv_files, self.hostname)
 
+    def shell_batch(self, cmds, parallel=False, continue_on_fail=True, timeout=0, module_ignore_errors=False,
+                    max_jobs=MAX_PARALLEL_JOBS):
+        """
+        @summary: Run a batch of commands in one remote execution.
+
+        Each command is run by bash in a subshell. Unlike the 'shell_cmds' module, the batch is shipped as a single
+        shell call, which takes one round trip when the command channel is enabled.
+
+        @param cmds: List of commands.
+        @param parallel: Run the commands concurrently. All commands are run regardless of continue_on_fail.
+        @param continue_on_fail: Continue running rest of the commands if a command failed.
+        @param timeout: Time limit (in second) of each command. 0 means no limit.
+        @param module_ignore_errors: Don't raise exception if any of the commands failed.
+        @param max_jobs: Maximum number of commands running at the same time when parallel.
+        @return: A dictionary in the same format as output of the 'shell_cmds' module, for example:
+            {
+                "cmds": ["ls /home", "pwd"],
+                "failed_cmds": [],
+                "failed": False,
+                "results": [
+                    {"cmd": "ls /home", "rc": 0, "stdout": "admin", "stderr": "",
+                     "stdout_lines": ["admin"], "stderr_lines": []},
+                    ...
+                ]
+            }
+        """
+        marker = new_marker()
+        script = build_batch_script(cmds, marker, parallel=parallel, continue_on_fail=continue_on_fail,
+                                    timeout=timeout, max_jobs=max_jobs)
+        res = self.shell(script, executable="/bin/bash", module_ignore_errors=True, verbose=False)
+        results = parse_batch_output(res["stdout"], cmds, marker)
+        output = dict(
+            cmds=cmds,
+            failed_cmds=[result["cmd"] for result in results if result["rc"] != 0],
+            results=results,
+            start=res.get("start"),
+            end=res.get("end"),
+            delta=res.get("delta"),
+        )
+        output["failed"] = res["rc"] != 0 or bool(output["failed_cmds"])
+        if output["failed"] and not module_ignore_errors:
+            if res["rc"] != 0:
+                output["msg"] = "Running the batch failed: {}".format(res.get("stderr") or res.get("msg"))
+            else:
+                output["msg"] = "At least running one of the commands failed"
+            raise RunAnsibleModuleFail("run shell_batch failed", output)
+        return output
+
     def is_service_fully_started(self, service):
         """
         @summary: Check whether a SONiC specific service is fully started.
@@ -552,19 +602,23 @@ class SonicHost(AnsibleHostBase):
 
         return monit_services_status
 
-    def get_critical_group_and_process_lists(self, container_name):
+    def _critical_processes_file_cmd(self, container_name):
+        return 'docker exec {} bash -c "[ -f /etc/supervisor/critical_processes ]' \
+               ' && cat /etc/supervisor/critical_processes"'.format(container_name)
+
+    def _parse_critical_group_and_process_lists(self, container_name, file_lines, process_status_lines):
         """
-        @summary: Get critical group and process lists by parsing the
-                  critical_processes file in the specified container
+        @summary: Parse critical group and process lists from content of the critical_processes file
+        @param container_name: Name of the container
+        @param file_lines: Lines of the critical_processes file in the container
+        @param process_status_lines: Output lines of 'supervisorctl status' in the container, only used for pmon
         @return: Two lists which include the critical groups and critical processes respectively
         """
         critical_group_list = []
         critical_process_list = []
         succeeded = True
 
-        file_content = self.shell("docker exec {} bash -c '[ -f /etc/supervisor/critical_processes ] \
-                && cat /etc/supervisor/critical_processes'".format(container_name), module_ignore_errors=True)
-        for line in file_content["stdout_lines"]:
+        for line in file_lines:
             line_info = line.strip().split(':')
             if len(line_info) != 2:
                 if '201811' in self._os_version and len(line_info) == 1:
@@ -590,9 +644,7 @@ class SonicHost(AnsibleHostBase):
         if succeeded and container_name == "pmon":
             expected_critical_group_list = []
             expected_critical_process_list = []
-            process_list = self.shell("docker exec {} supervisorctl status"
-                                      .format(container_name), module_ignore_errors=True)
-            for process_info in process_list["stdout_lines"]:
+            for process_info in process_status_lines:
                 process_name = process_info.split()[0].strip()
                 process_status = process_info.split()[1].strip()
                 if ":" in process_name:
@@ -609,16 +661,29 @@ class SonicHost(AnsibleHostBase):
 
         return critical_group_list, critical_process_list, succeeded
 
-    def critical_group_process(self):
-        # Get critical group and process definitions by running cmds in batch to save overhead
-        cmds = []
-        for service in self.critical_services:
-            cmd = 'docker exec {} bash -c "[ -f /etc/supervisor/critical_processes ]' \
-                  ' && cat /etc/supervisor/critical_processes"'.format(service)
+    def get_critical_group_and_process_lists(self, container_name):
+        """
+        @summary: Get critical group and process lists by parsing the
+                  critical_processes file in the specified container
+        @return: Two lists which include the critical groups and critical processes respectively
+        """
+        cmds = [self._critical_processes_file_cmd(container_name)]
+        if container_name == "pmon":
+            cmds.append("docker exec {} supervisorctl status".format(container_name))
+        results = self.shell_batch(cmds, parallel=True, module_ignore_errors=True)["results"]
+        if len(results) != len(cmds):
+            return [], [], False
 
-            cmds.append(cmd)
-        results = self.shell_cmds(cmds=cmds, continue_on_fail=True, module_ignore_errors=True, timeout=30)['results']
+        process_status_lines = results[1]["stdout_lines"] if container_name == "pmon" else []
+        return self._parse_critical_group_and_process_lists(
+            container_name, results[0]["stdout_lines"], process_status_lines)
 
+    def _parse_critical_group_process(self, results):
+        """
+        @summary: Parse critical group and process definitions from results of reading critical_processes files
+        @param results: Results of commands returned by _critical_processes_file_cmd
+        @return: A dictionary keyed by service name, value is a dictionary of critical groups and processes
+        """
         # Extract service name of each command result, transform results list to a dict keyed by service name
         service_results = {}
         for res in results:
@@ -651,6 +716,13 @@ class SonicHost(AnsibleHostBase):
 
         return group_process_results
 
+    def critical_group_process(self):
+        # Get critical group and process definitions by running cmds in batch to save overhead
+        cmds = [self._critical_processes_file_cmd(service) for service in self.critical_services]
+        results = self.shell_batch(cmds, parallel=True, timeout=30, module_ignore_errors=True)['results']
+
+        return self._parse_critical_group_process(results)
+
     def critical_processes_running(self, service):
         """
         @summary: Check whether critical processes are running for a service
@@ -671,20 +743,31 @@ class SonicHost(AnsibleHostBase):
             'running_critical_process': []
         }
 
+        # Get service status, critical process definition and process status in one batch
+        cmds = [
+            "docker inspect -f '{{{{.State.Running}}}}' {}".format(service),
+            self._critical_processes_file_cmd(service),
+            "docker exec {} supervisorctl status".format(service)
+        ]
+        results = self.shell_batch(cmds, parallel=True, module_ignore_errors=True)["results"]
+        if len(results) != len(cmds):
+            result['status'] = False
+            return result
+        inspect_result, file_result, output = results
+
         # return false if the service is not started
-        service_status = self.is_service_fully_started(service)
-        if service_status is False:
+        if inspect_result["rc"] != 0 or inspect_result["stdout"].strip() != "true":
             result['status'] = False
             return result
 
         # get critical group and process lists for the service
-        critical_group_list, critical_process_list, succeeded = self.get_critical_group_and_process_lists(service)
+        critical_group_list, critical_process_list, succeeded = self._parse_critical_group_and_process_lists(
+            service, file_result["stdout_lines"], output["stdout_lines"])
         if succeeded is False:
             result['status'] = False
             return result
 
         # get process status for the service
-        output = self.command("docker exec {} supervisorctl status".format(service), module_ignore_errors=True)
         logging.info("====== supervisor process status for service {} ======".format(service))
 
         return self.parse_service_status_and_critical_process(
@@ -697,21 +780,21 @@ class SonicHost(AnsibleHostBase):
         """
         @summary: Check whether all critical processes status for all critical services
         """
-        # Get critical process definition of all services
-        group_process_results = self.critical_group_process()
+        # Get critical process definition and process status of all services in one batch to save overhead
+        file_cmds = [self._critical_processes_file_cmd(service) for service in self.critical_services]
+        status_cmds = ['docker exec {} supervisorctl status'.format(service) for service in self.critical_services]
+        results = self.shell_batch(file_cmds + status_cmds, parallel=True, timeout=30,
+                                   module_ignore_errors=True)['results']
 
-        # Get process status of all services. Run cmds in batch to save overhead
-        cmds = []
-        for service in self.critical_services:
-            cmd = 'docker exec {} supervisorctl status'.format(service)
-            cmds.append(cmd)
-        results = self.shell_cmds(cmds=cmds, continue_on_fail=True, module_ignore_errors=True, timeout=30)['results']
+        group_process_results = self._parse_critical_group_process(
+            [res for res in results if res['cmd'] in file_cmds])
 
         # Extract service name of each command result, transform results list to a dict keyed by service name
         service_results = {}
         for res in results:
-            service = res['cmd'].split()[2]
-            service_results[service] = res
+            if res['cmd'] in status_cmds:
+                service = res['cmd'].split()[2]
+                service_results[service] = res
 
         # Parse critical process status of all services
         all_critical_process = {}
@@ -1725,7 +1808,7 @@ Totals               6450                 6449
             output = output[start_line_index:end_line_index]
         return self._parse_show(output, header_len)
 
-    @cached(name='mg_facts')
+    @cached(name='mg_facts', validator=sonic_config_fingerprint)
     def get_extended_minigraph_facts(self, tbinfo, namespace=DEFAULT_NAMESPACE):
         mg_facts = self.minigraph_facts(host=self.hostname, namespace=namespace)['ansible_facts']
         mg_facts['minigraph_ptf_indices'] = {}
@@ -2004,15 +2087,18 @@ Totals               6450                 6449
         """
         crm_facts = {}
 
+        # Get summary, thresholds and resources in one batch
+        cmds = ['crm show summary', 'crm show thresholds all', 'crm show resources all']
+        summary, thresholds, resources = self.shell_batch(cmds, parallel=True)['results']
+
         # Get polling interval
-        output = self.command('crm show summary')['stdout']
-        parsed = re.findall(r'Polling Interval: +(\d+) +second', output)
+        parsed = re.findall(r'Polling Interval: +(\d+) +second', summary['stdout'])
         if parsed:
             crm_facts['polling_interval'] = int(parsed[0])
 
         # Get thresholds
         crm_facts['thresholds'] = {}
-        thresholds = self.show_and_parse('crm show thresholds all')
+        thresholds = self._parse_show(thresholds['stdout_lines'])
         for threshold in thresholds:
             crm_facts['thresholds'][threshold['resource name']] = {
                 'high': int(threshold['high threshold']),
@@ -2020,10 +2106,11 @@ Totals               6450                 6449
                 'type': threshold['threshold type']
             }
 
-        def _show_and_parse_crm_resources():
+        def _show_and_parse_crm_resources(output=None):
             # Get output of all resources
             not_ready_prompt = "CRM counters are not ready"
-            output = self.command('crm show resources all')['stdout_lines']
+            if output is None:
+                output = self.command('crm show resources all')['stdout_lines']
             in_section = False
             sections = defaultdict(list)
             section_id = 0
@@ -2063,13 +2150,14 @@ Totals               6450                 6449
             return True
         # Retry until crm resources are ready
         timeout = crm_facts['polling_interval'] + 10
+        ret = _show_and_parse_crm_resources(resources['stdout_lines'])
         while timeout >= 0:
-            ret = _show_and_parse_crm_resources()
             if ret:
                 break
             logging.warning("CRM counters are not ready yet, will retry after 10 seconds")
             time.sleep(10)
             timeout -= 10
+            ret = _show_and_parse_crm_resources()
         assert (timeout >= 0)
 
         return crm_facts
@@ -24,3 +24,21 @@ def sonic_asic_zone_getter(function, func_args, func_kargs):
     logger.info(f"[Cache] generate zone[{zone}] for asic[{namespace}]")
 
     return zone
+
+
+SONIC_FINGERPRINT_CMD = "sonic-cfggen -y /etc/sonic/sonic_version.yml -v build_version; " \
+                        "md5sum /etc/sonic/config_db*.json /etc/sonic/minigraph.xml 2>/dev/null"
+
+
+def sonic_config_fingerprint(function, func_args, func_kargs):
+    """
+        SonicHost specific validator used for decorator cached.
+        The fingerprint consists of the image version and checksums of config_db and minigraph files.
+        Cached facts are refreshed after image upgrade or configuration change.
+    """
+    sonichost = func_args[0]
+    output = sonichost.shell(SONIC_FINGERPRINT_CMD, module_ignore_errors=True)
+    if not output["stdout"].strip():
+        raise RuntimeError(f"[Cache] Can't get fingerprint of host[{sonichost.hostname}]")
+
+    return output["stdout"].strip()
@@ -0,0 +1,90 @@
+"""Helpers for running a batch of shell commands on a remote host in one remote execution.
+
+The commands are wrapped in a bash script. Output of each command is saved to temporary files on the remote host, then
+printed with delimiter lines carrying the command index and exit code, so that stdout, stderr and exit code of every
+command can be split out of the output of the script.
+"""
+import re
+import shlex
+import uuid
+
+# Default maximum number of commands run concurrently by a parallel batch. Most of the commands are 'docker exec',
+# which are heavy on the DUT
+MAX_PARALLEL_JOBS = 4
+
+
+def build_batch_script(cmds, marker, parallel=False, continue_on_fail=True, timeout=0, max_jobs=MAX_PARALLEL_JOBS):
+    """Build a bash script for running a batch of commands.
+
+    Args:
+        cmds (list): List of commands. Each command is run by bash in a subshell, with stdin from /dev/null.
+        marker (str): Unique string used in delimiter lines.
+        parallel (bool): Run the commands concurrently. All commands are run regardless of continue_on_fail.
+        continue_on_fail (bool): Continue running rest of the commands if a command failed.
+        timeout (int): Time limit (in second) of each command. 0 means no limit.
+        max_jobs (int): Maximum number of commands running at the same time when parallel.
+
+    Returns:
+        str: The bash script.
+    """
+    lines = ['d=$(mktemp -d)', 'trap \'rm -rf "$d"\' EXIT', 'run_cmds() {']
+    for index, cmd in enumerate(cmds):
+        files = '>"$d/{0}.out" 2>"$d/{0}.err" </dev/null'.format(index)
+        if timeout:
+            run = 'timeout --preserve-status {} bash -c {} {}'.format(int(timeout), shlex.quote(cmd), files)
+        else:
+            # Newlines around the command, so that a trailing comment in the command can't hide the parenthesis
+            run = '(\n{}\n) {}'.format(cmd, files)
+        if parallel:
+            # Wait for a free job slot before starting the command
+            lines.append('while [ "$(jobs -rp | wc -l)" -ge {} ]; do wait -n; done'.format(int(max_jobs)))
+            lines.append('{{ {}; echo $? >"$d/{}.rc"; }} &'.format(run, index))
+        else:
+            lines.append('{}; rc=$?; echo $rc >"$d/{}.rc"'.format(run, index))
+            if not continue_on_fail:
+                lines.append('[ $rc -eq 0 ] || return')
+    lines.append('wait' if parallel else 'true')
+    lines.append('}')
+    lines.append('run_cmds')
+    lines.append('for i in $(seq 0 {}); do'.format(len(cmds) - 1))
+    lines.append('  [ -f "$d/$i.rc" ] || break')
+    lines.append('  printf \'\\n%s %s stdout %s\\n\' {} "$i" "$(cat "$d/$i.rc")"'.format(shlex.quote(marker)))
+    lines.append('  cat "$d/$i.out"')
+    lines.append('  printf \'\\n%s %s stderr\\n\' {} "$i"'.format(shlex.quote(marker)))
+    lines.append('  cat "$d/$i.err"')
+    lines.append('done')
+    return '\n'.join(lines)
+
+
+def parse_batch_output(output, cmds, marker):
+    """Split the output of a batch script into results of each command.
+
+    Args:
+        output (str): Stdout of the batch script.
+        cmds (list): List of commands in the batch.
+        marker (str): The marker passed to build_batch_script.
+
+    Returns:
+        list: Result of each command that was run, in the same format as results of the 'shell_cmds' module.
+    """
+    results = []
+    # Trailing newlines of the output may have been stripped, so the last delimiter line may have no newline
+    parts = re.split(r'(?:^|\n){} (\d+) (stdout|stderr)(?: (-?\d+))?(?:\n|$)'.format(re.escape(marker)), output)
+    # parts: [prefix, index, 'stdout', rc, stdout, index, 'stderr', None, stderr, ...]
+    for pos in range(1, len(parts) - 7, 8):
+        index, rc = int(parts[pos]), int(parts[pos + 2])
+        stdout = parts[pos + 3].rstrip('\r\n')
+        stderr = parts[pos + 7].rstrip('\r\n')
+        results.append(dict(
+            cmd=cmds[index],
+            rc=rc,
+            stdout=stdout,
+            stderr=stderr,
+            stdout_lines=stdout.splitlines(),
+            stderr_lines=stderr.splitlines()
+        ))
+    return results
+
+
+def new_marker():
+    return '__SHELL_BATCH_{}__'.format(uuid.uuid4().hex)
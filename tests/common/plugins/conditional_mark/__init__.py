@@ -14,12 +14,19 @@ import pytest
 
 from tests.common.testbed import TestbedInfo
 from .issue import check_issues
+from .condition_index import ConditionIndex
 from tests.common.utilities import get_duts_from_host_pattern
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_CONDITIONS_FILE = 'common/plugins/conditional_mark/tests_mark_conditions*.yaml'
 ASIC_NAME_PATH = '/../../../../ansible/group_vars/sonic/variables'
+ISSUE_URL_PATTERN = re.compile('https?://[^ )]+')
+
+# Raw condition string -> (condition string with issue URLs replaced, compiled code object or None if not compilable)
+COMPILED_CONDITIONS = {}
+# (raw condition string, basic facts fingerprint) -> evaluation result
+CONDITION_RESULTS = {}
 
 
 def pytest_addoption(parser):
@@ -403,12 +410,14 @@ def load_basic_facts(dut_name, session):
     return results
 
 
-def find_all_matches(nodeid, conditions):
+def find_all_matches(nodeid, conditions, condition_index=None):
     """Find all matches of the given test case name in the conditions list.
 
     Args:
         nodeid (str): Full test case name
         conditions (list): List of conditions
+        condition_index (ConditionIndex): Optional index built from the same conditions list. If it is supplied, the
+            index is used for finding matching conditions instead of checking every condition.
 
     Returns:
         list: All match test case name or None if not found
@@ -418,21 +427,24 @@ def find_all_matches(nodeid, conditions):
     conditional_marks = {}
     matches = []
 
-    for condition in conditions:
-        # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
-        condition_entry = list(condition.keys())[0]
-        condition_items = condition[condition_entry]
-        if "regex" in condition_items.keys():
-            assert isinstance(condition_items["regex"], bool), \
-                "The value of 'regex' in the mark conditions yaml should be bool type."
-            if condition_items["regex"] is True:
-                match = re.search(condition_entry, nodeid)
+    if condition_index is not None:
+        all_matches = condition_index.match(nodeid)
+    else:
+        for condition in conditions:
+            # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
+            condition_entry = list(condition.keys())[0]
+            condition_items = condition[condition_entry]
+            if "regex" in condition_items.keys():
+                assert isinstance(condition_items["regex"], bool), \
+                    "The value of 'regex' in the mark conditions yaml should be bool type."
+                if condition_items["regex"] is True:
+                    match = re.search(condition_entry, nodeid)
+                else:
+                    match = None
             else:
-                match = None
-        else:
-            match = nodeid.startswith(condition_entry)
-        if match:
-            all_matches.append(condition)
+                match = nodeid.startswith(condition_entry)
+            if match:
+                all_matches.append(condition)
 
     for match in all_matches:
         case_starting_substring = list(match.keys())[0]
@@ -479,7 +491,7 @@ def update_issue_status(condition_str, session):
     Returns:
         str: New condition string with issue URLs already replaced with 'True' or 'False'.
     """
-    issues = re.findall('https?://[^ )]+', condition_str)
+    issues = ISSUE_URL_PATTERN.findall(condition_str)
     if not issues:
         logger.debug('No issue specified in condition')
         return condition_str
@@ -504,7 +516,93 @@ def update_issue_status(condition_str, session):
     return condition_str
 
 
-def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basic_facts, session):
+def iter_condition_strings(conditions):
+    """Iterate over all the raw condition strings in the conditions list.
+
+    Args:
+        conditions (list): List of conditions returned by `load_conditions`.
+
+    Yields:
+        str: Raw condition string.
+    """
+    for condition in conditions:
+        for mark_details in list(condition.values())[0].values():
+            if not isinstance(mark_details, dict):
+                continue
+            mark_conditions = mark_details.get('conditions', None)
+            if isinstance(mark_conditions, list):
+                for mark_condition in mark_conditions:
+                    if isinstance(mark_condition, str):
+                        yield mark_condition
+            elif isinstance(mark_conditions, str):
+                yield mark_conditions
+
+
+def resolve_all_issues(conditions, session):
+    """Query state of all the issues referenced in the conditions list at once.
+
+    The issues are checked concurrently and their states are cached on disk for a while by `check_issues`. The results
+    are stored in the 'ISSUE_STATUS' cache, so that `update_issue_status` does not need to query issue state while test
+    cases are being marked.
+
+    Args:
+        conditions (list): List of conditions returned by `load_conditions`.
+        session (obj): Pytest session object, for getting cached data.
+    """
+    issues = set()
+    for condition_str in iter_condition_strings(conditions):
+        issues.update(ISSUE_URL_PATTERN.findall(condition_str))
+    if not issues:
+        return
+
+    logger.info('Checking state of {} issues'.format(len(issues)))
+    issue_status_cache = session.config.cache.get('ISSUE_STATUS', {})
+    proxies = session.config.cache.get('PROXIES', {})
+    issue_status_cache.update(check_issues(sorted(issues), proxies=proxies))
+    session.config.cache.set('ISSUE_STATUS', issue_status_cache)
+
+
+def compile_condition(condition, session):
+    """Compile a raw condition string into a code object.
+
+    Issue URLs in the condition are replaced and the result is compiled only once per session. Later calls for the
+    same condition string get the cached result.
+
+    Args:
+        condition (str): A raw condition string that may contain issue URLs.
+        session (obj): Pytest session object, for getting cached data.
+
+    Returns:
+        tuple: Condition string with issue URLs replaced, and compiled code object or None if compiling failed.
+    """
+    compiled = COMPILED_CONDITIONS.get(condition)
+    if compiled is None:
+        condition_str = update_issue_status(condition, session)
+        try:
+            code = compile(condition_str, '<condition>', 'eval')
+        except SyntaxError:
+            logger.exception('Failed to compile condition, raw_condition={}, condition_str={}'.format(
+                condition,
+                condition_str))
+            code = None
+        compiled = COMPILED_CONDITIONS[condition] = (condition_str, code)
+    return compiled
+
+
+def get_facts_fingerprint(basic_facts):
+    """Get a fingerprint of the basic facts for memoizing condition evaluation results.
+
+    Args:
+        basic_facts (dict): A one level dict with basic facts.
+
+    Returns:
+        str: Fingerprint of the basic facts.
+    """
+    return json.dumps(basic_facts, sort_keys=True, default=str)
+
+
+def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basic_facts, session,
+                       facts_fingerprint=None):
     """Evaluate a condition string based on supplied basic facts.
 
     Args:
@@ -516,6 +614,8 @@ def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basi
         basic_facts (dict): A one level dict with basic facts. Keys of the dict can be used as variables in the
             condition string evaluation.
         session (obj): Pytest session object, for getting cached data.
+        facts_fingerprint (str): Fingerprint of the basic facts returned by `get_facts_fingerprint`. If it is supplied,
+            evaluation result is memoized for the same condition and basic facts.
 
     Returns:
         bool: True or False based on condition string evaluation result.
@@ -523,21 +623,28 @@ def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basi
     if condition is None or condition.strip() == '':
         return True    # Empty condition item will be evaluated as True. Equivalent to be ignored.
 
-    condition_str = update_issue_status(condition, session)
-    try:
-        condition_result = bool(eval(condition_str, basic_facts))
-        if condition_result and dynamic_update_skip_reason:
-            mark_details['reason'].append(condition)
-        return condition_result
-    except Exception:
-        logger.exception('Failed to evaluate condition, raw_condition={}, condition_str={}'.format(
-            condition,
-            condition_str))
-        return False
+    memo_key = (condition, facts_fingerprint)
+    condition_result = CONDITION_RESULTS.get(memo_key) if facts_fingerprint is not None else None
+    if condition_result is None:
+        condition_str, code = compile_condition(condition, session)
+        condition_result = False
+        if code is not None:
+            try:
+                condition_result = bool(eval(code, basic_facts))
+            except Exception:
+                logger.exception('Failed to evaluate condition, raw_condition={}, condition_str={}'.format(
+                    condition,
+                    condition_str))
+        if facts_fingerprint is not None:
+            CONDITION_RESULTS[memo_key] = condition_result
+
+    if condition_result and dynamic_update_skip_reason:
+        mark_details['reason'].append(condition)
+    return condition_result
 
 
 def evaluate_conditions(dynamic_update_skip_reason, mark_details, conditions, basic_facts,
-                        conditions_logical_operator, session):
+                        conditions_logical_operator, session, facts_fingerprint=None):
     """Evaluate all the condition strings.
 
     Evaluate a single condition or multiple conditions. If multiple conditions are supplied, apply AND or OR
@@ -552,6 +659,7 @@ def evaluate_conditions(dynamic_update_skip_reason, mark_details, conditions, ba
             condition string evaluation.
         conditions_logical_operator (str): logical operator which should be applied to conditions(by default 'AND')
         session (obj): Pytest session object, for getting cached data.
+        facts_fingerprint (str): Fingerprint of the basic facts for memoizing evaluation results.
 
     Returns:
         bool: True or False based on condition strings evaluation result.
@@ -561,15 +669,18 @@ def evaluate_conditions(dynamic_update_skip_reason, mark_details, conditions, ba
     if isinstance(conditions, list):
         # Apply 'AND' or 'OR' operation to list of conditions based on conditions_logical_operator(by default 'AND')
         if conditions_logical_operator == 'OR':
-            return any([evaluate_condition(dynamic_update_skip_reason, mark_details, c, basic_facts, session)
+            return any([evaluate_condition(dynamic_update_skip_reason, mark_details, c, basic_facts, session,
+                                           facts_fingerprint)
                         for c in conditions])
         else:
-            return all([evaluate_condition(dynamic_update_skip_reason, mark_details, c, basic_facts, session)
+            return all([evaluate_condition(dynamic_update_skip_reason, mark_details, c, basic_facts, session,
+                                           facts_fingerprint)
                         for c in conditions])
     else:
         if conditions is None or conditions.strip() == '':
             return True
-        return evaluate_condition(dynamic_update_skip_reason, mark_details, conditions, basic_facts, session)
+        return evaluate_condition(dynamic_update_skip_reason, mark_details, conditions, basic_facts, session,
+                                  facts_fingerprint)
 
 
 def pytest_collection(session):
@@ -583,6 +694,8 @@ def pytest_collection(session):
 
     # Always clear cached conditions of previous run.
     session.config.cache.set('TESTS_MARK_CONDITIONS', None)
+    COMPILED_CONDITIONS.clear()
+    CONDITION_RESULTS.clear()
 
     if session.config.option.ignore_conditional_mark:
         logger.info('Ignore conditional mark')
@@ -618,8 +731,11 @@ def pytest_collection_modifyitems(session, config, items):
     logger.info('Available basic facts that can be used in conditional skip:\n{}'.format(
         json.dumps(basic_facts, indent=2)))
     dynamic_update_skip_reason = session.config.option.dynamic_update_skip_reason
+    facts_fingerprint = get_facts_fingerprint(basic_facts)
+    condition_index = ConditionIndex(conditions)
+    resolve_all_issues(conditions, session)
     for item in items:
-        all_matches = find_all_matches(item.nodeid, conditions)
+        all_matches = find_all_matches(item.nodeid, conditions, condition_index)
 
         if all_matches:
             logger.debug('Found match "{}" for test case "{}"'.format(all_matches, item.nodeid))
@@ -640,7 +756,8 @@ def pytest_collection_modifyitems(session, config, items):
                             add_mark = True
                         else:
                             add_mark = evaluate_conditions(dynamic_update_skip_reason, mark_details, mark_conditions,
-                                                           basic_facts, conditions_logical_operator, session)
+                                                           basic_facts, conditions_logical_operator, session,
+                                                           facts_fingerprint)
 
                     if add_mark:
                         reason = ''
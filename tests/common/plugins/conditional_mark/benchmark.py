@@ -0,0 +1,93 @@
+"""Benchmark for matching test cases against the mark conditions files.
+
+Compare finding matches by checking every condition with finding matches using ConditionIndex. Test case names are
+collected from the test scripts under the `tests` folder, or read from the output of `pytest --collect-only -q`.
+
+Usage:
+    python tests/common/plugins/conditional_mark/benchmark.py
+    python tests/common/plugins/conditional_mark/benchmark.py --nodeids-file collected.txt
+"""
+import argparse
+import ast
+import glob
+import os
+import sys
+import time
+
+import yaml
+
+TESTS_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), '../../..'))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+from tests.common.plugins.conditional_mark import DEFAULT_CONDITIONS_FILE, find_all_matches    # noqa: E402
+from tests.common.plugins.conditional_mark.condition_index import ConditionIndex               # noqa: E402
+
+
+def collect_nodeids(tests_dir):
+    """Collect test case names from test scripts without importing them.
+
+    Parametrized test cases are not expanded.
+    """
+    nodeids = []
+    for path in sorted(glob.glob(os.path.join(tests_dir, '**', 'test_*.py'), recursive=True)):
+        rel_path = os.path.relpath(path, tests_dir)
+        try:
+            with open(path) as f:
+                tree = ast.parse(f.read())
+        except (SyntaxError, UnicodeDecodeError):
+            continue
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith('test'):
+                nodeids.append('{}::{}'.format(rel_path, node.name))
+            elif isinstance(node, ast.ClassDef) and node.name.startswith('Test'):
+                for method in node.body:
+                    if isinstance(method, ast.FunctionDef) and method.name.startswith('test'):
+                        nodeids.append('{}::{}::{}'.format(rel_path, node.name, method.name))
+    return nodeids
+
+
+def load_conditions(pattern):
+    conditions = []
+    for conditions_file in sorted(glob.glob(pattern)):
+        with open(conditions_file) as f:
+            for key, value in list((yaml.safe_load(f) or {}).items()):
+                conditions.append({key: value})
+    return conditions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark conditional mark matching')
+    parser.add_argument('--nodeids-file', help='File with test case names, one per line')
+    parser.add_argument('--conditions-files', default=os.path.join(TESTS_DIR, DEFAULT_CONDITIONS_FILE),
+                        help='Pattern of the mark conditions files')
+    args = parser.parse_args()
+
+    if args.nodeids_file:
+        with open(args.nodeids_file) as f:
+            nodeids = [line.strip() for line in f if '::' in line]
+    else:
+        nodeids = collect_nodeids(TESTS_DIR)
+    conditions = load_conditions(args.conditions_files)
+    print('{} test cases, {} conditions'.format(len(nodeids), len(conditions)))
+
+    start = time.time()
+    linear_results = [find_all_matches(nodeid, conditions) for nodeid in nodeids]
+    linear_time = time.time() - start
+
+    start = time.time()
+    condition_index = ConditionIndex(conditions)
+    build_time = time.time() - start
+    start = time.time()
+    index_results = [find_all_matches(nodeid, conditions, condition_index) for nodeid in nodeids]
+    index_time = time.time() - start
+
+    print('linear scan: {:.3f}s'.format(linear_time))
+    print('index:       {:.3f}s (build {:.3f}s)'.format(index_time, build_time))
+    if linear_results != index_results:
+        print('ERROR: results of linear scan and index are different')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
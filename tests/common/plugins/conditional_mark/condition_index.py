@@ -0,0 +1,131 @@
+"""Index of mark conditions for looking up matching entries by test case nodeid.
+
+Plain condition entries are matched with `nodeid.startswith(entry)`. They are stored in a character trie, so finding all
+of them costs one walk along the nodeid no matter how many entries are defined.
+
+Entries with `regex: true` are matched with `re.search(entry, nodeid)`. They are compiled once and bucketed by the
+literal text they start with. Anchored patterns (`^...`) hang off the trie node of their literal prefix and are only
+tried when the walk reaches that node. Unanchored patterns are only tried when their literal prefix is found in the
+nodeid.
+"""
+import re
+
+# Characters that end the literal prefix of a regular expression
+REGEX_SPECIAL_CHARS = set('.^$*+?{}[]\\|()')
+# Quantifiers make the preceding character optional or repeated, so it can't be part of a required literal
+REGEX_QUANTIFIERS = set('*?{')
+
+
+def regex_literal_prefix(pattern):
+    """Get the literal text a regular expression starts with.
+
+    Args:
+        pattern (str): Regular expression, without a leading '^'.
+
+    Returns:
+        str: Literal prefix that any string matched by the pattern must start with. Empty string if there is none.
+    """
+    prefix = []
+    for idx, char in enumerate(pattern):
+        if char in REGEX_SPECIAL_CHARS:
+            if char in REGEX_QUANTIFIERS and prefix:
+                prefix.pop()
+            break
+        if idx + 1 < len(pattern) and pattern[idx + 1] in REGEX_QUANTIFIERS:
+            break
+        prefix.append(char)
+    return ''.join(prefix)
+
+
+class TrieNode(object):
+    """Node of the condition trie.
+    """
+
+    __slots__ = ('children', 'positions', 'regexes')
+
+    def __init__(self):
+        self.children = {}
+        self.positions = []     # Positions of plain conditions ending at this node
+        self.regexes = []       # (position, compiled regex) of anchored regex conditions with this literal prefix
+
+
+class ConditionIndex(object):
+    """Compiled index of the mark conditions list returned by `load_conditions`.
+    """
+
+    def __init__(self, conditions):
+        """Build the index.
+
+        Args:
+            conditions (list): List of conditions. Each condition is a dict which has only one item, the key is the
+                test case name or pattern.
+        """
+        self.conditions = conditions
+        self.root = TrieNode()
+        self.regex_buckets = {}
+        for position, condition in enumerate(conditions):
+            condition_entry = list(condition.keys())[0]
+            condition_items = condition[condition_entry] or {}
+            if "regex" in condition_items.keys():
+                assert isinstance(condition_items["regex"], bool), \
+                    "The value of 'regex' in the mark conditions yaml should be bool type."
+                if condition_items["regex"] is True:
+                    self._add_regex(position, condition_entry)
+            else:
+                self._node(condition_entry).positions.append(position)
+
+    def _node(self, prefix):
+        node = self.root
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = TrieNode()
+            node = child
+        return node
+
+    def _add_regex(self, position, pattern):
+        compiled = re.compile(pattern)
+        if pattern.startswith('^') and '|' not in pattern:
+            self._node(regex_literal_prefix(pattern[1:])).regexes.append((position, compiled))
+        else:
+            literal = regex_literal_prefix(pattern) if '|' not in pattern else ''
+            self.regex_buckets.setdefault(literal, []).append((position, compiled))
+
+    def match_positions(self, nodeid):
+        """Find positions of all conditions matching the nodeid.
+
+        Args:
+            nodeid (str): Full test case name.
+
+        Returns:
+            list: Sorted positions in the conditions list of all matching conditions.
+        """
+        positions = []
+        node = self.root
+        for char in nodeid:
+            positions.extend(node.positions)
+            positions.extend(p for p, regex in node.regexes if regex.search(nodeid))
+            node = node.children.get(char)
+            if node is None:
+                break
+        else:
+            positions.extend(node.positions)
+            positions.extend(p for p, regex in node.regexes if regex.search(nodeid))
+
+        for literal, regexes in self.regex_buckets.items():
+            if literal in nodeid:
+                positions.extend(p for p, regex in regexes if regex.search(nodeid))
+
+        positions.sort()
+        return positions
+
+    def match(self, nodeid):
+        """Find all conditions matching the nodeid.
+
+        Args:
+            nodeid (str): Full test case name.
+
+        Returns:
+            list: All matching conditions, in the same order as in the conditions list.
+        """
+        return [self.conditions[position] for position in self.match_positions(nodeid)]
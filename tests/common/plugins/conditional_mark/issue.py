@@ -1,15 +1,28 @@
 """For checking issue state based on supplied issue URL.
 """
+import fcntl
+import json
 import logging
-import multiprocessing
+import os
 import re
+import threading
+import time
 import six
 import requests
 
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+GITHUB_API_URL = 'https://api.github.com/repos'
+
+CURRENT_PATH = os.path.realpath(__file__)
+ISSUE_STATUS_CACHE_FILE = os.path.join(os.path.dirname(CURRENT_PATH), '../../../_cache/issue_status.json')
+ISSUE_STATUS_CACHE_TTL = 3600   # Seconds before a cached issue state is checked again
+FAILED_CHECK_CACHE_TTL = 30     # Seconds before an issue is checked again if getting its state failed
+MAX_CHECK_WORKERS = 16          # Max number of issues checked concurrently
+
 
 class IssueCheckerBase(six.with_metaclass(ABCMeta, object)):
     """Base class for issue checker
@@ -17,6 +30,8 @@ class IssueCheckerBase(six.with_metaclass(ABCMeta, object)):
 
     def __init__(self, url):
         self.url = url
+        # Set if the issue state could not be got and the issue is considered as active
+        self.check_failed = False
 
     @abstractmethod
     def is_active(self):
@@ -34,19 +49,23 @@ class GitHubIssueChecker(IssueCheckerBase):
 
     def __init__(self, url, proxies):
         super(GitHubIssueChecker, self).__init__(url)
-        self.api_url = url.replace('github.com', 'api.github.com/repos')
+        self.api_url = re.sub('^https?://github.com', GITHUB_API_URL, url)
         self.proxies = proxies
 
-    def is_active(self):
+    def is_active(self, http_session=None):
         """Check if the issue is still active.
 
         If unable to get issue state, always consider it as active.
 
+        Args:
+            http_session (obj): Optional requests.Session object. It is used for sending the request, so that the
+                connection can be reused for checking multiple issues.
+
         Returns:
             bool: False if the issue is closed else True.
         """
         try:
-            response = requests.get(self.api_url, proxies=self.proxies, timeout=10)
+            response = (http_session or requests).get(self.api_url, proxies=self.proxies, timeout=10)
             response.raise_for_status()
             issue_data = response.json()
             if issue_data.get('state', '') == 'closed':
@@ -58,6 +77,7 @@ class GitHubIssueChecker(IssueCheckerBase):
                 return False
         except Exception as e:
             logger.error('Get details for {} failed with: {}'.format(self.url, repr(e)))
+            self.check_failed = True
 
         logger.debug('Issue {} is active. Or getting issue state failed, consider it as active anyway'.format(self.url))
         return True
@@ -83,35 +103,132 @@ def issue_checker_factory(url, proxies):
     return None
 
 
-def check_issues(issues, proxies=None):
-    """Check state of the specified issues.
+class IssueStatusCache(object):
+    """Issue state cache stored in a json file.
 
-    Because issue state checking may involve sending HTTP request. This function uses parallel run to speed up
-    issue status checking.
+    The cache file is shared by pytest sessions and xdist workers on the same host. Access to the file is serialized
+    with an advisory lock, and the file is replaced atomically on update. Cached issue state expires after ttl seconds,
+    or after FAILED_CHECK_CACHE_TTL seconds if getting the issue state failed.
+    """
 
-    Args:
-        issues (list of str): List of issue URLs.
+    def __init__(self, cache_file=ISSUE_STATUS_CACHE_FILE, ttl=ISSUE_STATUS_CACHE_TTL):
+        self.cache_file = os.path.abspath(cache_file)
+        self.ttl = ttl
+        self._lock_file = None
+
+    def __enter__(self):
+        """Take the lock of the cache file. Other processes using the cache will wait until it is released.
+        """
+        cache_dir = os.path.dirname(self.cache_file)
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        self._lock_file = open(self.cache_file + '.lock', 'w')
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+        self._lock_file = None
+
+    def _load_entries(self):
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def load(self):
+        """Load issue states which are not expired.
+
+        Returns:
+            dict: Key is issue URL, value is either True or False based on issue state.
+        """
+        return {url: entry['active'] for url, entry in self._load_valid_entries().items()}
+
+    def _load_valid_entries(self):
+        now = time.time()
+        return {url: entry for url, entry in self._load_entries().items()
+                if now - entry.get('time', 0) < entry.get('ttl', self.ttl)}
+
+    def update(self, results, failed_issues=()):
+        """Add issue states to the cache file.
+
+        Args:
+            results (dict): Key is issue URL, value is either True or False based on issue state.
+            failed_issues (collection): URLs of the issues considered as active because getting their states failed.
+        """
+        now = time.time()
+        entries = self._load_valid_entries()
+        for url, active in results.items():
+            entries[url] = {'active': active, 'time': now}
+            if url in failed_issues:
+                entries[url]['ttl'] = FAILED_CHECK_CACHE_TTL
+        tmp_file = '{}.{}.tmp'.format(self.cache_file, os.getpid())
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(entries, f, indent=2)
+            os.rename(tmp_file, self.cache_file)
+        except (IOError, OSError) as e:
+            logger.error('Failed to save issue state cache {}, exception: {}'.format(self.cache_file, repr(e)))
+
+
+def _check_issues_concurrently(issues, proxies, max_workers):
+    """Check issue states with a bounded pool of threads. Each thread reuses its own HTTP connections.
 
     Returns:
-        dict: Issue state check result. Key is issue URL, value is either True or False based on issue state.
+        tuple: Issue state check result, and the set of issues considered as active because getting their states
+            failed.
     """
     checkers = [c for c in [issue_checker_factory(issue, proxies) for issue in issues] if c is not None]
     if not checkers:
         logger.error('No checker created for issues: {}'.format(issues))
-        return {}
+        return {}, set()
+
+    thread_data = threading.local()
 
-    check_results = multiprocessing.Manager().dict()
-    check_procs = []
+    def _check_issue(checker):
+        if not hasattr(thread_data, 'http_session'):
+            thread_data.http_session = requests.Session()
+        return checker.url, checker.is_active(thread_data.http_session)
 
-    def _check_issue(checker, results):
-        results[checker.url] = checker.is_active()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(checkers)))) as executor:
+        results = dict(executor.map(_check_issue, checkers))
+    return results, set(checker.url for checker in checkers if checker.check_failed)
 
-    for checker in checkers:
-        check_procs.append(multiprocessing.Process(target=_check_issue, args=(checker, check_results,)))
 
-    for proc in check_procs:
-        proc.start()
-    for proc in check_procs:
-        proc.join(timeout=60)
+def check_issues(issues, proxies=None, cache_file=ISSUE_STATUS_CACHE_FILE, ttl=ISSUE_STATUS_CACHE_TTL,
+                 max_workers=MAX_CHECK_WORKERS):
+    """Check state of the specified issues.
+
+    Because issue state checking may involve sending HTTP request. This function checks issues concurrently with a
+    bounded thread pool to speed up issue status checking. Issue states are cached on disk for ttl seconds, so that
+    pytest sessions and xdist workers started within the ttl do not need to query them again.
+
+    Args:
+        issues (list of str): List of issue URLs.
+        proxies (dict): Proxies used for sending HTTP requests.
+        cache_file (str): Path of the issue state cache file. Set it to None to disable the cache.
+        ttl (int): Seconds before a cached issue state expires.
+        max_workers (int): Max number of issues checked concurrently.
 
-    return dict(check_results)
+    Returns:
+        dict: Issue state check result. Key is issue URL, value is either True or False based on issue state.
+    """
+    issues = sorted(set(issues))
+    if cache_file is None:
+        return _check_issues_concurrently(issues, proxies, max_workers)[0]
+
+    cache = IssueStatusCache(cache_file, ttl)
+    with cache:
+        cached_results = cache.load()
+    results = {issue: cached_results[issue] for issue in issues if issue in cached_results}
+    unknown_issues = [issue for issue in issues if issue not in results]
+    if unknown_issues:
+        logger.debug('Issue state cache hit {}, miss {}'.format(len(results), len(unknown_issues)))
+        # The lock is not held while checking, other workers are not blocked by the HTTP requests
+        check_results, failed_issues = _check_issues_concurrently(unknown_issues, proxies, max_workers)
+        with cache:
+            cache.update(check_results, failed_issues)
+        results.update(check_results)
+    return results
@@ -15,6 +15,9 @@ def pytest_addoption(parser):
                      help="do not fail the test if new bugs were found")
     parser.addoption("--loganalyzer_rotate_logs", action="store_true", default=True,
                      help="rotate log on all the dut engines at the beginning of the log analyzer fixture")
+    parser.addoption("--loganalyzer_use_offsets", action="store_true", default=False,
+                     help="record size of the log files instead of adding start marker, and analyze only the "
+                          "content appended since then without adding end marker")
 
 
 @reset_ansible_local_tmp
@@ -73,6 +76,7 @@ def loganalyzer(duthosts, request, log_rotate_modular_chassis):
     store_la_logs = request.config.getoption("--store_la_logs")
     analyzers = {}
     should_rotate_log = request.config.getoption("--loganalyzer_rotate_logs")
+    use_offsets = request.config.getoption("--loganalyzer_use_offsets")
     is_modular_chassis = duthosts[0].get_facts().get("modular_chassis") if duthosts else False
 
     # We make sure only run logrotate as "function" scope for non-modular chassis for optimisation purpose.
@@ -80,7 +84,7 @@ def loganalyzer(duthosts, request, log_rotate_modular_chassis):
     if should_rotate_log and not is_modular_chassis:
         parallel_run(analyzer_logrotate, [], {}, duthosts, timeout=120)
     for duthost in duthosts:
-        analyzer = LogAnalyzer(ansible_host=duthost, marker_prefix=request.node.name)
+        analyzer = LogAnalyzer(ansible_host=duthost, marker_prefix=request.node.name, use_offsets=use_offsets)
         analyzer.load_common_config()
         analyzers[duthost.hostname] = analyzer
     markers = parallel_run(analyzer_add_marker, [analyzers], {}, duthosts, timeout=120)
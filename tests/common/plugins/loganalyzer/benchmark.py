@@ -0,0 +1,153 @@
+"""Benchmarks for the log analyzer.
+
+Usage:
+    python tests/common/plugins/loganalyzer/benchmark.py reverse-read --size-mb 2048
+    python tests/common/plugins/loganalyzer/benchmark.py matcher --log /var/log/syslog
+"""
+import argparse
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+import system_msg_handler    # noqa: E402
+
+RULES_DIR = os.path.dirname(os.path.realpath(__file__))
+COMMON_MATCH = os.path.join(RULES_DIR, 'loganalyzer_common_match.txt')
+COMMON_IGNORE = os.path.join(RULES_DIR, 'loganalyzer_common_ignore.txt')
+
+LOG_LINE = 'Oct 18 10:00:00.123456 sonic INFO swss#orchagent: :- doTask: Processed route {} via 10.0.0.1 Ethernet0\n'
+MARKER_LINE = 'Oct 18 10:00:00.123456 sonic INFO {}\n'
+
+
+def generate_log(path, size_mb, run_id, tail_lines):
+    """Generate a synthetic syslog file. Start and end markers are placed close to the end of the file.
+    """
+    analyzer = system_msg_handler.AnsibleLogAnalyzer(run_id, False)
+    block = ''.join(LOG_LINE.format(i) for i in range(10000))
+    with open(path, 'w') as log_file:
+        while log_file.tell() < size_mb * 1024 * 1024:
+            log_file.write(block)
+        log_file.write(MARKER_LINE.format(analyzer.create_start_marker()))
+        for i in range(tail_lines):
+            log_file.write(LOG_LINE.format(i))
+        log_file.write(MARKER_LINE.format(analyzer.create_end_marker()))
+
+
+def _find_start_marker(path, run_id, use_readlines):
+    start_marker = system_msg_handler.AnsibleLogAnalyzer(run_id, False).create_start_marker()
+    start = time.time()
+    if use_readlines:
+        with open(path) as log_file:
+            lines = reversed(log_file.readlines())
+    else:
+        lines = system_msg_handler.reverse_readlines(path)
+    scanned = 0
+    for line in lines:
+        scanned += 1
+        if start_marker in line:
+            break
+    return scanned, time.time() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def reverse_read(args):
+    run_id = 'benchmark'
+    log_dir = tempfile.mkdtemp()
+    path = os.path.join(log_dir, 'syslog')
+    try:
+        generate_log(path, args.size_mb, run_id, args.tail_lines)
+        print('Log file size {} MB, {} lines after start marker'.format(
+            os.path.getsize(path) // (1024 * 1024), args.tail_lines))
+        for name, use_readlines in (('reversed(readlines())', True), ('reverse_readlines()', False)):
+            # Run each reader in a new process to measure its own peak memory usage
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                scanned, elapsed, max_rss = executor.submit(_find_start_marker, path, run_id, use_readlines).result()
+            print('{:<24} scanned {} lines in {:.3f}s, peak RSS {} MB'.format(name, scanned, elapsed, max_rss // 1024))
+    finally:
+        os.remove(path)
+        os.rmdir(log_dir)
+
+
+def generate_lines(ignore_rules, count, error_ratio):
+    """Generate synthetic syslog lines. Error lines are built from literals of random ignore rules.
+    """
+    lines = []
+    for i in range(count):
+        if random.random() >= error_ratio:
+            lines.append(LOG_LINE.format(i))
+        else:
+            literals = system_msg_handler._required_literals(
+                system_msg_handler.sre_parse.parse(random.choice(ignore_rules)))
+            lines.append('Oct 18 10:00:00.123456 sonic ERR {} {}\n'.format(' '.join(literals), i))
+    return lines
+
+
+def matcher(args):
+    analyzer = system_msg_handler.AnsibleLogAnalyzer('benchmark', False)
+    match_rules = analyzer.create_msg_regex(args.match_files.split(','))[1]
+    ignore_rules = analyzer.create_msg_regex(args.ignore_files.split(','))[1]
+    if args.log:
+        with open(args.log, errors='replace') as log_file:
+            lines = log_file.readlines()
+    else:
+        random.seed(0)
+        lines = generate_lines(ignore_rules, args.lines, args.error_ratio)
+    print('{} lines, {} match rules, {} ignore rules'.format(len(lines), len(match_rules), len(ignore_rules)))
+
+    start = time.time()
+    match_regex = re.compile('|'.join(match_rules))
+    ignore_regex = re.compile('|'.join(ignore_rules))
+    build_time = time.time() - start
+    start = time.time()
+    regex_results = [bool(match_regex.findall(line)) and not ignore_regex.findall(line) for line in lines]
+    regex_time = time.time() - start
+
+    start = time.time()
+    match_matcher = system_msg_handler.MultiPatternMatcher(match_rules)
+    ignore_matcher = system_msg_handler.MultiPatternMatcher(ignore_rules)
+    matcher_build_time = time.time() - start
+    start = time.time()
+    matcher_results = [bool(match_matcher.search(line)) and not ignore_matcher.search(line) for line in lines]
+    matcher_time = time.time() - start
+
+    print('joined regex findall: {:.3f}s (build {:.3f}s)'.format(regex_time, build_time))
+    print('MultiPatternMatcher:  {:.3f}s (build {:.3f}s), {} unscreened ignore rules'.format(
+        matcher_time, matcher_build_time, len(ignore_matcher.unscreened_rules)))
+    print('{} lines matched'.format(sum(matcher_results)))
+    if regex_results != matcher_results:
+        print('ERROR: results of joined regex and MultiPatternMatcher are different')
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Log analyzer benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark')
+    subparsers.required = True
+
+    parser_reverse_read = subparsers.add_parser('reverse-read', help='Find start marker from the end of a big log')
+    parser_reverse_read.add_argument('--size-mb', type=int, default=2048, help='Size of the synthetic log file')
+    parser_reverse_read.add_argument('--tail-lines', type=int, default=10000,
+                                     help='Number of lines between start and end markers')
+    parser_reverse_read.set_defaults(func=reverse_read)
+
+    parser_matcher = subparsers.add_parser('matcher', help='Match log lines against match and ignore rules')
+    parser_matcher.add_argument('--match-files', default=COMMON_MATCH, help='Comma separated match rule files')
+    parser_matcher.add_argument('--ignore-files', default=COMMON_IGNORE, help='Comma separated ignore rule files')
+    parser_matcher.add_argument('--log', help='Log file to match. Synthetic lines are used if not specified')
+    parser_matcher.add_argument('--lines', type=int, default=100000, help='Number of synthetic lines')
+    parser_matcher.add_argument('--error-ratio', type=float, default=0.1, help='Ratio of synthetic error lines')
+    parser_matcher.set_defaults(func=matcher)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,7 @@ import pprint
 from . import system_msg_handler
 
 from .system_msg_handler import AnsibleLogAnalyzer as ansible_loganalyzer
+from .system_msg_handler import MultiPatternMatcher
 from os.path import join, split
 
 ANSIBLE_LOGANALYZER_MODULE = system_msg_handler.__file__.replace(r".pyc", ".py")
@@ -72,7 +73,12 @@ class LogAnalyzerError(Exception):
 
 
 class LogAnalyzer:
-    def __init__(self, ansible_host, marker_prefix, dut_run_dir="/tmp", start_marker=None, additional_files={}):
+    def __init__(self, ansible_host, marker_prefix, dut_run_dir="/tmp", start_marker=None, additional_files={},
+                 use_offsets=False):
+        """
+        @param use_offsets: Record size of the log files on the DUT in "init" instead of adding start marker,
+            and analyze only the content appended since then, without adding and waiting for end marker.
+        """
         self.ansible_host = ansible_host
         ansible_host.loganalyzer = self
         self.dut_run_dir = dut_run_dir
@@ -88,6 +94,8 @@ class LogAnalyzer:
         self.expected_matches_target = 0
         self._markers = []
         self.fail = True
+        self.use_offsets = use_offsets
+        self._offset_markers = set()
 
         self.additional_files = list(additional_files.keys())
         self.additional_start_str = list(additional_files.values())
@@ -189,6 +197,11 @@ class LogAnalyzer:
             for match in msg_dic:
                 result_str += '\n'.join(msg_dic[match])
 
+        if result.get('match_rules'):
+            result_str += "\nMatch Rules:\n"
+            for rule, counter in list(result['match_rules'].items()):
+                result_str += "{}: {}\n".format(rule, counter)
+
         if any(expect_dic.values()):
             result_str += "\nExpected Messages:\n"
             for expect in expect_dic:
@@ -261,6 +274,9 @@ class LogAnalyzer:
             if not self.additional_start_str or self.additional_start_str[idx] == '':
                 log_files.append(path)
 
+        if self.use_offsets:
+            return self._record_offsets(log_files=log_files)
+
         return self._setup_marker(log_files=log_files)
 
     def add_start_ignore_mark(self, log_files=None):
@@ -312,6 +328,67 @@ class LogAnalyzer:
         self.ansible_host.command(cmd)
         return start_marker
 
+    def _record_offsets(self, log_files=None):
+        """
+        Record size of syslog and additional files on the DUT. The start marker is added as well, it is used if
+        the recorded offsets can't be found in "analyze", e.g. after the logs are rotated many times.
+        """
+        marker = ".".join((self.marker_prefix, time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())))
+        cmd = "python {run_dir}/loganalyzer.py --action init_offsets --run_id {marker} --out_dir {run_dir}"\
+            .format(run_dir=self.dut_run_dir, marker=marker)
+        if self.additional_files:
+            cmd += " --logs {}".format(','.join(self.additional_files))
+        cmd += " && python {run_dir}/loganalyzer.py --action init --run_id {marker}"\
+            .format(run_dir=self.dut_run_dir, marker=marker)
+        if log_files:
+            cmd += " --logs {}".format(','.join(log_files))
+
+        logging.debug("Recording log offsets and adding start marker '{}'".format(marker))
+        self.ansible_host.shell(cmd)
+        self._offset_markers.add(marker)
+        return marker
+
+    def _extract_since_offsets(self, marker):
+        """
+        Extract content appended to syslog and additional files since their size was recorded on the DUT.
+        The extracted files are placed into the same location as "extract_log" does.
+
+        @return: False if the content can't be extracted by the offsets.
+        """
+        # The DUT may be rebooted since the offsets are recorded
+        self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
+        cmd = "python {run_dir}/loganalyzer.py --action extract_since_offsets --run_id {marker} --out_dir {run_dir}"\
+            .format(run_dir=self.dut_run_dir, marker=marker)
+
+        logging.debug("Extracting logs since offsets '{}'".format(marker))
+        result = self.ansible_host.command(cmd, module_ignore_errors=True)
+        if result["rc"] != 0:
+            logging.warning("Failed to extract logs since offsets '{}', extract them by markers: {}".format(
+                marker, result["stdout"] or result["stderr"]))
+            return False
+        return True
+
+    def _extract_by_markers(self, marker, start_string):
+        """
+        Add end marker and extract content between start and end markers of syslog and additional files.
+        """
+        with DisableLogrotateCronContext(self.ansible_host):
+            # Add end marker into DUT syslog
+            self._add_end_marker(marker)
+
+            # On DUT extract syslog files from /var/log/ and create one file by location - /tmp/syslog
+            self.ansible_host.extract_log(directory='/var/log', file_prefix='syslog', start_string=start_string,
+                                          target_filename=self.extracted_syslog)
+            for idx, path in enumerate(self.additional_files):
+                file_dir, file_name = split(path)
+                extracted_file_name = os.path.join(self.dut_run_dir, file_name)
+                if self.additional_start_str and self.additional_start_str[idx] != '':
+                    start_str = self.additional_start_str[idx]
+                else:
+                    start_str = start_string
+                self.ansible_host.extract_log(directory=file_dir, file_prefix=file_name, start_string=start_str,
+                                              target_filename=extracted_file_name)
+
     def analyze(self, marker, fail=True, maximum_log_length=None, store_la_logs=False):
         """
         @summary: Extract syslog logs based on the start/stop markers and compose one file.
@@ -330,34 +407,28 @@ class LogAnalyzer:
                             "match_files": {},
                             "match_messages": {},
                             "expect_messages": {},
+                            "match_rules": {},
                             "unused_expected_regexp": []
                             }
         timestamp = time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())
         tmp_folder = ".".join((SYSLOG_TMP_FOLDER, self.ansible_host.hostname, timestamp))
+        use_offsets = marker in self._offset_markers
+        self._offset_markers.discard(marker)
         marker = marker.replace(' ', '_')
         self.ansible_loganalyzer.run_id = marker
+        self.ansible_loganalyzer.check_markers = not use_offsets
 
         if not self.start_marker:
             start_string = 'start-LogAnalyzer-{}'.format(marker)
         else:
             start_string = self.start_marker
 
-        with DisableLogrotateCronContext(self.ansible_host):
-            # Add end marker into DUT syslog
-            self._add_end_marker(marker)
-
-            # On DUT extract syslog files from /var/log/ and create one file by location - /tmp/syslog
-            self.ansible_host.extract_log(directory='/var/log', file_prefix='syslog', start_string=start_string,
-                                          target_filename=self.extracted_syslog)
-            for idx, path in enumerate(self.additional_files):
-                file_dir, file_name = split(path)
-                extracted_file_name = os.path.join(self.dut_run_dir, file_name)
-                if self.additional_start_str and self.additional_start_str[idx] != '':
-                    start_str = self.additional_start_str[idx]
-                else:
-                    start_str = start_string
-                self.ansible_host.extract_log(directory=file_dir, file_prefix=file_name, start_string=start_str,
-                                              target_filename=extracted_file_name)
+        # On DUT copy the content added since "init" to /tmp/syslog and files of the same names
+        if use_offsets and not self._extract_since_offsets(marker):
+            use_offsets = False
+            self.ansible_loganalyzer.check_markers = True
+        if not use_offsets:
+            self._extract_by_markers(marker, start_string)
 
         # Download extracted logs from the DUT to the temporal folder defined in SYSLOG_TMP_FOLDER
         self.save_extracted_log(dest=tmp_folder)
@@ -370,9 +441,9 @@ class LogAnalyzer:
             self.save_extracted_file(dest=tmp_folder, src=extracted_file_name)
             file_list.append(tmp_folder)
 
-        match_messages_regex = re.compile('|'.join(self.match_regex)) if len(self.match_regex) else None
-        ignore_messages_regex = re.compile('|'.join(self.ignore_regex)) if len(self.ignore_regex) else None
-        expect_messages_regex = re.compile('|'.join(self.expect_regex)) if len(self.expect_regex) else None
+        match_messages_regex = MultiPatternMatcher(self.match_regex) if len(self.match_regex) else None
+        ignore_messages_regex = MultiPatternMatcher(self.ignore_regex) if len(self.ignore_regex) else None
+        expect_messages_regex = MultiPatternMatcher(self.expect_regex) if len(self.expect_regex) else None
 
         logging.debug("Analyze files {}".format(file_list))
         logging.debug('    match_regex="{}"'.format(match_messages_regex.pattern if match_messages_regex else ''))
@@ -399,6 +470,10 @@ class LogAnalyzer:
             analyzer_summary["match_messages"][key] = matching_lines
             analyzer_summary["expect_messages"][key] = expecting_lines
             expected_lines_total.extend(expecting_lines)
+            # Attribute each match to the match rule which fired
+            for line in matching_lines:
+                rule = match_messages_regex.search(line).re.pattern
+                analyzer_summary["match_rules"][rule] = analyzer_summary["match_rules"].get(rule, 0) + 1
 
         # Find unused regex matches
         for regex in self.expect_regex:
@@ -104,6 +104,11 @@ def pytest_addoption(parser):
     parser.addoption("--vrf_test_count", action="store", default=None, type=int,
                      help="number of vrf to be tested (1-997)")
 
+    # test_fib options
+    parser.addoption("--ptf_burst_size", action="store", default=64, type=int,
+                     help="Max number of packets sent back to back by load balancing checks of the fib and hash "
+                          "PTF tests, 0 to send the packets one by one")
+
     # qos_sai options
     parser.addoption("--ptf_portmap", action="store", default=None, type=str,
                      help="PTF port index to DUT port alias map")
@@ -213,6 +218,12 @@ def pytest_addoption(parser):
     ##############################
     parser.addoption("--trim_inv", action="store_true", default=False, help="Trim inventory files")
 
+    ############################
+    #   command channel option #
+    ############################
+    parser.addoption("--command_channel", action="store_true", default=False,
+                     help="Run shell and command modules on DUTs through a persistent SSH command channel")
+
     ############################
     #   Parallel run options   #
     ############################
@@ -436,6 +447,9 @@ def fixture_duthosts(enhance_inventory, ansible_adhoc, tbinfo, request):
     try:
         host = DutHosts(ansible_adhoc, tbinfo, request, get_specified_duts(request),
                         target_hostname=get_target_hostname(request), is_parallel_leader=is_parallel_leader(request))
+        if request.config.getoption("command_channel"):
+            for node in host.nodes:
+                node.enable_command_channel()
         return host
     except BaseException as e:
         logger.error("Failed to initialize duthosts.")
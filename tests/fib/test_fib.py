@@ -217,6 +217,14 @@ def ignore_ttl(duthosts):
     return False
 
 
+@pytest.fixture(scope="module")
+def ptf_burst_size(duthosts, request):
+    # Packets of the load balancing checks are sent in bursts, which are not forwarded reliably by the vs platform
+    if duthosts[0].facts['asic_type'] in ["vs"]:
+        return 0
+    return request.config.getoption("--ptf_burst_size")
+
+
 @pytest.fixture(scope="module")
 def updated_tbinfo(tbinfo):
     if tbinfo['topo']['name'] == 't0-56-po2vlan':
@@ -239,7 +247,7 @@ def test_basic_fib(duthosts, ptfhost, tbinfo, ipv4, ipv6, mtu,
                    ignore_ttl, single_fib_for_duts,                     # noqa F401
                    duts_running_config_facts, duts_minigraph_facts,
                    validate_active_active_dualtor_setup,                # noqa F401
-                   request):                                            # noqa F811
+                   ptf_burst_size, request):                            # noqa F811
 
     if 'dualtor' in updated_tbinfo['topo']['name']:
         wait(30, 'Wait some time for mux active/standby state to be stable after toggled mux state')
@@ -281,7 +289,9 @@ def test_basic_fib(duthosts, ptfhost, tbinfo, ipv4, ipv6, mtu,
             "ignore_ttl": ignore_ttl,
             "single_fib_for_duts": single_fib_for_duts,
             "switch_type": switch_type,
-            "asic_type": asic_type
+            "asic_type": asic_type,
+            "pipelined": ptf_burst_size > 0,
+            "burst_size": ptf_burst_size
         },
         log_file=log_file,
         qlen=PTF_QLEN,
@@ -473,7 +483,7 @@ def test_hash(add_default_route_to_dut, duthosts, tbinfo, setup_vlan,      # noq
               hash_keys, ptfhost, ipver, toggle_all_simulator_ports_to_rand_selected_tor_m,     # noqa F811
               updated_tbinfo, mux_server_url, mux_status_from_nic_simulator, ignore_ttl,        # noqa F811
               single_fib_for_duts, duts_running_config_facts, duts_minigraph_facts,             # noqa F811
-              setup_active_active_ports, active_active_ports, request):                         # noqa F811
+              setup_active_active_ports, active_active_ports, ptf_burst_size, request):         # noqa F811
 
     if 'dualtor' in updated_tbinfo['topo']['name']:
         wait(30, 'Wait some time for mux active/standby state to be stable after toggled mux state')
@@ -512,7 +522,9 @@ def test_hash(add_default_route_to_dut, duthosts, tbinfo, setup_vlan,      # noq
             "single_fib_for_duts": single_fib_for_duts,
             "switch_type": switch_type,
             "is_active_active_dualtor": is_active_active_dualtor,
-            "topo_name": updated_tbinfo['topo']['name']
+            "topo_name": updated_tbinfo['topo']['name'],
+            "pipelined": ptf_burst_size > 0,
+            "burst_size": ptf_burst_size
         },
         log_file=log_file,
         qlen=PTF_QLEN,